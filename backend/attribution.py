@@ -0,0 +1,312 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+from psycopg2.extras import execute_values
+from scipy import sparse
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import (load_return_panel, load_securities, load_lookthrough, node_residual_weights,
+                         load_holdings_history, drifted_weights)
+from benchmark_constituents import BenchmarkConstituents
+from benchmark_blends import BenchmarkBlender, DEFAULT_BLEND
+
+SCHEMES = ('asset_class', 'level')
+
+
+def brinson_effects(wp, rp, wb, rb):
+    """Single-period Brinson-Fachler effects for every portfolio, date and segment.
+
+    All inputs are P x T x S arrays (weights at the start of each date, segment returns).
+    """
+    Rb = (wb * rb).sum(axis=2, keepdims=True)
+    allocation = (wp - wb) * (rb - Rb)
+    selection = wb * (rp - rb)
+    interaction = (wp - wb) * (rp - rb)
+    return allocation, selection, interaction
+
+
+def carino_factors(Rp, Rb):
+    """Carino log-linking coefficients k_t / K for P x T portfolio and benchmark returns"""
+    def log_ratio(a, b):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            diff = a - b
+            return np.where(np.abs(diff) > 1e-12,
+                            (np.log1p(a) - np.log1p(b)) / np.where(diff == 0, 1, diff),
+                            1 / (1 + a))
+
+    k = log_ratio(Rp, Rb)                                              # P x T
+    K = log_ratio(np.prod(1 + Rp, axis=1) - 1, np.prod(1 + Rb, axis=1) - 1)
+    return k / K[:, None]
+
+
+def link_effects(effects, Rp, Rb):
+    """Link daily P x T x S effects into P x S period effects that sum to the period active return"""
+    return np.einsum('pts,pt->ps', effects, carino_factors(Rp, Rb))
+
+
+class BrinsonAttribution:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def blend_constituents(self, constituents, definitions):
+        """Constituent weights of each benchmark definition, owned by its position in definitions.
+
+        A blend holds its components' constituents scaled by their target weights; it is
+        left without constituents unless every component has a snapshot loaded.
+        """
+        loaded = set(constituents['benchmark_id'])
+        parts = []
+        for owner, definition in enumerate(definitions):
+            if not all(b in loaded for b, _ in definition['components']):
+                continue
+            for benchmark_id, weight in definition['components']:
+                rows = constituents[constituents['benchmark_id'] == benchmark_id]
+                parts.append(rows.assign(owner=owner, weight=rows['weight'] * weight))
+        if not parts:
+            return pd.DataFrame(columns=['owner', 'security_id', 'weight'])
+        return pd.concat(parts, ignore_index=True)[['owner', 'security_id', 'weight']]
+
+    def segment_labels(self, frame, securities, scheme):
+        """Segment of each lookthrough node or benchmark constituent under the scheme"""
+        if scheme == 'asset_class':
+            return frame['security_id'].map(securities['asset_class']).fillna('Unclassified')
+        return 'Level ' + frame['level'].astype(str)
+
+    def root_shares(self, nodes, holdings):
+        """Direct holding (root_id) of every lookthrough node and its share of that holding.
+
+        Shares come from today's lookthrough. Direct holdings in the history that are no
+        longer held have no lookthrough, so they are kept whole as their own leaf.
+        """
+        root_path = nodes['holding_path'].str.partition(' -> ')[0]
+        direct = (nodes[nodes['level'] == 1]
+                  .drop_duplicates(['portfolio_id', 'holding_path'])
+                  .set_index(['portfolio_id', 'holding_path']))
+        key = pd.MultiIndex.from_arrays([nodes['portfolio_id'], root_path])
+        root_weight = direct['portfolio_weight'].reindex(key).values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(root_weight != 0, nodes['residual_weight'].values / root_weight, 0.0)
+        nodes = nodes.assign(root_id=direct['security_id'].reindex(key).values, share=share)
+
+        held = holdings[['portfolio_id', 'security_id']].drop_duplicates()
+        known = pd.MultiIndex.from_frame(nodes[['portfolio_id', 'root_id']].dropna())
+        former = held[~pd.MultiIndex.from_frame(held).isin(known)]
+        return pd.concat([nodes, former.assign(root_id=former['security_id'], level=1, share=1.0)],
+                         ignore_index=True)
+
+    def portfolio_segments(self, nodes, holdings, returns, portfolio_ids, segments):
+        """P x T x S start-of-day segment weights and return contributions from holdings history.
+
+        Direct weights drift between snapshots as in the risk run (one drifted_weights call
+        for every portfolio), and each direct holding splits into segments by its
+        lookthrough shares. With q indexing (portfolio, direct holding, segment), each q's
+        lookthrough return is one sparse product with the security returns, and a sparse
+        q -> (portfolio, segment) matrix G sums weights and contributions: (W_q * r_q) @ G.
+        Also returns a P x T mask of the days each portfolio held anything.
+        """
+        P, T, S = len(portfolio_ids), len(returns), len(segments)
+        direct_ids = sorted(int(s) for s in holdings['security_id'].unique())
+        weights = drifted_weights(holdings, returns.reindex(columns=direct_ids))
+        if weights.empty:
+            return np.zeros((P, T, S)), np.zeros((P, T, S)), np.zeros((P, T), dtype=bool)
+        # Portfolios without snapshots get all-NaN rows, so they stay unheld
+        W = (weights.reindex(pd.MultiIndex.from_product([portfolio_ids, returns.index]))
+             .values.reshape(P, T, len(direct_ids)))
+        held = ~np.isnan(W).all(axis=2)
+        W = np.nan_to_num(W)
+
+        p = pd.Index(portfolio_ids).get_indexer(nodes['portfolio_id'])
+        d = pd.Index(direct_ids).get_indexer(nodes['root_id'])
+        k = pd.Index(segments).get_indexer(nodes['segment'])
+        n = returns.columns.get_indexer(nodes['security_id'])
+        keep = (p >= 0) & (d >= 0) & (n >= 0)
+        keys, q = np.unique((p[keep] * len(direct_ids) + d[keep]) * S + k[keep], return_inverse=True)
+        qp, qd, qk = keys // (len(direct_ids) * S), keys // S % len(direct_ids), keys % S
+        share = nodes['share'].values[keep].astype(float)
+
+        L = sparse.csr_matrix((share, (n[keep], q)), shape=(returns.shape[1], len(keys)))   # N x Q
+        rq = np.asarray((L.T @ returns.fillna(0.0).values.T))                                # Q x T
+        Wq = W[qp, :, qd]                                                                    # Q x T
+        G = sparse.csr_matrix((np.ones(len(keys)), (np.arange(len(keys)), qp * S + qk)),
+                              shape=(len(keys), P * S))
+
+        def by_segment(X):
+            return np.asarray(G.T @ X).reshape(P, S, T).transpose(0, 2, 1)
+
+        wp = by_segment(Wq * np.bincount(q, weights=share, minlength=len(keys))[:, None])
+        contrib = by_segment(Wq * rq)
+        return wp, contrib, held
+
+    def exposure_tensor(self, frame, owner_column, owners, segments, security_ids, weight_column):
+        """owners x S x N tensor: weight of security n that each owner holds through segment s"""
+        E = np.zeros((len(owners), len(segments), len(security_ids)))
+        if not frame.empty:
+            np.add.at(E, (pd.Index(owners).get_indexer(frame[owner_column]),
+                          pd.Index(segments).get_indexer(frame['segment']),
+                          pd.Index(security_ids).get_indexer(frame['security_id'])),
+                      frame[weight_column].astype(float).values)
+        return E
+
+    def benchmark_segments(self, wp, benchmark_returns, benchmark_exposures, returns, benchmark_index):
+        """Benchmark segment weights and returns aligned to the portfolio segments.
+
+        Benchmarks with constituents loaded get their real segment mix, and segment
+        returns come from constituent returns. Benchmarks stored only as a total-return
+        series are taken to hold the portfolio's own segment mix, each segment earning
+        the benchmark return, so their active return is all selection.
+        """
+        P, T, S = wp.shape
+        wb = wp.copy()
+        rb = np.repeat(benchmark_returns[:, :, None], S, axis=2)
+
+        B, _, N = benchmark_exposures.shape
+        weights = benchmark_exposures.sum(axis=2)                         # B x S
+        has_constituents = weights.sum(axis=1) > 0
+        if not has_constituents.any():
+            return wb, rb
+
+        contrib = (benchmark_exposures.reshape(B * S, N) @ returns.T).reshape(B, S, T).transpose(0, 2, 1)
+        total = contrib.sum(axis=2, keepdims=True)                        # B x T x 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            segment_returns = np.where(weights[:, None, :] > 0,
+                                       contrib / np.where(weights == 0, 1, weights)[:, None, :],
+                                       total)
+
+        covered = has_constituents[benchmark_index]
+        wb[covered] = weights[benchmark_index[covered]][:, None, :]
+        rb[covered] = segment_returns[benchmark_index[covered]]
+        return wb, rb
+
+    def calculate(self, start_date=None, end_date=None, scheme='asset_class'):
+        """Attribute active return for all portfolios over [start_date, end_date]"""
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown attribution scheme: {scheme}")
+        end_date = end_date or datetime.now().date()
+        start_date = start_date or end_date - timedelta(days=365)
+        print(f" Brinson attribution by {scheme} from {start_date} to {end_date}...")
+
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        nodes = node_residual_weights(load_lookthrough(cursor))
+        if nodes.empty:
+            print(" No lookthrough holdings found!")
+            conn.close()
+            return None
+
+        portfolio_ids = sorted(int(p) for p in nodes['portfolio_id'].unique())
+        blender = BenchmarkBlender()
+        blends = blender.get_portfolio_blends(cursor, portfolio_ids)
+        definition_keys = [(d['components'], d['rebalance'])
+                           for d in (blends.get(p, DEFAULT_BLEND) for p in portfolio_ids)]
+        unique_keys = sorted(set(definition_keys))
+        definitions = [{'components': c, 'rebalance': r} for c, r in unique_keys]
+        position = {key: i for i, key in enumerate(unique_keys)}
+        benchmark_index = np.array([position[key] for key in definition_keys])
+        component_ids = sorted({b for d in definitions for b, _ in d['components']})
+
+        securities = load_securities(cursor)
+        holdings = load_holdings_history(cursor, portfolio_ids, start_date, end_date)
+        nodes = self.root_shares(nodes, holdings)
+        nodes = nodes.assign(segment=self.segment_labels(nodes, securities, scheme))
+        if scheme == 'asset_class':
+            constituents = BenchmarkConstituents().load_constituent_weights(
+                cursor, component_ids, end_date)
+            constituents['weight'] = (constituents['weight'].astype(float)
+                                      / constituents.groupby('benchmark_id')['weight']
+                                      .transform('sum').astype(float))
+        else:
+            # Benchmarks have no fund layers, so level attribution stays benchmark-neutral
+            constituents = pd.DataFrame(columns=['benchmark_id', 'security_id', 'weight'])
+        constituents = self.blend_constituents(constituents, definitions)
+        constituents = constituents.assign(segment=self.segment_labels(constituents, securities, scheme)
+                                           if not constituents.empty else [])
+
+        security_ids = sorted(int(s) for s in set(nodes['security_id']) | set(constituents['security_id']))
+        segments = sorted(set(nodes['segment']) | set(constituents['segment']))
+
+        returns = load_return_panel(cursor, security_ids, start_date - timedelta(days=7), end_date)
+        returns = returns.loc[pd.Timestamp(start_date):].reindex(columns=security_ids)
+        if returns.empty:
+            print(" No returns available for the period")
+            conn.close()
+            return None
+        # Each distinct benchmark or blend is loaded (and its composite refreshed) once
+        bench = pd.DataFrame({
+            i: blender.definition_returns(cursor, d, start_date, end_date)
+            for i, d in enumerate(definitions)
+        }).reindex(index=returns.index, columns=range(len(definitions)))
+        primary_ids = [max(d['components'], key=lambda c: c[1])[0] for d in definitions]
+        blend_ids = [blender.ensure_blend(cursor, d) if len(d['components']) > 1 else None
+                     for d in definitions]
+
+        Eb = self.exposure_tensor(constituents, 'owner', range(len(definitions)), segments,
+                                  security_ids, 'weight')
+
+        # Point-in-time segment weights and returns, so rebalances move the weights
+        wp, contrib, held = self.portfolio_segments(nodes, holdings, returns, portfolio_ids, segments)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rp = np.where(wp != 0, contrib / np.where(wp == 0, 1, wp), 0.0)
+
+        r = returns.fillna(0.0).values                                   # T x N
+        Rb_total = bench.fillna(0.0).values.T[benchmark_index]           # P x T
+        wb, rb = self.benchmark_segments(wp, Rb_total, Eb, r, benchmark_index)
+        # Before its first holdings snapshot a portfolio tracks its benchmark: no active effects
+        wp[~held] = wb[~held]
+        rp[~held] = rb[~held]
+
+        allocation, selection, interaction = brinson_effects(wp, rp, wb, rb)
+        Rp = (wp * rp).sum(axis=2)
+        Rb = (wb * rb).sum(axis=2)
+
+        linked = {name: link_effects(effect, Rp, Rb) for name, effect in
+                  [('allocation', allocation), ('selection', selection), ('interaction', interaction)]}
+        period_rp = np.prod(1 + rp, axis=1) - 1                          # P x S
+        period_rb = np.prod(1 + rb, axis=1) - 1
+        period_total_p = np.prod(1 + Rp, axis=1) - 1
+        period_total_b = np.prod(1 + Rb, axis=1) - 1
+
+        cursor.execute("SELECT method_id FROM attribution_methods WHERE code = 'BRINSON_FACHLER'")
+        method_id = cursor.fetchone()[0]
+
+        cursor.execute("""
+            DELETE FROM attribution_results
+            WHERE method_id = %s AND scheme = %s AND start_date = %s AND end_date = %s
+        """, [method_id, scheme, start_date, end_date])
+        execute_values(cursor, """
+            INSERT INTO attribution_results (
+                portfolio_id, benchmark_id, blend_id, method_id, scheme, start_date, end_date, segment,
+                portfolio_weight, benchmark_weight, portfolio_return, benchmark_return,
+                allocation_effect, selection_effect, interaction_effect, total_effect
+            ) VALUES %s
+        """, [(int(p), int(primary_ids[benchmark_index[i]]), blend_ids[benchmark_index[i]],
+               method_id, scheme, start_date, end_date, seg,
+               float(wp[i, :, s].mean()), float(wb[i, :, s].mean()),
+               float(period_rp[i, s]), float(period_rb[i, s]),
+               float(linked['allocation'][i, s]), float(linked['selection'][i, s]),
+               float(linked['interaction'][i, s]),
+               float(linked['allocation'][i, s] + linked['selection'][i, s]
+                     + linked['interaction'][i, s]))
+              for i, p in enumerate(portfolio_ids) for s, seg in enumerate(segments)],
+            page_size=5000)
+
+        bump_data_version(cursor, 'attribution')
+        conn.commit()
+        conn.close()
+
+        for i, p in enumerate(portfolio_ids):
+            print(f"   Portfolio {p}: return {period_total_p[i]*100:.2f}% vs benchmark "
+                  f"{period_total_b[i]*100:.2f}% (active {(period_total_p[i]-period_total_b[i])*100:.2f}%)")
+            for s, seg in enumerate(segments):
+                print(f"     {seg:<15} alloc {linked['allocation'][i, s]*100:6.2f}%  "
+                      f"select {linked['selection'][i, s]*100:6.2f}%  "
+                      f"interact {linked['interaction'][i, s]*100:6.2f}%")
+        return linked
+
+
+if __name__ == "__main__":
+    engine = BrinsonAttribution()
+    for scheme in SCHEMES:
+        engine.calculate(scheme=scheme)
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+
+# Calendar days per work unit; a failed chunk costs at most this much refetching
+CHUNK_DAYS = 180
+# Benchmark chunks fetch this far back so their first day still gets a return
+BENCHMARK_WARMUP_DAYS = 10
+# yfinance also answers a throttled request with an empty frame: an empty chunk inside a
+# ticker's traded range (between its done chunks) is refetched until it has this many attempts
+EMPTY_RETRY_ATTEMPTS = 3
+
+
+def chunk_jobs(jobs, chunk_days=CHUNK_DAYS):
+    """Split pipeline jobs into (ticker, date chunk) work units with exclusive chunk ends.
+
+    Chunk boundaries count from each job's start date, so planning the same backfill
+    again yields the same chunk keys.
+    """
+    chunks = []
+    for job in jobs:
+        start = datetime.strptime(job['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(job['end_date'], '%Y-%m-%d').date() + timedelta(days=1)
+        while start < end:
+            chunk_end = min(start + timedelta(days=chunk_days), end)
+            chunks.append({'kind': job['kind'], 'key': job['key'], 'ticker': job['ticker'],
+                           'chunk_start': start, 'chunk_end': chunk_end})
+            start = chunk_end
+    return chunks
+
+
+def chunk_fetch_job(chunk):
+    """Pipeline job for one chunk; yfinance treats end_date as exclusive"""
+    fetch_start = chunk['chunk_start']
+    if chunk['kind'] == 'benchmark':
+        fetch_start -= timedelta(days=BENCHMARK_WARMUP_DAYS)
+    return {**chunk, 'start_date': fetch_start.strftime('%Y-%m-%d'),
+            'end_date': chunk['chunk_end'].strftime('%Y-%m-%d'), 'write_from': chunk['chunk_start']}
+
+
+def plan_chunks(cursor, chunks):
+    """Register chunks not seen before; existing chunks keep their status.
+
+    The last chunk planned on an earlier day ended then; when it now ends later it is
+    extended and reopened so the new days get fetched.
+    """
+    execute_values(cursor, """
+        INSERT INTO backfill_chunks (kind, key, chunk_start, chunk_end, ticker)
+        VALUES %s
+        ON CONFLICT (kind, key, chunk_start) DO UPDATE SET
+            chunk_end = EXCLUDED.chunk_end,
+            status = 'pending',
+            updated_at = CURRENT_TIMESTAMP
+        WHERE backfill_chunks.chunk_end < EXCLUDED.chunk_end
+    """, [(c['kind'], c['key'], c['chunk_start'], c['chunk_end'], c['ticker']) for c in chunks])
+
+
+def reset_chunks(cursor):
+    cursor.execute("DELETE FROM backfill_chunks")
+
+
+def open_chunks(cursor):
+    """Chunks still pending or failed, plus suspect empty ones, as pipeline jobs.
+
+    An empty chunk before a ticker's first or after its last done chunk is taken as
+    outside its trading history; one in between is retried up to EMPTY_RETRY_ATTEMPTS.
+    """
+    cursor.execute("""
+        SELECT c.kind, c.key, c.ticker, c.chunk_start, c.chunk_end
+        FROM backfill_chunks c
+        LEFT JOIN (
+            SELECT kind, key, MIN(chunk_start) AS first_start, MAX(chunk_end) AS last_end
+            FROM backfill_chunks
+            WHERE status = 'done'
+            GROUP BY kind, key
+        ) traded ON c.kind = traded.kind AND c.key = traded.key
+        WHERE c.status IN ('pending', 'failed')
+        OR (c.status = 'empty' AND c.attempts < %s
+            AND c.chunk_start > traded.first_start AND c.chunk_end < traded.last_end)
+        ORDER BY c.ticker, c.chunk_start
+    """, [EMPTY_RETRY_ATTEMPTS])
+    return [chunk_fetch_job(dict(zip(['kind', 'key', 'ticker', 'chunk_start', 'chunk_end'], row)))
+            for row in cursor.fetchall()]
+
+
+def record_outcomes(cursor, outcomes):
+    """Mark chunks done, empty or failed; outcomes are (job, rows_written, error, attempts).
+
+    Called inside the writer's transaction, so a chunk is only done once its rows commit.
+    """
+    execute_values(cursor, """
+        UPDATE backfill_chunks b
+        SET status = o.status, rows_written = o.rows_written, last_error = o.last_error,
+            attempts = b.attempts + o.attempts, updated_at = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS o(kind, key, chunk_start, status, rows_written, last_error, attempts)
+        WHERE b.kind = o.kind AND b.key = o.key AND b.chunk_start = o.chunk_start
+    """, [(job['kind'], job['key'], job['chunk_start'],
+           'failed' if error else ('done' if rows else 'empty'), rows, error, attempts)
+          for job, rows, error, attempts in outcomes if 'chunk_start' in job],
+        template="(%s, %s, %s::date, %s, %s::int, %s, %s::int)")
+
+
+def chunk_summary(cursor):
+    cursor.execute("""
+        SELECT status, COUNT(*), COALESCE(SUM(rows_written), 0)
+        FROM backfill_chunks
+        GROUP BY status
+    """)
+    return {status: (n, rows) for status, n, rows in cursor.fetchall()}
@@ -0,0 +1,213 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+
+REBALANCE_PERIODS = {'daily': 'D', 'monthly': 'M', 'quarterly': 'Q', 'annual': 'Y'}
+BASE_INDEX_LEVEL = 100.0
+DEFAULT_BLEND = {'components': ((1, 1.0),), 'rebalance': 'monthly'}  # 100% ASX200
+
+
+def blend_returns(component_returns, weights, rebalance='monthly'):
+    """Composite daily returns of a fixed-weight blend, rebalanced at each period end.
+
+    Within a period every component drifts with its own cumulative growth, so the
+    composite is one grouped cumulative sum of log returns and a matrix-vector product.
+    """
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum()
+    periods = component_returns.index.to_period(REBALANCE_PERIODS[rebalance])
+
+    log_growth = np.log1p(component_returns.fillna(0.0)).groupby(periods).cumsum()
+    value = np.exp(log_growth.values) @ weights                      # 1.0 at each rebalance
+    new_period = np.r_[True, periods[1:] != periods[:-1]]
+    previous = np.where(new_period, 1.0, np.r_[1.0, value[:-1]])
+    return pd.Series(value / previous - 1, index=component_returns.index)
+
+
+def definition_hash(components, rebalance):
+    """Stable key for a blend definition, so portfolios with the same blend share one cache"""
+    canonical = rebalance + '|' + ';'.join(f"{b}:{w:.6f}" for b, w in sorted(components))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class BenchmarkBlender:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def get_portfolio_blends(self, cursor, portfolio_ids=None):
+        """Benchmark definition per portfolio: weighted rows at its latest effective date.
+
+        Returns {portfolio_id: {'components': ((benchmark_id, weight), ...), 'rebalance': ...}},
+        defaulting to 100% ASX200 when a portfolio has no benchmark set.
+        """
+        # Callers often pass numpy ids straight from a frame; psycopg2 can't adapt those
+        ids = None if portfolio_ids is None else [int(p) for p in portfolio_ids]
+        cursor.execute("""
+            SELECT p.portfolio_id, pb.benchmark_id, pb.weight::float8, pb.rebalance_frequency
+            FROM portfolios p
+            LEFT JOIN portfolio_benchmarks pb ON pb.portfolio_id = p.portfolio_id
+                AND pb.weight > 0
+                AND pb.effective_date = (
+                    SELECT MAX(effective_date) FROM portfolio_benchmarks
+                    WHERE portfolio_id = p.portfolio_id AND effective_date <= CURRENT_DATE
+                )
+            WHERE %s::int[] IS NULL OR p.portfolio_id = ANY(%s::int[])
+        """, [ids, ids])
+
+        blends = {}
+        for portfolio_id, benchmark_id, weight, rebalance in cursor.fetchall():
+            blend = blends.setdefault(portfolio_id, {'components': [], 'rebalance': 'monthly'})
+            if benchmark_id is not None:
+                blend['components'].append((benchmark_id, weight))
+                blend['rebalance'] = rebalance or 'monthly'
+
+        for blend in blends.values():
+            components = blend['components'] or DEFAULT_BLEND['components']
+            total = sum(w for _, w in components)
+            blend['components'] = tuple(sorted((b, w / total) for b, w in components))
+        return blends
+
+    def describe(self, cursor, definition):
+        """Human-readable blend name, e.g. '60% ASX200 / 40% MSCI_WORLD'"""
+        cursor.execute("SELECT benchmark_id, code FROM benchmarks WHERE benchmark_id = ANY(%s)",
+                       [[b for b, _ in definition['components']]])
+        codes = dict(cursor.fetchall())
+        if len(definition['components']) == 1:
+            return codes.get(definition['components'][0][0], 'ASX200')
+        return ' / '.join(f"{w:.0%} {codes.get(b, b)}" for b, w in definition['components'])
+
+    def load_component_returns(self, cursor, benchmark_ids, start_date=None, end_date=None):
+        cursor.execute("""
+            SELECT date, benchmark_id, daily_return::float8
+            FROM benchmark_returns
+            WHERE benchmark_id = ANY(%s)
+            AND (%s::date IS NULL OR date >= %s::date)
+            AND (%s::date IS NULL OR date <= %s::date)
+        """, [[int(b) for b in benchmark_ids], start_date, start_date, end_date, end_date])
+        df = pd.DataFrame(cursor.fetchall(), columns=['date', 'benchmark_id', 'daily_return'])
+        panel = df.pivot(index='date', columns='benchmark_id', values='daily_return')
+        panel.index = pd.to_datetime(panel.index)
+        return panel.sort_index().reindex(columns=list(benchmark_ids))
+
+    def ensure_blend(self, cursor, definition):
+        """blend_id for a definition, creating the blend (and its components) on first use"""
+        key = definition_hash(definition['components'], definition['rebalance'])
+        cursor.execute("""
+            INSERT INTO benchmark_blends (definition_hash, rebalance_frequency)
+            VALUES (%s, %s)
+            ON CONFLICT (definition_hash) DO NOTHING
+            RETURNING blend_id
+        """, [key, definition['rebalance']])
+        created = cursor.fetchone()
+        if created is None:
+            cursor.execute("SELECT blend_id FROM benchmark_blends WHERE definition_hash = %s", [key])
+            return cursor.fetchone()[0]
+
+        blend_id = created[0]
+        execute_values(cursor, """
+            INSERT INTO benchmark_blend_components (blend_id, benchmark_id, weight) VALUES %s
+        """, [(blend_id, b, w) for b, w in definition['components']])
+        return blend_id
+
+    def refresh(self, cursor, blend_id, definition):
+        """Extend the cached composite series, recomputing only the latest rebalance period"""
+        cursor.execute("""
+            SELECT MAX(date) FROM benchmark_blend_returns WHERE blend_id = %s
+        """, [blend_id])
+        last_date = cursor.fetchone()[0]
+
+        anchor = None
+        base_level = BASE_INDEX_LEVEL
+        if last_date is not None:
+            # Drift inside a period depends only on that period, so restart at its first day
+            anchor = (pd.Timestamp(last_date).to_period(REBALANCE_PERIODS[definition['rebalance']])
+                      .start_time.date())
+            cursor.execute("""
+                SELECT index_level FROM benchmark_blend_returns
+                WHERE blend_id = %s AND date < %s
+                ORDER BY date DESC
+                LIMIT 1
+            """, [blend_id, anchor])
+            row = cursor.fetchone()
+            base_level = float(row[0]) if row else BASE_INDEX_LEVEL
+
+        benchmark_ids = [b for b, _ in definition['components']]
+        components = self.load_component_returns(cursor, benchmark_ids, start_date=anchor)
+        if components.empty:
+            return 0
+
+        composite = blend_returns(components, [w for _, w in definition['components']],
+                                  definition['rebalance'])
+        levels = base_level * np.cumprod(1 + composite.values)
+
+        execute_values(cursor, """
+            INSERT INTO benchmark_blend_returns (blend_id, date, daily_return, index_level)
+            VALUES %s
+            ON CONFLICT (blend_id, date) DO UPDATE SET
+                daily_return = EXCLUDED.daily_return,
+                index_level = EXCLUDED.index_level
+        """, [(blend_id, d.date(), float(r), float(l))
+              for d, r, l in zip(composite.index, composite.values, levels)], page_size=5000)
+        cursor.execute("""
+            UPDATE benchmark_blends SET last_refreshed = CURRENT_TIMESTAMP WHERE blend_id = %s
+        """, [blend_id])
+        return len(composite)
+
+    def definition_returns(self, cursor, definition, start_date=None, end_date=None):
+        """Benchmark return series for a definition: stored directly or from the blend cache"""
+        if len(definition['components']) == 1:
+            benchmark_id = definition['components'][0][0]
+            return self.load_component_returns(cursor, [benchmark_id], start_date, end_date)[benchmark_id]
+
+        blend_id = self.ensure_blend(cursor, definition)
+        self.refresh(cursor, blend_id, definition)
+        cursor.execute("""
+            SELECT date, daily_return FROM benchmark_blend_returns
+            WHERE blend_id = %s
+            AND (%s::date IS NULL OR date >= %s::date)
+            AND (%s::date IS NULL OR date <= %s::date)
+            ORDER BY date
+        """, [blend_id, start_date, start_date, end_date, end_date])
+        rows = cursor.fetchall()
+        return pd.Series([r for _, r in rows], index=pd.to_datetime([d for d, _ in rows]), dtype=float)
+
+    def portfolio_benchmark_returns(self, cursor, portfolio_ids, start_date=None, end_date=None):
+        """Dates x portfolios benchmark returns, computing each distinct blend only once"""
+        blends = self.get_portfolio_blends(cursor, portfolio_ids)
+        by_definition, columns = {}, {}
+        for portfolio_id in portfolio_ids:
+            definition = blends.get(portfolio_id, DEFAULT_BLEND)
+            key = (definition['components'], definition['rebalance'])
+            if key not in by_definition:
+                by_definition[key] = self.definition_returns(cursor, definition, start_date, end_date)
+            columns[portfolio_id] = by_definition[key]
+        return pd.DataFrame(columns)
+
+    def refresh_all(self):
+        """Refresh the cached composite of every blend currently assigned to a portfolio"""
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        definitions = {}
+        for definition in self.get_portfolio_blends(cursor).values():
+            if len(definition['components']) > 1:
+                definitions[(definition['components'], definition['rebalance'])] = definition
+
+        for definition in definitions.values():
+            blend_id = self.ensure_blend(cursor, definition)
+            rows = self.refresh(cursor, blend_id, definition)
+            print(f" Refreshed blend {self.describe(cursor, definition)} "
+                  f"({definition['rebalance']}): {rows} rows")
+
+        bump_data_version(cursor, 'benchmark_blends')
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    BenchmarkBlender().refresh_all()
@@ -0,0 +1,165 @@
+import sys
+import numpy as np
+import pandas as pd
+from datetime import datetime
+import psycopg2
+from scipy import sparse
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import (load_lookthrough, effective_weights, load_primary_benchmarks,
+                         load_identifier_index, resolve_identifiers, copy_frame)
+
+
+class SecurityIndex:
+    """Fixed security_id -> column mapping shared by every weight vector in a run"""
+
+    def __init__(self, security_ids):
+        self.security_ids = np.array(sorted(set(int(s) for s in security_ids)))
+        self.position = pd.Index(self.security_ids)
+
+    def __len__(self):
+        return len(self.security_ids)
+
+    def matrix(self, rows, row_ids, security_ids, weights):
+        """Sparse len(rows) x N matrix from (row_id, security_id, weight) triples"""
+        row_index = pd.Index(rows).get_indexer(row_ids)
+        col_index = self.position.get_indexer(security_ids)
+        return sparse.csr_matrix((np.asarray(weights, dtype=float), (row_index, col_index)),
+                                 shape=(len(rows), len(self)))
+
+
+class BenchmarkConstituents:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_file(self, benchmark_code, path, as_of_date=None):
+        """Bulk load an index weight file (CSV with isin/sedol/cusip/ticker and weight columns)"""
+        as_of_date = as_of_date or datetime.now().date()
+        print(f"Loading {benchmark_code} constituents from {path} as of {as_of_date}...")
+
+        frame = pd.read_csv(path, dtype=str)
+        frame.columns = [c.strip().lower() for c in frame.columns]
+        frame['weight'] = pd.to_numeric(frame['weight'].str.rstrip('%'), errors='coerce')
+        frame = frame.dropna(subset=['weight'])
+        # Issuer files usually quote percentages
+        if frame['weight'].sum() > 1.5:
+            frame['weight'] = frame['weight'] / 100.0
+
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT benchmark_id FROM benchmarks WHERE code = %s", [benchmark_code])
+        result = cursor.fetchone()
+        if not result:
+            print(f" {benchmark_code} benchmark not found in database")
+            conn.close()
+            return None
+        benchmark_id = result[0]
+
+        frame['security_id'] = resolve_identifiers(frame, load_identifier_index(cursor))
+        unresolved = frame[frame['security_id'].isna()]
+        resolved = (frame.dropna(subset=['security_id'])
+                    .groupby('security_id', as_index=False)['weight'].sum())
+
+        cursor.execute("""
+            DELETE FROM benchmark_constituents WHERE benchmark_id = %s AND date = %s
+        """, [benchmark_id, as_of_date])
+        copy_frame(cursor, 'benchmark_constituents',
+                   resolved.assign(benchmark_id=benchmark_id, date=as_of_date)
+                   [['benchmark_id', 'date', 'security_id', 'weight']])
+
+        bump_data_version(cursor, 'benchmark_constituents')
+        conn.commit()
+        conn.close()
+
+        print(f"Stored {len(resolved)} constituents for {benchmark_code} "
+              f"({resolved['weight'].sum():.2%} of index weight)")
+        if not unresolved.empty:
+            print(f"Warning: {len(unresolved)} rows ({unresolved['weight'].sum():.2%} weight) "
+                  f"did not match any security identifier")
+        return len(resolved)
+
+    def load_constituent_weights(self, cursor, benchmark_ids, as_of_date=None):
+        """Latest constituent snapshot on or before as_of_date for each benchmark, as long rows"""
+        as_of_date = as_of_date or datetime.now().date()
+        cursor.execute("""
+            SELECT bc.benchmark_id, bc.security_id, bc.weight
+            FROM benchmark_constituents bc
+            JOIN (
+                SELECT benchmark_id, MAX(date) AS date
+                FROM benchmark_constituents
+                WHERE benchmark_id = ANY(%s) AND date <= %s
+                GROUP BY benchmark_id
+            ) latest ON bc.benchmark_id = latest.benchmark_id AND bc.date = latest.date
+        """, [list(benchmark_ids), as_of_date])
+        return pd.DataFrame(cursor.fetchall(), columns=['benchmark_id', 'security_id', 'weight'])
+
+    def active_weights(self, benchmark_id=None, as_of_date=None):
+        """Lookthrough active weights for every portfolio against its benchmark, persisted.
+
+        Portfolio and benchmark weights become sparse rows on one aligned security
+        index, so all portfolios' active weights are a single sparse subtraction.
+        """
+        as_of_date = as_of_date or datetime.now().date()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        portfolio_weights = effective_weights(load_lookthrough(cursor))
+        if portfolio_weights.empty:
+            print(" No lookthrough holdings found!")
+            conn.close()
+            return None
+
+        portfolio_ids = list(portfolio_weights.index)
+        primary = load_primary_benchmarks(cursor)
+        benchmark_of = [benchmark_id or primary.get(p, 1) for p in portfolio_ids]
+        benchmark_ids = sorted(set(benchmark_of))
+
+        constituents = self.load_constituent_weights(cursor, benchmark_ids, as_of_date)
+        missing = set(benchmark_ids) - set(constituents['benchmark_id'])
+        if missing:
+            print(f"Warning: no constituents loaded for benchmark(s) {sorted(missing)}")
+
+        index = SecurityIndex(list(portfolio_weights.columns) + list(constituents['security_id']))
+        long_portfolio = portfolio_weights.stack()
+        long_portfolio = long_portfolio[long_portfolio != 0]
+        W = index.matrix(portfolio_ids, long_portfolio.index.get_level_values(0),
+                         long_portfolio.index.get_level_values(1), long_portfolio.values)
+        B = index.matrix(benchmark_ids, constituents['benchmark_id'],
+                         constituents['security_id'], constituents['weight'])
+
+        B_rows = B[pd.Index(benchmark_ids).get_indexer(benchmark_of)]
+        active = (W - B_rows).tocoo()
+
+        rows = pd.DataFrame({
+            'portfolio_id': np.asarray(portfolio_ids)[active.row],
+            'benchmark_id': np.asarray(benchmark_of)[active.row],
+            'date': as_of_date,
+            'security_id': index.security_ids[active.col],
+            'portfolio_weight': np.asarray(W[active.row, active.col]).ravel(),
+            'benchmark_weight': np.asarray(B_rows[active.row, active.col]).ravel(),
+            'active_weight': active.data,
+        })
+
+        cursor.execute("""
+            DELETE FROM portfolio_active_weights WHERE date = %s AND benchmark_id = ANY(%s)
+        """, [as_of_date, benchmark_ids])
+        copy_frame(cursor, 'portfolio_active_weights', rows)
+
+        bump_data_version(cursor, 'benchmark_constituents')
+        conn.commit()
+        conn.close()
+
+        print(f" Stored {len(rows)} active weights for {len(portfolio_ids)} portfolios "
+              f"across {len(index)} securities")
+        return active
+
+
+if __name__ == "__main__":
+    loader = BenchmarkConstituents()
+    if len(sys.argv) >= 3:
+        # python benchmark_constituents.py ASX300 asx300_weights.csv [YYYY-MM-DD]
+        as_of = datetime.strptime(sys.argv[3], '%Y-%m-%d').date() if len(sys.argv) > 3 else None
+        loader.load_file(sys.argv[1], sys.argv[2], as_of)
+    loader.active_weights()
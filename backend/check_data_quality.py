@@ -1,13 +1,9 @@
 import psycopg2
 
+from config import DB_CONFIG
+
 # Database connection
-db_config = {
-    'host': 'localhost',
-    'port': 5432,
-    'database': 'madashboard',
-    'user': 'ma_user',
-    'password': 'dev_password123'
-}
+db_config = DB_CONFIG
 
 def simple_data_quality_check():
     conn = psycopg2.connect(**db_config)
@@ -0,0 +1,206 @@
+"""Single entry point for the backend jobs.
+
+    python cli.py load              initial backfill of real market data
+    python cli.py update            incremental market data update
+    python cli.py quality           data source report (--refresh / --populate to rebuild status)
+    python cli.py risk [engines]    run risk engines (default: metrics), --portfolio for metrics
+    python cli.py report            quick database status for cron checks and the API
+    python cli.py fixtures          generate a large synthetic universe for scale testing
+    python cli.py holdings          load issuer fund constituent files (FUND path pairs)
+
+Only the standard library and config load at startup; each command
+imports the modules it needs, so report and quality never pay for pandas,
+numpy or yfinance. --timing prints startup and command time to stderr.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+
+from config import DB_CONFIG
+
+
+def _date(text):
+    from datetime import datetime
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def _factor(module, args):
+    model = module.FactorRiskModel()
+    if model.estimate():
+        model.calculate_portfolio_factor_risk()
+
+
+def _attribution(module, args):
+    engine = module.BrinsonAttribution()
+    for scheme in module.SCHEMES:
+        engine.calculate(scheme=scheme)
+
+
+# Risk engines in dependency order: module imported on demand, then the run function
+ENGINES = {
+    'series': ('series_store', lambda m, args: m.SeriesStore().refresh()),
+    'blends': ('benchmark_blends', lambda m, args: m.BenchmarkBlender().refresh_all()),
+    'metrics': ('risk_calculator',
+                lambda m, args: m.RealBetaRiskCalculator(pushdown=args.pushdown)
+                .calculate_real_risk_metrics(portfolio_id=args.portfolio)),
+    'factor': ('factor_model', _factor),
+    'decomposition': ('risk_decomposition', lambda m, args: m.RiskDecomposition().decompose()),
+    'attribution': ('attribution', _attribution),
+    'pairwise': ('pairwise_risk', lambda m, args: m.PairwiseRisk().calculate()),
+    'ewma': ('ewma_risk', lambda m, args: m.EwmaRiskEngine().update()),
+    'drawdowns': ('drawdowns', lambda m, args: m.DrawdownAnalytics().calculate()),
+    'exposures': ('exposure_cube', lambda m, args: m.ExposureCube().build(start_date=args.since)),
+    'performance': ('performance_series', lambda m, args: m.PerformanceSeries().refresh()),
+    'peers': ('peer_analytics', lambda m, args: m.PeerAnalytics().calculate()),
+    'stress': ('stress_testing', lambda m, args: m.StressTester().run()),
+}
+
+
+def cmd_load(args):
+    from real_data_loader import RealDataLoader
+    RealDataLoader().initial_backfill(restart=args.restart, chunk_days=args.chunk_days)
+
+
+def cmd_update(args):
+    from real_data_loader import RealDataLoader
+    loader = RealDataLoader()
+    loader.incremental_update()
+    if args.quality:
+        loader.update_data_quality_status()
+
+
+def cmd_quality(args):
+    if args.populate:
+        from populate_data_quality import populate_data_quality_table
+        populate_data_quality_table()
+    if args.refresh:
+        from real_data_loader import RealDataLoader
+        loader = RealDataLoader()
+        loader.update_data_quality_status()
+        loader.show_data_quality_report()
+    else:
+        from check_data_quality import simple_data_quality_check
+        simple_data_quality_check()
+
+
+def cmd_risk(args):
+    engines = args.engines or ['metrics']
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        raise SystemExit(f"Unknown engine(s): {', '.join(unknown)}; choose from {', '.join(ENGINES)}")
+    for name in (e for e in ENGINES if e in engines):
+        module_name, run = ENGINES[name]
+        print(f"\n▶ {name}")
+        run(importlib.import_module(module_name), args)
+
+
+def cmd_report(args):
+    import psycopg2
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT (SELECT version FROM data_version),
+               (SELECT last_source FROM data_version),
+               (SELECT updated_at FROM data_version),
+               (SELECT MAX(date) FROM security_prices),
+               (SELECT MAX(date) FROM benchmark_returns),
+               (SELECT MAX(date) FROM portfolio_returns),
+               (SELECT MAX(calculation_date) FROM portfolio_risk_calculations),
+               (SELECT COUNT(*) FROM securities WHERE is_active = TRUE),
+               (SELECT COUNT(*) FROM portfolios WHERE is_active = TRUE)
+    """)
+    (version, source, updated_at, last_price, last_benchmark, last_portfolio,
+     last_risk, securities, portfolios) = cursor.fetchone()
+    conn.close()
+
+    print(f"Data version:      {version} ({source} at {updated_at})")
+    print(f"Securities:        {securities} active, prices to {last_price}")
+    print(f"Benchmarks:        returns to {last_benchmark}")
+    print(f"Portfolios:        {portfolios} active, returns to {last_portfolio}")
+    print(f"Risk calculations: latest {last_risk}")
+
+
+def cmd_fixtures(args):
+    from scale_fixtures import ScaleFixtures
+    ScaleFixtures(securities=args.securities, funds=args.funds, depth=args.depth,
+                  fund_size=args.fund_size, overlap=args.overlap, portfolios=args.portfolios,
+                  holdings=args.holdings, history_days=args.days, workers=args.workers,
+                  seed=args.seed).generate()
+
+
+def cmd_holdings(args):
+    from datetime import datetime
+    from fund_holdings import FundHoldingsLoader
+    if len(args.files) % 2:
+        raise SystemExit("holdings expects FUND PATH pairs")
+    as_of = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    FundHoldingsLoader().load_files(dict(zip(args.files[::2], args.files[1::2])), as_of)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='MA Dashboard backend jobs')
+    parser.add_argument('--timing', action='store_true', help='print startup and command time to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help='initial backfill of real market data (resumes from checkpoints)')
+    load.add_argument('--restart', action='store_true', help='discard backfill checkpoints and refetch everything')
+    load.add_argument('--chunk-days', type=int, help='calendar days per backfill chunk (default 180)')
+    load.set_defaults(run=cmd_load)
+
+    update = commands.add_parser('update', help='incremental market data update')
+    update.add_argument('--quality', action='store_true', help='refresh data quality status afterwards')
+    update.set_defaults(run=cmd_update)
+
+    quality = commands.add_parser('quality', help='data quality report')
+    quality.add_argument('--refresh', action='store_true', help='recompute data_quality_status first')
+    quality.add_argument('--populate', action='store_true', help='rebuild data_quality_status from scratch')
+    quality.set_defaults(run=cmd_quality)
+
+    risk = commands.add_parser('risk', help='run risk engines')
+    risk.add_argument('engines', nargs='*', metavar='engine', help=f"any of: {', '.join(ENGINES)}")
+    risk.add_argument('--portfolio', type=int, default=1, help='portfolio for the metrics engine')
+    risk.add_argument('--pushdown', action='store_true',
+                      help='metrics engine: aggregate beta and tracking error in the database')
+    risk.add_argument('--since', type=_date, metavar='YYYY-MM-DD',
+                      help='exposures engine: backfill the cube from this date to today')
+    risk.set_defaults(run=cmd_risk)
+
+    commands.add_parser('report', help='quick database status').set_defaults(run=cmd_report)
+
+    fixtures = commands.add_parser('fixtures', help='generate a scale-test universe (replaces the previous one)')
+    fixtures.add_argument('--securities', type=int, default=5000)
+    fixtures.add_argument('--funds', type=int, default=200)
+    fixtures.add_argument('--depth', type=int, default=3, help='fund-of-funds layers')
+    fixtures.add_argument('--fund-size', type=int, default=60, help='constituents per fund')
+    fixtures.add_argument('--overlap', type=float, default=1.0, help='constituent popularity skew (0 = uniform)')
+    fixtures.add_argument('--portfolios', type=int, default=500)
+    fixtures.add_argument('--holdings', type=int, default=25, help='direct holdings per portfolio')
+    fixtures.add_argument('--days', type=int, default=1260, help='business days of price history')
+    fixtures.add_argument('--workers', type=int, default=4, help='bulk-load worker processes')
+    fixtures.add_argument('--seed', type=int, default=42)
+    fixtures.set_defaults(run=cmd_fixtures)
+
+    holdings = commands.add_parser('holdings', help='diff-load fund constituent files into fund_holdings')
+    holdings.add_argument('files', nargs='+', metavar='FUND PATH', help='fund ticker or ISIN, then its CSV')
+    holdings.add_argument('--date', help='snapshot date YYYY-MM-DD (default today)')
+    holdings.set_defaults(run=cmd_holdings)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ready = time.perf_counter()
+    if args.timing:
+        print(f"startup: {(ready - _STARTED) * 1000:.0f} ms", file=sys.stderr)
+    args.run(args)
+    if args.timing:
+        print(f"{args.command}: {(time.perf_counter() - ready) * 1000:.0f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
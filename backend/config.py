@@ -0,0 +1,11 @@
+import os
+
+# Connection settings shared by every backend script and the CLI; the same DB_*
+# variables configure the API server's pool
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 5432)),
+    'database': os.environ.get('DB_NAME', 'madashboard'),
+    'user': os.environ.get('DB_USER', 'ma_user'),
+    'password': os.environ.get('DB_PASSWORD', 'dev_password123')
+}
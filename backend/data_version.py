@@ -0,0 +1,4 @@
+def bump_data_version(cursor, source):
+    """Mark dashboard data as changed - call on the writing cursor right before commit"""
+    cursor.execute("SELECT bump_data_version(%s)", [source])
+    return cursor.fetchone()[0]
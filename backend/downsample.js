@@ -0,0 +1,41 @@
+// Largest-Triangle-Three-Buckets: keeps the first and last rows plus, per bucket, the row
+// forming the largest triangle with the previous pick and the next bucket's average
+const lttb = (rows, threshold, x, y) => {
+  if (threshold >= rows.length || threshold < 3) {
+    return rows;
+  }
+  const sampled = [rows[0]];
+  const size = (rows.length - 2) / (threshold - 2);
+  let previous = 0;
+  for (let bucket = 0; bucket < threshold - 2; bucket++) {
+    const start = Math.floor(bucket * size) + 1;
+    const end = Math.floor((bucket + 1) * size) + 1;
+    const nextEnd = Math.min(Math.floor((bucket + 2) * size) + 1, rows.length);
+    let avgX = 0;
+    let avgY = 0;
+    for (let i = end; i < nextEnd; i++) {
+      avgX += x(rows[i]);
+      avgY += y(rows[i]);
+    }
+    avgX /= nextEnd - end;
+    avgY /= nextEnd - end;
+
+    const px = x(rows[previous]);
+    const py = y(rows[previous]);
+    let best = start;
+    let bestArea = -1;
+    for (let i = start; i < end; i++) {
+      const area = Math.abs((px - avgX) * (y(rows[i]) - py) - (px - x(rows[i])) * (avgY - py));
+      if (area > bestArea) {
+        bestArea = area;
+        best = i;
+      }
+    }
+    sampled.push(rows[best]);
+    previous = best;
+  }
+  sampled.push(rows[rows.length - 1]);
+  return sampled;
+};
+
+module.exports = { lttb };
@@ -0,0 +1,33 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { lttb } = require('./downsample');
+
+const series = (values) => values.map((value, i) => ({ i, value }));
+const sample = (rows, threshold) => lttb(rows, threshold, (row) => row.i, (row) => row.value);
+
+test('returns the rows unchanged when they fit the budget', () => {
+  const rows = series([1, 2, 3]);
+  assert.strictEqual(sample(rows, 3), rows);
+  assert.strictEqual(sample(rows, 10), rows);
+  assert.strictEqual(sample(series([1, 2, 3, 4]), 2).length, 4);
+});
+
+test('keeps the first and last rows and exactly the budget', () => {
+  const rows = series(Array.from({ length: 1000 }, (_, i) => Math.sin(i / 25)));
+  const sampled = sample(rows, 50);
+  assert.strictEqual(sampled.length, 50);
+  assert.strictEqual(sampled[0], rows[0]);
+  assert.strictEqual(sampled[49], rows[999]);
+  for (let k = 1; k < sampled.length; k++) {
+    assert.ok(sampled[k].i > sampled[k - 1].i);
+  }
+});
+
+test('keeps spikes that a stride sample would miss', () => {
+  const values = Array(101).fill(0);
+  values[37] = 10;
+  values[73] = -10;
+  const picked = sample(series(values), 12).map((row) => row.i);
+  assert.ok(picked.includes(37));
+  assert.ok(picked.includes(73));
+});
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_portfolio_return_panel, copy_frame
+from benchmark_blends import BenchmarkBlender
+
+# Underwater values above this count as back at the high (absorbs cumprod rounding)
+TOLERANCE = 1e-10
+
+
+def underwater_curves(R):
+    """Drawdown from the running high for every column of a T x S return panel.
+
+    Missing returns leave wealth flat; dates before a column's first or after its last
+    observation are NaN. Returns the underwater array and each column's first/last row.
+    """
+    valid = ~np.isnan(R)
+    T = len(R)
+    first = np.argmax(valid, axis=0)
+    last = T - 1 - np.argmax(valid[::-1], axis=0)
+    rows = np.arange(T)[:, None]
+    in_range = (rows >= first) & (rows <= last)
+
+    wealth = np.cumprod(1 + np.where(valid, R, 0.0), axis=0)
+    # The high starts at the opening value, so a first-day loss is already a drawdown
+    underwater = wealth / np.maximum(np.maximum.accumulate(wealth, axis=0), 1.0) - 1
+    return np.where(in_range, underwater, np.nan), first, last
+
+
+def drawdown_episodes(underwater, last):
+    """Every drawdown episode of every column, found without looping over days.
+
+    An episode is a run of days below the previous high. Working on the flattened
+    series-major array, run starts and ends pair up in order; depth and trough are
+    segment reductions (ufunc.reduceat) over those runs. Row positions are returned:
+    peak is the last day at the high (the row before the first loss, clipped to 0),
+    recovery the first day back at it (-1 while still underwater).
+    """
+    S, T = underwater.shape[1], underwater.shape[0]
+    below = (underwater < -TOLERANCE).T
+    before, after = np.zeros_like(below), np.zeros_like(below)
+    before[:, 1:], after[:, :-1] = below[:, :-1], below[:, 1:]
+
+    starts = np.flatnonzero(below & ~before)
+    ends = np.flatnonzero(below & ~after)
+    if not len(starts):
+        empty = np.array([], dtype=int)
+        return {key: empty for key in ('series', 'peak', 'trough', 'recovery')} | {'depth': np.array([])}
+
+    # Segments [start, end] interleaved with the gaps between them; odd results are discarded
+    bounds = np.column_stack([starts, ends + 1]).ravel()
+    values = np.append(np.nan_to_num(underwater.T.ravel()), 0.0)
+    depth = np.minimum.reduceat(values, bounds)[::2]
+
+    flat_below = np.append(below.ravel(), False)
+    segment = np.cumsum(np.append((below & ~before).ravel(), False)) - 1
+    positions = np.arange(S * T + 1)
+    at_depth = flat_below & (values == depth[segment])
+    trough = np.minimum.reduceat(np.where(at_depth, positions, S * T), bounds)[::2]
+
+    series = starts // T
+    end_row = ends % T
+    recovered = end_row < last[series]
+    return {
+        'series': series,
+        'peak': np.maximum(starts % T - 1, 0),
+        'trough': trough % T,
+        'recovery': np.where(recovered, end_row + 1, -1),
+        'depth': depth,
+    }
+
+
+class DrawdownAnalytics:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_series(self, cursor):
+        """Every portfolio and active benchmark return series as one panel keyed (series_type, id)"""
+        portfolios = load_portfolio_return_panel(cursor)
+        cursor.execute("SELECT benchmark_id FROM benchmarks WHERE is_active = TRUE ORDER BY benchmark_id")
+        benchmark_ids = [row[0] for row in cursor.fetchall()]
+        benchmarks = (BenchmarkBlender().load_component_returns(cursor, benchmark_ids)
+                      if benchmark_ids else pd.DataFrame(dtype=float))
+        panel = pd.concat({'portfolio': portfolios, 'benchmark': benchmarks}, axis=1).sort_index()
+        return panel.dropna(axis=1, how='all')
+
+    def calculate(self):
+        """Underwater curves and drawdown episodes for all portfolios and benchmarks in one pass"""
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        panel = self.load_series(cursor)
+        if panel.empty:
+            print(" No portfolio or benchmark returns available")
+            conn.close()
+            return None
+        print(f" Drawdowns for {panel.shape[1]} series over {len(panel)} dates...")
+
+        underwater, first, last = underwater_curves(panel.values)
+        found = drawdown_episodes(underwater, last)
+
+        series_types = panel.columns.get_level_values(0).values
+        series_ids = panel.columns.get_level_values(1).values.astype(int)
+        dates = panel.index.date
+        s, peak, trough, recovery = found['series'], found['peak'], found['trough'], found['recovery']
+        recovered = recovery >= 0
+        end = np.where(recovered, recovery, last[s])
+        episodes = pd.DataFrame({
+            'series_type': series_types[s], 'series_id': series_ids[s],
+            'peak_date': dates[peak], 'trough_date': dates[trough],
+            'recovery_date': np.where(recovered, dates[np.maximum(recovery, 0)], None),
+            'depth': found['depth'],
+            'decline_days': trough - peak,
+            'recovery_days': pd.Series(recovery - trough).where(recovered).astype('Int64'),
+            'duration_days': end - peak,
+        })
+
+        rows, cols = np.nonzero(~np.isnan(underwater))
+        curves = pd.DataFrame({
+            'series_type': series_types[cols], 'series_id': series_ids[cols],
+            'date': dates[rows], 'drawdown': underwater[rows, cols],
+        })
+
+        cursor.execute("TRUNCATE drawdown_episodes, drawdown_underwater")
+        copy_frame(cursor, 'drawdown_episodes', episodes)
+        copy_frame(cursor, 'drawdown_underwater', curves)
+
+        bump_data_version(cursor, 'drawdowns')
+        conn.commit()
+        conn.close()
+
+        print(f" Stored {len(episodes)} drawdown episodes "
+              f"({int((~recovered).sum())} still underwater) and {len(curves)} underwater points")
+        return episodes
+
+
+if __name__ == "__main__":
+    DrawdownAnalytics().calculate()
@@ -0,0 +1,281 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_return_panel, load_portfolio_return_panel, load_lookthrough, copy_frame
+
+# RiskMetrics daily decay factor
+DEFAULT_DECAY = 0.94
+# A new series is seeded from enough history that older returns would carry less than this weight
+SEED_TOLERANCE = 1e-4
+# Covariance universe covering every security held directly or through funds
+HELD_UNIVERSE = 'HELD'
+
+
+def seed_days(decay):
+    """Trading days after which a return's EWMA weight falls below SEED_TOLERANCE"""
+    return int(np.ceil(np.log(SEED_TOLERANCE) / np.log(decay)))
+
+
+def ewma_variance_update(variance, returns, decay=DEFAULT_DECAY):
+    """Fold returns (T x N, NaN where missing) into each series' variance, one day at a time.
+
+    sigma2_t = decay * sigma2_{t-1} + (1 - decay) * r_t^2. A series with no return on a
+    date keeps its variance; one with no variance yet (NaN) starts from its first squared
+    return. Returns the T x N variance path; its last row is the new state.
+    """
+    variance = np.array(variance, dtype=float)
+    path = np.empty(returns.shape)
+    for t, r in enumerate(returns):
+        square = r * r
+        updated = np.where(np.isnan(variance), square, decay * variance + (1 - decay) * square)
+        variance = np.where(np.isnan(r), variance, updated)
+        path[t] = variance
+    return path
+
+
+def seed_covariance(returns):
+    """Zero-mean second moments of every column pair over the dates both are present"""
+    observed = (~np.isnan(returns)).astype(float)
+    filled = np.nan_to_num(returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (filled.T @ filled) / (observed.T @ observed)
+
+
+def ewma_covariance_update(covariance, returns, decay=DEFAULT_DECAY):
+    """Fold returns (T x N) into an N x N EWMA covariance: Sigma = decay * Sigma + (1 - decay) * r r'.
+
+    Each day costs O(N^2) and touches only the pairs observed together that day; pairs
+    with no estimate yet (NaN) start from their first cross product.
+    """
+    covariance = np.array(covariance, dtype=float)
+    for r in returns:
+        present = np.flatnonzero(~np.isnan(r))
+        if not len(present):
+            continue
+        block = np.ix_(present, present)
+        outer = np.outer(r[present], r[present])
+        current = covariance[block]
+        covariance[block] = np.where(np.isnan(current), outer, decay * current + (1 - decay) * outer)
+    return covariance
+
+
+def load_ewma_volatility(cursor, series_type, series_ids=None, decay=DEFAULT_DECAY):
+    """Latest annualised EWMA volatility per series_id from the stored state"""
+    params = [series_type, decay]
+    condition = ""
+    if series_ids is not None:
+        condition = "AND series_id = ANY(%s)"
+        params.append([int(s) for s in series_ids])
+    cursor.execute(f"""
+        SELECT series_id, SQRT(variance * 252)
+        FROM ewma_variance_state
+        WHERE series_type = %s AND decay = %s {condition}
+    """, params)
+    return pd.Series(dict(cursor.fetchall()), dtype=float)
+
+
+def load_ewma_covariance(cursor, universe_code=HELD_UNIVERSE, decay=DEFAULT_DECAY):
+    """Stored daily EWMA covariance as a security_id x security_id frame (None before the first run)"""
+    state = _load_covariance_state(cursor, universe_code, decay)
+    if state is None:
+        return None
+    _, security_ids, covariance, _ = state
+    return pd.DataFrame(covariance, index=security_ids, columns=security_ids)
+
+
+def _load_covariance_state(cursor, universe_code, decay):
+    cursor.execute("""
+        SELECT as_of_date, security_ids, covariance, n_obs
+        FROM ewma_covariance_state
+        WHERE universe_code = %s AND decay = %s
+    """, [universe_code, decay])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    as_of_date, security_ids, covariance, n_obs = row
+    n = len(security_ids)
+    return as_of_date, list(security_ids), np.frombuffer(bytes(covariance), dtype='<f8').reshape(n, n), n_obs
+
+
+class EwmaRiskEngine:
+    """Incremental EWMA volatility (portfolios and securities) and security covariance.
+
+    Each run reads only the returns after the stored state's date, so a daily run is one
+    O(1) update per series and one O(N^2) update for the covariance matrix. Series and
+    securities without state are seeded once from seed_days(decay) of history.
+    """
+
+    def __init__(self, decay=DEFAULT_DECAY, universe_code=HELD_UNIVERSE):
+        self.db_config = dict(DB_CONFIG)
+        self.decay = decay
+        self.universe_code = universe_code
+
+    def seed_start(self, as_of_date):
+        return as_of_date - timedelta(days=int(seed_days(self.decay) * 7 / 5) + 14)
+
+    def load_returns(self, cursor, series_type, series_ids, start_date, end_date):
+        if series_type == 'portfolio':
+            return load_portfolio_return_panel(cursor, series_ids, start_date, end_date)
+        return load_return_panel(cursor, series_ids, start_date, end_date)
+
+    def load_variance_state(self, cursor, series_type, series_ids=None):
+        params = [series_type, self.decay]
+        condition = ""
+        if series_ids is not None:
+            condition = "AND series_id = ANY(%s)"
+            params.append([int(s) for s in series_ids])
+        cursor.execute(f"""
+            SELECT series_id, as_of_date, variance, n_obs
+            FROM ewma_variance_state
+            WHERE series_type = %s AND decay = %s {condition}
+        """, params)
+        state = pd.DataFrame(cursor.fetchall(), columns=['series_id', 'as_of_date', 'variance', 'n_obs'])
+        return state.set_index('series_id')
+
+    def update_series(self, cursor, series_type, series_ids=None, as_of_date=None):
+        """Advance the variance state of every portfolio or security (or just series_ids) to as_of_date"""
+        as_of_date = as_of_date or datetime.now().date()
+        state = self.load_variance_state(cursor, series_type, series_ids)
+
+        if state.empty:
+            returns = self.load_returns(cursor, series_type, series_ids, self.seed_start(as_of_date), as_of_date)
+        else:
+            # Stated series only need the days since their state; anything new is seeded separately
+            since = state['as_of_date'].min() + timedelta(days=1)
+            returns = self.load_returns(cursor, series_type, series_ids, since, as_of_date)
+            new = sorted(set(series_ids if series_ids is not None else returns.columns) - set(state.index))
+            if new:
+                seeded = self.load_returns(cursor, series_type, new, self.seed_start(as_of_date), as_of_date)
+                returns = pd.concat([returns.drop(columns=new, errors='ignore'), seeded], axis=1).sort_index()
+        if returns.empty:
+            return 0
+
+        ids = returns.columns.values
+        known = state.reindex(ids)
+        R = returns.values.copy()
+        # Drop returns already folded into a series' state
+        folded = pd.to_datetime(known['as_of_date']).values
+        R[returns.index.values[:, None] <= folded[None, :]] = np.nan
+
+        observed = ~np.isnan(R)
+        variance = known['variance'].values.astype(float)
+        fresh = np.isnan(variance)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance[fresh] = np.nansum(R[:, fresh] ** 2, axis=0) / observed[:, fresh].sum(axis=0)
+        path = ewma_variance_update(variance, R, self.decay)
+
+        moved = observed.any(axis=0)
+        if not moved.any():
+            return 0
+        last_row = len(R) - 1 - np.argmax(observed[::-1], axis=0)
+        states = pd.DataFrame({
+            'series_type': series_type, 'series_id': ids[moved], 'decay': self.decay,
+            'as_of_date': returns.index[last_row[moved]].date,
+            'variance': path[-1, moved],
+            'n_obs': known['n_obs'].fillna(0).values[moved].astype(int) + observed.sum(axis=0)[moved],
+        })
+        rows, cols = np.nonzero(observed)
+        history = pd.DataFrame({
+            'series_type': series_type, 'series_id': ids[cols], 'decay': self.decay,
+            'date': returns.index[rows].date, 'volatility': np.sqrt(path[rows, cols] * 252),
+        })
+
+        cursor.execute("""
+            DELETE FROM ewma_variance_state
+            WHERE series_type = %s AND decay = %s AND series_id = ANY(%s)
+        """, [series_type, self.decay, [int(s) for s in states['series_id']]])
+        copy_frame(cursor, 'ewma_variance_state', states)
+        copy_frame(cursor, 'ewma_volatility', history)
+        return len(states)
+
+    def load_universe(self, cursor):
+        if self.universe_code != HELD_UNIVERSE:
+            raise ValueError(f"Unknown covariance universe {self.universe_code}")
+        return sorted(int(s) for s in load_lookthrough(cursor)['security_id'].unique())
+
+    def update_covariance(self, cursor, as_of_date=None):
+        """Advance the universe's covariance matrix to as_of_date, seeding securities new to it"""
+        as_of_date = as_of_date or datetime.now().date()
+        universe = self.load_universe(cursor)
+        if not universe:
+            return None
+        state = _load_covariance_state(cursor, self.universe_code, self.decay)
+
+        if state is None:
+            history = load_return_panel(cursor, universe, self.seed_start(as_of_date), as_of_date)
+            history = history.reindex(columns=universe)
+            covariance = ewma_covariance_update(seed_covariance(history.values), history.values, self.decay)
+            n_obs = int((~np.isnan(history.values)).any(axis=1).sum())
+            last_date = history.index[-1].date() if len(history) else None
+            returns = history.iloc[:0]
+        else:
+            state_date, previous_ids, previous, n_obs = state
+            covariance = pd.DataFrame(previous, index=previous_ids, columns=previous_ids).reindex(
+                index=universe, columns=universe).values
+            new = [s for s in universe if s not in set(previous_ids)]
+            if new:
+                # Seed the new rows and columns over history ending at the state's date
+                history = load_return_panel(cursor, universe, self.seed_start(state_date), state_date)
+                history = history.reindex(columns=universe)
+                seeded = ewma_covariance_update(seed_covariance(history.values), history.values, self.decay)
+                position = [universe.index(s) for s in new]
+                covariance[position, :] = seeded[position, :]
+                covariance[:, position] = seeded[:, position]
+            returns = load_return_panel(cursor, universe, state_date + timedelta(days=1), as_of_date)
+            returns = returns.reindex(columns=universe)
+            last_date = state_date
+
+        if len(returns):
+            covariance = ewma_covariance_update(covariance, returns.values, self.decay)
+            n_obs += int((~np.isnan(returns.values)).any(axis=1).sum())
+            last_date = returns.index[-1].date()
+        if last_date is None:
+            return None
+
+        cursor.execute("""
+            INSERT INTO ewma_covariance_state (universe_code, decay, as_of_date, security_ids, covariance, n_obs)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (universe_code, decay) DO UPDATE SET
+                as_of_date = EXCLUDED.as_of_date,
+                security_ids = EXCLUDED.security_ids,
+                covariance = EXCLUDED.covariance,
+                n_obs = EXCLUDED.n_obs,
+                updated_at = CURRENT_TIMESTAMP
+        """, [self.universe_code, self.decay, last_date, universe,
+              psycopg2.Binary(np.ascontiguousarray(covariance, dtype='<f8').tobytes()), n_obs])
+        return covariance
+
+    def reset(self, cursor):
+        """Forget all state for this decay so the next update reseeds from history"""
+        cursor.execute("DELETE FROM ewma_variance_state WHERE decay = %s", [self.decay])
+        cursor.execute("DELETE FROM ewma_volatility WHERE decay = %s", [self.decay])
+        cursor.execute("DELETE FROM ewma_covariance_state WHERE universe_code = %s AND decay = %s",
+                       [self.universe_code, self.decay])
+
+    def update(self, as_of_date=None, rebuild=False):
+        """Advance every portfolio, security and the covariance universe to as_of_date"""
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+        if rebuild:
+            self.reset(cursor)
+
+        portfolios = self.update_series(cursor, 'portfolio', as_of_date=as_of_date)
+        securities = self.update_series(cursor, 'security', as_of_date=as_of_date)
+        covariance = self.update_covariance(cursor, as_of_date)
+
+        bump_data_version(cursor, 'ewma_risk')
+        conn.commit()
+        conn.close()
+
+        size = 0 if covariance is None else len(covariance)
+        print(f" EWMA (decay {self.decay}): advanced {portfolios} portfolios, {securities} securities, "
+              f"{size} x {size} covariance")
+        return portfolios, securities, covariance
+
+
+if __name__ == "__main__":
+    EwmaRiskEngine().update()
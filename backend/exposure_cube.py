@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import (load_lookthrough, node_residual_weights, load_securities, load_holdings_history,
+                         copy_frame)
+from fund_holdings import load_dirty_portfolios, clear_dirty_portfolios
+
+# Cube dimensions, coarsest first; every cell is keyed by all of them
+DIMENSIONS = ['layer', 'asset_class', 'country', 'currency', 'security_type']
+UNCLASSIFIED = {'asset_class': 'Unclassified', 'country': 'Unknown', 'currency': 'XXX', 'security_type': 'Unknown'}
+CELL_COLUMNS = DIMENSIONS + ['weight', 'market_value', 'n_securities']
+
+
+def lookthrough_shares(nodes):
+    """Share of a direct holding that each of its lookthrough nodes keeps for itself.
+
+    nodes is node_residual_weights() output. A fund splits the same way whichever
+    portfolio holds it, so each direct security (root_id) is split once.
+    """
+    root_path = nodes['holding_path'].str.partition(' -> ')[0]
+    direct = (nodes[nodes['level'] == 1]
+              .drop_duplicates(['portfolio_id', 'holding_path'])
+              .set_index(['portfolio_id', 'holding_path']))
+    key = pd.MultiIndex.from_arrays([nodes['portfolio_id'], root_path])
+    root_weight = direct['portfolio_weight'].reindex(key).values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(root_weight != 0, nodes['residual_weight'].values / root_weight, np.nan)
+    shares = pd.DataFrame({
+        'root_id': direct['security_id'].reindex(key).values,
+        'holding_path': nodes['holding_path'].values,
+        'node_id': nodes['security_id'].values,
+        'level': nodes['level'].values,
+        'share': share,
+    }).dropna()
+    return (shares.drop_duplicates(['root_id', 'holding_path'])
+            .astype({'root_id': int})
+            .drop(columns='holding_path'))
+
+
+def expand_holdings(holdings, shares):
+    """Lookthrough nodes of direct holdings snapshots, each holding split by its shares.
+
+    Holdings without a split (no longer held by anyone today) stay whole at level 1.
+    Weight and market value are the node's residual part of its direct holding.
+    """
+    nodes = holdings.merge(shares, left_on='security_id', right_on='root_id', how='left')
+    share = nodes['share'].fillna(1.0).values
+    return pd.DataFrame({
+        'portfolio_id': nodes['portfolio_id'].values,
+        'date': nodes['date'].values,
+        'security_id': nodes['node_id'].fillna(nodes['security_id']).astype(int).values,
+        'level': nodes['level'].fillna(1).astype(int).values,
+        'weight': nodes['weight'].values * share,
+        'market_value': nodes['market_value'].fillna(0.0).values * share,
+    })
+
+
+def cube_cells(nodes, securities):
+    """Lookthrough weight and value per portfolio, snapshot date and dimension combination.
+
+    nodes is expand_holdings() output, so no weight is double counted across layers.
+    """
+    attributes = securities.reindex(nodes['security_id'].values)
+    cells = pd.DataFrame({
+        'portfolio_id': nodes['portfolio_id'].values,
+        'date': nodes['date'].values,
+        'layer': nodes['level'].values,
+        **{column: attributes[column].fillna(default).values for column, default in UNCLASSIFIED.items()},
+        'weight': nodes['weight'].values,
+        'market_value': nodes['market_value'].values,
+        'security_id': nodes['security_id'].values,
+    })
+    cells = cells[cells['weight'] != 0]
+    return (cells.groupby(['portfolio_id', 'date'] + DIMENSIONS, as_index=False)
+            .agg(weight=('weight', 'sum'), market_value=('market_value', 'sum'),
+                 n_securities=('security_id', 'nunique')))
+
+
+def fingerprints(cells):
+    """Order-independent hash of each (portfolio, snapshot date)'s cells, rounded to storage noise.
+
+    Market value stays in the hash: carried-forward rows copy it, so a match must mean it
+    is unchanged too. It comes from the holdings snapshot, not daily prices, so it only
+    moves when a new snapshot is written.
+    """
+    rounded = cells[CELL_COLUMNS].assign(weight=cells['weight'].round(10),
+                                         market_value=cells['market_value'].round(2))
+    hashes = pd.util.hash_pandas_object(rounded, index=False).values
+    # Sum with uint64 wrap-around, then fold into BIGINT range
+    key = pd.MultiIndex.from_frame(cells[['portfolio_id', 'date']])
+    sums = pd.Series(hashes, index=key).groupby(level=[0, 1]).sum()
+    return (sums.astype(np.uint64) >> np.uint64(1)).astype(np.int64)
+
+
+class ExposureCube:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_fingerprints(self, cursor, as_of_date):
+        """Latest stored fingerprint per portfolio on or before as_of_date, with its date"""
+        cursor.execute("""
+            SELECT DISTINCT ON (portfolio_id) portfolio_id, date, fingerprint
+            FROM exposure_cube_builds
+            WHERE date <= %s
+            ORDER BY portfolio_id, date DESC
+        """, [as_of_date])
+        stored = pd.DataFrame(cursor.fetchall(), columns=['portfolio_id', 'date', 'fingerprint'])
+        # Nullable ints keep 64-bit fingerprints exact when reindexed against new portfolios
+        return stored.astype({'fingerprint': 'Int64'}).set_index('portfolio_id')
+
+    def schedule(self, holdings, stored, dirty, dates):
+        """Source of every (portfolio, date) in the range: its snapshot in force, and whether
+        to carry it forward from the portfolio's last build before the range.
+
+        A portfolio is recomputed from its first holdings snapshot after that build, or over
+        the whole range when queued in lookthrough_dirty_portfolios or never built; earlier
+        dates are carried. Dates before a portfolio's first snapshot are left out.
+        """
+        snapshots = holdings[['portfolio_id', 'date']].drop_duplicates()
+        portfolio_ids = sorted(int(p) for p in snapshots['portfolio_id'].unique())
+        last_build = pd.to_datetime(stored['date']).reindex(portfolio_ids)
+
+        new = snapshots[snapshots['date'].values > last_build.reindex(snapshots['portfolio_id']).values]
+        since = new.groupby('portfolio_id')['date'].min().reindex(portfolio_ids).clip(lower=dates[0])
+        since[last_build.isna().values | since.index.isin(dirty)] = dates[0]
+
+        grid = pd.DataFrame({
+            'portfolio_id': np.repeat(portfolio_ids, len(dates)),
+            'date': np.tile(dates.values.astype('datetime64[ns]'), len(portfolio_ids)),
+        })
+        grid = pd.merge_asof(grid.sort_values('date'),
+                             snapshots.assign(snapshot=snapshots['date']).sort_values('date'),
+                             on='date', by='portfolio_id', direction='backward')
+        grid = grid.dropna(subset=['snapshot'])
+        grid['carry'] = ~(grid['date'].values >= since.reindex(grid['portfolio_id']).values)
+        return grid.sort_values(['portfolio_id', 'date'], ignore_index=True)
+
+    def build(self, start_date=None, end_date=None):
+        """Roll the lookthrough into the cube for every date in [start_date, end_date] (default today).
+
+        Each date's cells are the direct holdings in force on it (load_holdings_history)
+        split by today's fund lookthrough, so past dates can be backfilled. Only portfolios
+        with new holdings snapshots, queued fund changes or no earlier build are recomputed;
+        other dates, and recomputed cells whose fingerprint matches the last build, are
+        carried forward inside the database instead of being rewritten.
+        """
+        end_date = end_date or datetime.now().date()
+        start_date = start_date or end_date
+        started = datetime.now()
+        dates = pd.date_range(start_date, end_date)
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        holdings = load_holdings_history(cursor, None, start_date, end_date)
+        if holdings.empty:
+            print(" No portfolio holdings found!")
+            conn.close()
+            return None
+        holdings['date'] = pd.to_datetime(holdings['date']).astype('datetime64[ns]')
+        stored = self.load_fingerprints(cursor, start_date - timedelta(days=1))
+        dirty = load_dirty_portfolios(cursor)
+        grid = self.schedule(holdings, stored, dirty, dates)
+
+        # Cells for each snapshot some recomputed date is in force from
+        needed = pd.MultiIndex.from_frame(grid.loc[~grid['carry'], ['portfolio_id', 'snapshot']])
+        holdings = holdings[pd.MultiIndex.from_frame(holdings[['portfolio_id', 'date']]).isin(needed)]
+        shares = lookthrough_shares(node_residual_weights(load_lookthrough(cursor)))
+        cells = cube_cells(expand_holdings(holdings, shares), load_securities(cursor))
+        current = fingerprints(cells)
+
+        # A snapshot with no cells hashes like an empty sum
+        previous = stored['fingerprint'].reindex(grid['portfolio_id']).reset_index(drop=True)
+        computed = (current.astype('Int64')
+                    .reindex(pd.MultiIndex.from_frame(grid[['portfolio_id', 'snapshot']]))
+                    .reset_index(drop=True).fillna(0))
+        grid['carry'] |= computed.eq(previous).fillna(False).astype(bool).values
+        grid['fingerprint'] = computed.where(~grid['carry'], previous).astype('int64').values
+        carried, written = grid[grid['carry']], grid[~grid['carry']]
+
+        cursor.execute("DELETE FROM exposure_cube WHERE date BETWEEN %s AND %s", [start_date, end_date])
+        if len(carried):
+            cursor.execute(f"""
+                INSERT INTO exposure_cube (portfolio_id, date, {', '.join(CELL_COLUMNS)})
+                SELECT c.portfolio_id, p.date, {', '.join(f'c.{c}' for c in CELL_COLUMNS)}
+                FROM exposure_cube c
+                JOIN unnest(%s::int[], %s::date[], %s::date[]) AS p(portfolio_id, source_date, date)
+                    ON c.portfolio_id = p.portfolio_id AND c.date = p.source_date
+            """, [[int(p) for p in carried['portfolio_id']],
+                  list(stored['date'].reindex(carried['portfolio_id'])),
+                  [d.date() for d in carried['date']]])
+        if len(written):
+            rows = cells.rename(columns={'date': 'snapshot'}).merge(
+                written[['portfolio_id', 'snapshot', 'date']], on=['portfolio_id', 'snapshot'])
+            copy_frame(cursor, 'exposure_cube', rows.assign(date=rows['date'].dt.date)[
+                ['portfolio_id', 'date'] + CELL_COLUMNS])
+
+        cursor.execute("DELETE FROM exposure_cube_builds WHERE date BETWEEN %s AND %s", [start_date, end_date])
+        copy_frame(cursor, 'exposure_cube_builds', pd.DataFrame({
+            'portfolio_id': grid['portfolio_id'], 'date': grid['date'].dt.date,
+            'fingerprint': grid['fingerprint']}))
+
+        # Queued fund changes are rolled up once the range reaches today
+        if end_date >= started.date():
+            clear_dirty_portfolios(cursor, dirty, started)
+
+        bump_data_version(cursor, 'exposure_cube')
+        conn.commit()
+        conn.close()
+
+        print(f" Exposure cube {start_date} to {end_date}: {written['portfolio_id'].nunique()} portfolios "
+              f"rebuilt on {len(written)} dates, {len(carried)} portfolio dates carried forward")
+        return cells
+
+
+if __name__ == "__main__":
+    ExposureCube().build()
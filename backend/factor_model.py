@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_securities, load_lookthrough, effective_weights, ewma_weights
+from series_store import load_stored_prices, load_stored_returns
+
+# Style factor definitions (trading-day lookbacks)
+MOMENTUM_LOOKBACK = 252
+MOMENTUM_SKIP = 21
+VOLATILITY_LOOKBACK = 63
+
+
+def standardize(panel, clip=3.0):
+    """Cross-sectional z-score per date, winsorised; missing values get a neutral 0"""
+    mean = panel.mean(axis=1)
+    std = panel.std(axis=1).replace(0.0, np.nan)
+    z = panel.sub(mean, axis=0).div(std, axis=0)
+    return z.clip(-clip, clip).fillna(0.0)
+
+
+def cross_sectional_regression(returns, exposures, ridge=1e-8):
+    """Solve one least-squares regression per date over the securities observed on it, all dates at once.
+
+    returns:   T x N array (NaN = no observation)
+    exposures: T x N x K array of exposures known at the start of each date
+    Returns (factor_returns T x K, residuals T x N, r_squared T).
+    """
+    T, N, K = exposures.shape
+    observed = ~np.isnan(returns)
+    r = np.where(observed, returns, 0.0)
+    w = observed.astype(float)
+
+    Xw = exposures * w[:, :, None]
+    A = np.einsum('tnk,tnl->tkl', Xw, exposures) + ridge * np.eye(K)
+    b = np.einsum('tnk,tn->tk', Xw, r)
+    factor_returns = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+
+    fitted = np.einsum('tnk,tk->tn', exposures, factor_returns)
+    residuals = np.where(observed, r - fitted, np.nan)
+
+    # Dates without enough names to identify K factors carry no information
+    enough = observed.sum(axis=1) > K
+    factor_returns[~enough] = np.nan
+    residuals[~enough] = np.nan
+
+    mean = (r * w).sum(axis=1, keepdims=True) / np.maximum(w.sum(axis=1, keepdims=True), 1)
+    total_ss = (((r - mean) ** 2) * w).sum(axis=1)
+    resid_ss = np.nansum(residuals ** 2, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_squared = np.where(total_ss > 0, 1 - resid_ss / total_ss, np.nan)
+    r_squared[~enough] = np.nan
+
+    return factor_returns, residuals, r_squared
+
+
+def ewma_covariance(factor_returns, half_life):
+    """EWMA covariance of a T x K factor return history (dates with NaN dropped).
+
+    Returns None when no date has every factor return.
+    """
+    f = factor_returns[~np.isnan(factor_returns).any(axis=1)]
+    if len(f) == 0:
+        return None
+    w = ewma_weights(len(f), half_life)
+    centered = f - w @ f
+    return (centered * w[:, None]).T @ centered
+
+
+def ewma_specific_variance(residuals, half_life):
+    """EWMA residual variance per security, ignoring dates a security was not observed"""
+    w = ewma_weights(residuals.shape[0], half_life)[:, None]
+    observed = ~np.isnan(residuals)
+    weight = (w * observed).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight > 0,
+                        (w * np.where(observed, residuals, 0.0) ** 2).sum(axis=0) / weight,
+                        np.nan)
+
+
+class FactorRiskModel:
+    def __init__(self, half_life=90, window=252):
+        self.db_config = dict(DB_CONFIG)
+        self.half_life = half_life
+        self.window = window
+
+    def ensure_country_factors(self, cursor, countries):
+        """Create COUNTRY_<code> factors on first sight and return code -> factor_id"""
+        execute_values(cursor, """
+            INSERT INTO risk_factors (code, name, factor_type)
+            VALUES %s
+            ON CONFLICT (code) DO NOTHING
+        """, [(f"COUNTRY_{c}", f"Country: {c}", 'Country') for c in countries])
+
+        cursor.execute("SELECT code, factor_id FROM risk_factors WHERE is_active = TRUE")
+        return dict(cursor.fetchall())
+
+    def build_exposures(self, prices, returns, securities, window=None):
+        """Exposure tensor (dates x securities x factors) built with panel operations.
+
+        Returns are the stored daily returns; prices only feed momentum. Style exposures
+        are lagged one day so each date's regression only uses information available at
+        its start. Styles look back over the whole history, but the tensor only covers
+        the last window dates (all when None).
+        """
+        returns = returns.reindex(columns=prices.columns)
+        momentum = prices.shift(MOMENTUM_SKIP) / prices.shift(MOMENTUM_LOOKBACK) - 1
+        volatility = returns.rolling(VOLATILITY_LOOKBACK, min_periods=VOLATILITY_LOOKBACK // 2).std()
+
+        styles = {
+            'MOMENTUM': standardize(momentum.reindex(returns.index).shift(1)),
+            'VOLATILITY': standardize(volatility.shift(1)),
+        }
+        if window is not None:
+            returns = returns.iloc[-window:]
+            styles = {code: panel.iloc[-window:] for code, panel in styles.items()}
+
+        countries = securities.loc[returns.columns, 'country'].fillna('OTHER')
+        dummies = pd.get_dummies(countries, prefix='COUNTRY', prefix_sep='_').astype(float)
+
+        factor_codes = list(dummies.columns) + list(styles)
+        T, N = returns.shape
+        X = np.empty((T, N, len(factor_codes)))
+        X[:, :, :dummies.shape[1]] = dummies.values[None, :, :]
+        for k, code in enumerate(styles, start=dummies.shape[1]):
+            X[:, :, k] = styles[code].values
+
+        return returns, X, factor_codes
+
+    def estimate(self, model_date=None):
+        """Run the cross-sectional regressions and persist covariance and specific risk"""
+        model_date = model_date or datetime.now().date()
+        lookback_days = int((self.window + MOMENTUM_LOOKBACK) * 7 / 5) + 30
+        print(f" Estimating factor model as of {model_date} (window {self.window}, half-life {self.half_life})...")
+
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        securities = load_securities(cursor)
+        # Funds stay in the cross-section so weight not explained by their published
+        # constituents still carries risk; cash has none
+        modelled = securities[securities['security_type'] != 'Cash']
+
+        prices = load_stored_prices(cursor, modelled.index,
+                                    start_date=model_date - timedelta(days=lookback_days),
+                                    end_date=model_date)
+        if prices.empty:
+            print(" No prices available for factor model")
+            conn.close()
+            return None
+        returns = load_stored_returns(cursor, prices.columns,
+                                      start_date=prices.index[0] + timedelta(days=1),
+                                      end_date=model_date)
+
+        returns, X, factor_codes = self.build_exposures(prices, returns, modelled, self.window)
+
+        factor_returns, residuals, r_squared = cross_sectional_regression(returns.values, X)
+        covariance = ewma_covariance(factor_returns, self.half_life)
+        if covariance is None:
+            print(" No regression date identifies every factor; factor model not stored")
+            conn.close()
+            return None
+        specific = ewma_specific_variance(residuals, self.half_life)
+
+        factor_ids = self.ensure_country_factors(
+            cursor, [c[len('COUNTRY_'):] for c in factor_codes if c.startswith('COUNTRY_')])
+        ids = [factor_ids[code] for code in factor_codes]
+        security_ids = [int(s) for s in returns.columns]
+
+        cursor.execute("DELETE FROM factor_model_runs WHERE model_date = %s", [model_date])
+        cursor.execute("""
+            INSERT INTO factor_model_runs (model_date, half_life_days, window_days,
+                                           num_securities, num_factors, avg_r_squared)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [model_date, self.half_life, self.window, len(security_ids), len(ids),
+              float(np.nanmean(r_squared)) if np.isfinite(r_squared).any() else None])
+
+        valid_dates = ~np.isnan(factor_returns).any(axis=1)
+        execute_values(cursor, """
+            INSERT INTO factor_returns (factor_id, date, factor_return) VALUES %s
+            ON CONFLICT (factor_id, date) DO UPDATE SET factor_return = EXCLUDED.factor_return
+        """, [(ids[k], d.date(), float(factor_returns[t, k]))
+              for t, d in enumerate(returns.index) if valid_dates[t]
+              for k in range(len(ids))], page_size=5000)
+
+        cursor.execute("DELETE FROM factor_exposures WHERE date = %s", [model_date])
+        latest = X[-1]
+        execute_values(cursor, """
+            INSERT INTO factor_exposures (date, factor_id, security_id, exposure) VALUES %s
+        """, [(model_date, ids[k], security_ids[n], float(latest[n, k]))
+              for n in range(len(security_ids)) for k in range(len(ids))
+              if latest[n, k] != 0.0], page_size=5000)
+
+        execute_values(cursor, """
+            INSERT INTO factor_covariance (model_date, factor_id_1, factor_id_2, covariance) VALUES %s
+        """, [(model_date, ids[i], ids[j], float(covariance[i, j]))
+              for i in range(len(ids)) for j in range(len(ids))])
+
+        execute_values(cursor, """
+            INSERT INTO specific_risk (model_date, security_id, specific_variance) VALUES %s
+        """, [(model_date, security_ids[n], float(specific[n]))
+              for n in range(len(security_ids)) if np.isfinite(specific[n])], page_size=5000)
+
+        bump_data_version(cursor, 'factor_model')
+        conn.commit()
+        conn.close()
+
+        print(f" Factor model: {len(security_ids)} securities, {len(ids)} factors, "
+              f"{int(valid_dates.sum())} regression dates, avg R² {np.nanmean(r_squared):.3f}")
+        return model_date
+
+    def load_model(self, cursor, model_date=None):
+        """Load exposures (N x K), factor covariance (K x K) and specific variance (N)"""
+        if model_date is None:
+            cursor.execute("SELECT MAX(model_date) FROM factor_model_runs")
+            model_date = cursor.fetchone()[0]
+            if model_date is None:
+                return None
+
+        cursor.execute("""
+            SELECT factor_id_1, factor_id_2, covariance FROM factor_covariance
+            WHERE model_date = %s
+        """, [model_date])
+        cov = pd.DataFrame(cursor.fetchall(), columns=['f1', 'f2', 'cov'])
+        covariance = cov.pivot(index='f1', columns='f2', values='cov')
+        factor_ids = list(covariance.index)
+
+        cursor.execute("""
+            SELECT security_id, factor_id, exposure FROM factor_exposures WHERE date = %s
+        """, [model_date])
+        exp = pd.DataFrame(cursor.fetchall(), columns=['security_id', 'factor_id', 'exposure'])
+
+        cursor.execute("""
+            SELECT security_id, specific_variance FROM specific_risk WHERE model_date = %s
+        """, [model_date])
+        specific = pd.Series(dict(cursor.fetchall()), dtype=float)
+
+        exposures = (exp.pivot(index='security_id', columns='factor_id', values='exposure')
+                     .reindex(index=specific.index, columns=factor_ids).fillna(0.0))
+        return {
+            'model_date': model_date,
+            'factor_ids': factor_ids,
+            'exposures': exposures,
+            'covariance': covariance.loc[factor_ids, factor_ids].values,
+            'specific_variance': specific,
+        }
+
+    def portfolio_risk(self, weights, model):
+        """Factor risk for a portfolios x securities weight matrix in K x K space.
+
+        Securities outside the model (cash, names without price history) add no risk.
+        """
+        W = weights.reindex(columns=model['exposures'].index, fill_value=0.0).values
+        B = model['exposures'].values
+        F = model['covariance']
+        s = model['specific_variance'].values
+
+        portfolio_exposures = W @ B                                   # P x K
+        factor_var = np.einsum('pk,kl,pl->p', portfolio_exposures, F, portfolio_exposures)
+        specific_var = (W ** 2) @ s
+        total_var = factor_var + specific_var
+        with np.errstate(invalid='ignore', divide='ignore'):
+            contributions = np.where(total_var[:, None] > 0,
+                                     portfolio_exposures * (portfolio_exposures @ F) / total_var[:, None],
+                                     0.0)
+
+        return {
+            'portfolio_ids': list(weights.index),
+            'exposures': portfolio_exposures,
+            'variance_contributions': contributions,
+            'total_volatility': np.sqrt(total_var * 252),
+            'factor_volatility': np.sqrt(factor_var * 252),
+            'specific_volatility': np.sqrt(specific_var * 252),
+        }
+
+    def calculate_portfolio_factor_risk(self, model_date=None):
+        """Factor risk for every portfolio's lookthrough holdings, persisted per model date"""
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        model = self.load_model(cursor, model_date)
+        if model is None:
+            print(" No factor model estimated yet")
+            conn.close()
+            return None
+
+        weights = effective_weights(load_lookthrough(cursor))
+        if weights.empty:
+            print(" No lookthrough holdings found!")
+            conn.close()
+            return None
+
+        risk = self.portfolio_risk(weights, model)
+        model_date = model['model_date']
+
+        execute_values(cursor, """
+            INSERT INTO portfolio_factor_risk (portfolio_id, model_date, total_volatility,
+                                               factor_volatility, specific_volatility)
+            VALUES %s
+            ON CONFLICT (portfolio_id, model_date) DO UPDATE SET
+                total_volatility = EXCLUDED.total_volatility,
+                factor_volatility = EXCLUDED.factor_volatility,
+                specific_volatility = EXCLUDED.specific_volatility
+        """, [(int(p), model_date, float(risk['total_volatility'][i]),
+               float(risk['factor_volatility'][i]), float(risk['specific_volatility'][i]))
+              for i, p in enumerate(risk['portfolio_ids'])])
+
+        execute_values(cursor, """
+            INSERT INTO portfolio_factor_exposures (portfolio_id, model_date, factor_id,
+                                                    exposure, variance_contribution)
+            VALUES %s
+            ON CONFLICT (portfolio_id, model_date, factor_id) DO UPDATE SET
+                exposure = EXCLUDED.exposure,
+                variance_contribution = EXCLUDED.variance_contribution
+        """, [(int(p), model_date, int(f), float(risk['exposures'][i, k]),
+               float(risk['variance_contributions'][i, k]))
+              for i, p in enumerate(risk['portfolio_ids'])
+              for k, f in enumerate(model['factor_ids'])])
+
+        bump_data_version(cursor, 'factor_model')
+        conn.commit()
+        conn.close()
+
+        for i, p in enumerate(risk['portfolio_ids']):
+            print(f"   Portfolio {p}: total vol {risk['total_volatility'][i]*100:.1f}% "
+                  f"(factor {risk['factor_volatility'][i]*100:.1f}%, "
+                  f"specific {risk['specific_volatility'][i]*100:.1f}%)")
+        return risk
+
+
+if __name__ == "__main__":
+    model = FactorRiskModel()
+    if model.estimate():
+        model.calculate_portfolio_factor_risk()
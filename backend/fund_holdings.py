@@ -0,0 +1,220 @@
+import sys
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_identifier_index, resolve_identifiers, copy_frame
+
+# Differences below storage precision (weight DECIMAL(8,6), market_value DECIMAL(20,2)) are not changes
+WEIGHT_TOLERANCE = 5e-7
+VALUE_TOLERANCE = 0.005
+# Holdings within this many days of a load count as current when finding affected portfolios
+DIRTY_LOOKBACK_DAYS = 7
+VALUE_COLUMNS = ['shares', 'market_value', 'weight']
+
+
+def read_constituent_file(path):
+    """Issuer constituent file as rows of identifiers plus shares, market_value and weight (0-1)"""
+    frame = pd.read_csv(path, dtype=str)
+    frame.columns = [c.strip().lower().replace(' ', '_') for c in frame.columns]
+    for column in VALUE_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_numeric(frame[column].str.replace(',', '').str.rstrip('%'),
+                                          errors='coerce')
+        else:
+            frame[column] = np.nan
+    frame = frame.dropna(subset=['weight'])
+    # Issuer files usually quote percentages
+    if frame['weight'].sum() > 1.5:
+        frame['weight'] = frame['weight'] / 100.0
+    return frame
+
+
+def diff_snapshots(current, previous):
+    """Rows added, removed or changed between two long snapshots keyed (fund, underlying).
+
+    Both frames carry fund_security_id, underlying_security_id and VALUE_COLUMNS. One
+    outer merge classifies every row; unchanged rows are dropped from the result.
+    """
+    keys = ['fund_security_id', 'underlying_security_id']
+    merged = current.merge(previous, on=keys, how='outer', suffixes=('', '_previous'), indicator=True)
+
+    def differs(column, tolerance):
+        new, old = merged[column], merged[f'{column}_previous']
+        return ((new - old).abs() > tolerance) | (new.isna() != old.isna())
+
+    changed = differs('weight', WEIGHT_TOLERANCE) | differs('market_value', VALUE_TOLERANCE) | differs('shares', 0)
+    merged['change_type'] = np.select(
+        [merged['_merge'] == 'left_only', merged['_merge'] == 'right_only', changed],
+        ['added', 'removed', 'changed'], default='')
+    delta = merged[merged['change_type'] != '']
+    return delta.assign(previous_weight=delta['weight_previous'])[
+        keys + ['change_type'] + VALUE_COLUMNS + ['previous_weight']]
+
+
+def load_dirty_portfolios(cursor):
+    """Portfolios queued for lookthrough refresh, oldest mark first"""
+    cursor.execute("SELECT portfolio_id FROM lookthrough_dirty_portfolios ORDER BY marked_at, portfolio_id")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def clear_dirty_portfolios(cursor, portfolio_ids, refreshed_at):
+    """Dequeue portfolios refreshed at refreshed_at, keeping any marked again since"""
+    cursor.execute("""
+        DELETE FROM lookthrough_dirty_portfolios
+        WHERE portfolio_id = ANY(%s) AND marked_at <= %s
+    """, [[int(p) for p in portfolio_ids], refreshed_at])
+
+
+class FundHoldingsLoader:
+    def __init__(self, data_source='Issuer File'):
+        self.db_config = dict(DB_CONFIG)
+        self.data_source = data_source
+
+    def load_previous_snapshots(self, cursor, fund_ids, as_of_date):
+        """Each fund's latest snapshot before as_of_date, and that snapshot's date"""
+        cursor.execute("""
+            SELECT fh.fund_security_id, fh.underlying_security_id,
+                   fh.shares::float8, fh.market_value::float8, fh.weight::float8, fh.date
+            FROM fund_holdings fh
+            JOIN (
+                SELECT fund_security_id, MAX(date) AS date
+                FROM fund_holdings
+                WHERE fund_security_id = ANY(%s) AND date < %s
+                GROUP BY fund_security_id
+            ) latest ON fh.fund_security_id = latest.fund_security_id AND fh.date = latest.date
+        """, [list(fund_ids), as_of_date])
+        previous = pd.DataFrame(cursor.fetchall(), columns=[
+            'fund_security_id', 'underlying_security_id'] + VALUE_COLUMNS + ['date'])
+        dates = previous.groupby('fund_security_id')['date'].first().to_dict()
+        return previous.drop(columns='date'), dates
+
+    def mark_dirty(self, cursor, fund_ids, as_of_date):
+        """Queue every portfolio holding a changed fund, directly or through other funds"""
+        since = as_of_date - timedelta(days=DIRTY_LOOKBACK_DAYS)
+        cursor.execute("""
+            WITH RECURSIVE affected(security_id) AS (
+                SELECT unnest(%s::int[])
+                UNION
+                SELECT fh.fund_security_id
+                FROM fund_holdings fh
+                JOIN affected a ON fh.underlying_security_id = a.security_id
+                WHERE fh.date >= %s
+            )
+            INSERT INTO lookthrough_dirty_portfolios (portfolio_id, reason)
+            SELECT DISTINCT ph.portfolio_id, 'fund holdings ' || %s::text
+            FROM portfolio_holdings ph
+            JOIN affected a ON ph.security_id = a.security_id
+            WHERE ph.date >= %s
+            ON CONFLICT (portfolio_id) DO UPDATE SET
+                marked_at = CURRENT_TIMESTAMP,
+                reason = EXCLUDED.reason
+        """, [list(fund_ids), since, as_of_date, since])
+        return cursor.rowcount
+
+    def load_files(self, files, as_of_date=None):
+        """Bulk load issuer constituent files: {fund identifier (ticker/ISIN): CSV path}.
+
+        Every file is resolved against one in-memory identifier index and diffed against
+        its fund's previous snapshot. Only the delta is sent (COPY into
+        fund_holding_changes); the new snapshot is the previous one carried forward inside
+        the database with the delta applied.
+        """
+        as_of_date = as_of_date or datetime.now().date()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+        index = load_identifier_index(cursor)
+
+        frames, unresolved = [], 0
+        for fund, path in files.items():
+            key = str(fund).strip().upper()
+            fund_id = index['isin'].get(key) or index['ticker'].get(key)
+            if fund_id is None:
+                print(f" {fund} not found in securities, skipping {path}")
+                continue
+            frame = read_constituent_file(path)
+            frame['underlying_security_id'] = resolve_identifiers(frame, index)
+            missing = frame['underlying_security_id'].isna()
+            if missing.any():
+                unresolved += int(missing.sum())
+                print(f"Warning: {fund}: {int(missing.sum())} rows ({frame.loc[missing, 'weight'].sum():.2%} "
+                      f"weight) did not match any security identifier")
+            frames.append(frame[~missing].assign(fund_security_id=fund_id))
+
+        if not frames:
+            conn.close()
+            return None
+        current = (pd.concat(frames, ignore_index=True)
+                   .groupby(['fund_security_id', 'underlying_security_id'], as_index=False)[VALUE_COLUMNS]
+                   .sum(min_count=1))
+        current['underlying_security_id'] = current['underlying_security_id'].astype(int)
+        # Values the issuer does not quote are stored as 0 (market_value is NOT NULL), so
+        # compare against the stored snapshot on the same footing
+        current['market_value'] = current['market_value'].fillna(0.0)
+        fund_ids = [int(f) for f in current['fund_security_id'].unique()]
+
+        previous, previous_dates = self.load_previous_snapshots(cursor, fund_ids, as_of_date)
+        delta = diff_snapshots(current, previous)
+        delta.insert(2, 'date', as_of_date)
+        delta.insert(4, 'previous_date', delta['fund_security_id'].map(previous_dates))
+
+        # Reloading a date replaces that date's snapshot and delta
+        cursor.execute("DELETE FROM fund_holdings WHERE fund_security_id = ANY(%s) AND date = %s",
+                       [fund_ids, as_of_date])
+        cursor.execute("DELETE FROM fund_holding_changes WHERE fund_security_id = ANY(%s) AND date = %s",
+                       [fund_ids, as_of_date])
+        copy_frame(cursor, 'fund_holding_changes', delta)
+
+        # Unchanged rows: carry the previous snapshot forward without sending it
+        cursor.execute("""
+            INSERT INTO fund_holdings (fund_security_id, underlying_security_id, date,
+                                       shares, market_value, weight, data_source, is_estimated)
+            SELECT prev.fund_security_id, prev.underlying_security_id, %s,
+                   prev.shares, prev.market_value, prev.weight, prev.data_source, prev.is_estimated
+            FROM fund_holdings prev
+            JOIN unnest(%s::int[], %s::date[]) AS f(fund_security_id, date)
+                ON prev.fund_security_id = f.fund_security_id AND prev.date = f.date
+            WHERE NOT EXISTS (
+                SELECT 1 FROM fund_holding_changes c
+                WHERE c.fund_security_id = prev.fund_security_id AND c.date = %s
+                AND c.underlying_security_id = prev.underlying_security_id
+            )
+        """, [as_of_date, list(previous_dates), list(previous_dates.values()), as_of_date])
+        carried = cursor.rowcount
+
+        # Added and changed rows come from the delta just written
+        cursor.execute("""
+            INSERT INTO fund_holdings (fund_security_id, underlying_security_id, date,
+                                       shares, market_value, weight, data_source)
+            SELECT fund_security_id, underlying_security_id, date, shares, market_value, weight, %s
+            FROM fund_holding_changes
+            WHERE fund_security_id = ANY(%s) AND date = %s AND change_type <> 'removed'
+        """, [self.data_source, fund_ids, as_of_date])
+
+        changed_funds = sorted(int(f) for f in delta['fund_security_id'].unique())
+        dirty = self.mark_dirty(cursor, changed_funds, as_of_date) if changed_funds else 0
+
+        bump_data_version(cursor, 'fund_holdings')
+        conn.commit()
+        conn.close()
+
+        counts = delta['change_type'].value_counts()
+        print(f"Loaded {len(current)} holdings for {len(fund_ids)} funds as of {as_of_date}: "
+              f"{counts.get('added', 0)} added, {counts.get('changed', 0)} changed, "
+              f"{counts.get('removed', 0)} removed, {carried} carried forward; "
+              f"{dirty} portfolios marked for lookthrough refresh")
+        return delta
+
+
+if __name__ == "__main__":
+    # python fund_holdings.py VGS vgs_holdings.csv [IVV ivv_holdings.csv ...] [--date YYYY-MM-DD]
+    args = sys.argv[1:]
+    as_of = None
+    if '--date' in args:
+        position = args.index('--date')
+        as_of = datetime.strptime(args[position + 1], '%Y-%m-%d').date()
+        del args[position:position + 2]
+    FundHoldingsLoader().load_files(dict(zip(args[::2], args[1::2])), as_of)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+import pandas as pd
+
+from market_data import load_price_panel, load_return_panel, load_securities, load_fx_panel, to_base_currency
+from series_store import load_stored_prices, load_stored_returns
+
+# Extra FX history loaded before the window so the first price dates have a rate to carry forward
+FX_LOOKBACK_DAYS = 14
+
+
+class BaseCurrencyPanels:
+    """Local prices and FX for one window, converted once per base currency and reused.
+
+    Load once per process (or run) and ask for any base: the first request for a base
+    currency converts the whole universe, later requests only slice the cached panel.
+    """
+
+    def __init__(self, cursor, start_date=None, end_date=None, use_store=False):
+        # The binary series store serves long windows in one read; recent windows that
+        # must see just-written prices read security_prices directly
+        load_prices, load_returns = ((load_stored_prices, load_stored_returns) if use_store
+                                     else (load_price_panel, load_return_panel))
+        self.local_prices = load_prices(cursor, start_date=start_date, end_date=end_date)
+        self.local_returns = load_returns(cursor, start_date=start_date, end_date=end_date)
+        self.fx = load_fx_panel(cursor,
+                                start_date and start_date - timedelta(days=FX_LOOKBACK_DAYS), end_date)
+        self.currencies = load_securities(cursor)['currency']
+        self._prices = {}
+        self._returns = {}
+        self._unconverted = {}
+
+        missing = set(self.currencies.reindex(self.local_prices.columns).dropna()) - set(self.fx.columns)
+        if missing:
+            print(f"Warning: no FX rates loaded for {sorted(missing)}; those prices and returns are unknown")
+
+    def prices(self, base, security_ids=None):
+        """Dates x security_id prices in the base currency"""
+        if base not in self._prices:
+            self._prices[base] = to_base_currency(self.local_prices, self.currencies, self.fx, base)
+        panel = self._prices[base]
+        return panel if security_ids is None else panel.reindex(columns=security_ids)
+
+    def returns(self, base, security_ids=None):
+        """Dates x security_id simple returns in the base currency (local return plus FX move)"""
+        if base not in self._returns:
+            # Stored local returns compound with the FX move since the security's previous close
+            observed = self.local_prices.where(self.local_prices.isna(), 1.0)
+            factor = to_base_currency(observed, self.currencies, self.fx, base)
+            fx_move = (factor / factor.ffill().shift(1)).reindex_like(self.local_returns)
+            self._returns[base] = (1 + self.local_returns) * fx_move - 1
+        panel = self._returns[base]
+        return panel if security_ids is None else panel.reindex(columns=security_ids)
+
+    def unconverted(self, base, security_ids=None):
+        """Dates x security_id mask of returns with no FX rate into base yet.
+
+        Unlike a NaN return on a day the security didn't trade, these moves are unknown.
+        """
+        if base not in self._unconverted:
+            ones = pd.DataFrame(1.0, index=self.local_returns.index, columns=self.local_returns.columns)
+            self._unconverted[base] = to_base_currency(ones, self.currencies, self.fx, base).isna()
+        panel = self._unconverted[base]
+        return panel if security_ids is None else panel.reindex(columns=security_ids, fill_value=False)
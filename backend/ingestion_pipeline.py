@@ -0,0 +1,300 @@
+import numpy as np
+import queue
+import threading
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+
+from data_version import bump_data_version
+from security_returns import refresh_security_returns
+from backfill_checkpoints import record_outcomes
+
+# Bounded hand-offs: a slow stage back-pressures the one before it instead of buffering everything
+QUEUE_SIZE = 8
+FETCH_WORKERS = 3
+# Requests per second across all fetch workers (be nice to Yahoo Finance)
+FETCH_RATE = 4.0
+# A failed fetch is retried after RETRY_BACKOFF, 2 x RETRY_BACKOFF, ... seconds
+FETCH_ATTEMPTS = 3
+RETRY_BACKOFF = 2.0
+# The writer flushes once this many rows are pending, or when its queue runs dry
+BATCH_ROWS = 5000
+MONITOR_INTERVAL = 2.0
+
+_DONE = object()
+
+# Per-table bulk statements; every job kind maps its rows onto one or more of these
+WRITES = {
+    'security_prices': """
+        INSERT INTO security_prices (security_id, date, close_price, data_source)
+        VALUES %s
+        ON CONFLICT (security_id, date)
+        DO UPDATE SET
+            close_price = EXCLUDED.close_price,
+            data_source = EXCLUDED.data_source
+    """,
+    'benchmark_prices': """
+        INSERT INTO benchmark_prices (benchmark_id, date, close_price, total_return_index, data_source)
+        VALUES %s
+        ON CONFLICT (benchmark_id, date)
+        DO UPDATE SET
+            close_price = EXCLUDED.close_price,
+            total_return_index = EXCLUDED.total_return_index,
+            data_source = EXCLUDED.data_source
+    """,
+    'benchmark_returns': """
+        INSERT INTO benchmark_returns (benchmark_id, date, daily_return)
+        VALUES %s
+        ON CONFLICT (benchmark_id, date)
+        DO UPDATE SET daily_return = EXCLUDED.daily_return
+    """,
+    'fx_rates': """
+        INSERT INTO fx_rates (currency_id, date, usd_rate, data_source)
+        VALUES %s
+        ON CONFLICT (currency_id, date)
+        DO UPDATE SET
+            usd_rate = EXCLUDED.usd_rate,
+            data_source = EXCLUDED.data_source
+    """,
+}
+
+
+def transform(job, hist):
+    """Validate fetched history and turn it into {table: rows} for the writer.
+
+    Non-finite or non-positive closes are dropped. Benchmark returns follow the
+    existing loader: each close against the previous close, skipping the first day.
+    Jobs with a write_from date (backfill chunks) fetch a few extra days first and
+    only write from that date, so a chunk's first benchmark return is not lost.
+    """
+    close = hist['Close'].astype(float)
+    close = close[np.isfinite(close) & (close > 0)]
+    dates = [d.date() for d in close.index]
+    values = close.values.tolist()
+    kind, key = job['kind'], job['key']
+    write_from = job.get('write_from')
+    keep = [write_from is None or d >= write_from for d in dates]
+
+    if kind == 'security':
+        return {'security_prices': [(key, d, v, 'yfinance') for d, v, k in zip(dates, values, keep) if k]}
+    if kind == 'fx':
+        return {'fx_rates': [(key, d, v, 'yfinance') for d, v, k in zip(dates, values, keep) if k]}
+
+    returns = close.pct_change().values.tolist()
+    return {
+        'benchmark_prices': [(key, d, v, v, 'yfinance') for d, v, k in zip(dates, values, keep) if k],
+        'benchmark_returns': [(key, d, r) for d, r, k in zip(dates[1:], returns[1:], keep[1:]) if k],
+    }
+
+
+def earliest_dates(price_rows):
+    """security_id -> first date written, where stored returns must be recomputed from"""
+    earliest = {}
+    for security_id, date, *_ in price_rows:
+        if security_id not in earliest or date < earliest[security_id]:
+            earliest[security_id] = date
+    return earliest
+
+
+class RateLimiter:
+    """Spaces calls evenly at no more than rate per second across all threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            slot = max(self.next_slot, time.monotonic())
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - time.monotonic()))
+
+
+class IngestionPipeline:
+    """Fetch, transform/validate and write stages joined by bounded queues.
+
+    Several fetch threads keep the network busy while one transform thread shapes
+    rows and one writer bulk-loads rows from many tickers per transaction, so a run
+    takes about as long as its slowest stage rather than the sum of all of them.
+
+    Every job's outcome (rows written, empty or failed after retries) reaches the
+    writer; with checkpoint=True the writer records it against the job's backfill
+    chunk in the same transaction as the rows.
+    """
+
+    def __init__(self, loader, fetch_workers=FETCH_WORKERS, batch_rows=BATCH_ROWS,
+                 rate=FETCH_RATE, checkpoint=False):
+        self.loader = loader
+        self.db_config = loader.db_config
+        self.fetch_workers = fetch_workers
+        self.batch_rows = batch_rows
+        self.limiter = RateLimiter(rate)
+        self.checkpoint = checkpoint
+        self.jobs = queue.Queue()
+        self.fetched = queue.Queue(maxsize=QUEUE_SIZE)
+        self.transformed = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stats = {'fetched': 0, 'empty': 0, 'failed': 0, 'retries': 0, 'rows': 0, 'batches': 0,
+                      'max_fetched_depth': 0, 'max_transformed_depth': 0}
+        self.error = None
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def fetch(self, job):
+        """Fetch one job under the rate limit, retrying with backoff; returns (hist, error, attempts)"""
+        for attempt in range(1, FETCH_ATTEMPTS + 1):
+            self.limiter.wait()
+            try:
+                return self.loader.fetch_security_data(job['ticker'], job['start_date'],
+                                                       job.get('end_date')), None, attempt
+            except Exception as e:
+                print(f"Error fetching {job['ticker']} {job['start_date']} (attempt {attempt}): {e}")
+                if attempt == FETCH_ATTEMPTS:
+                    return None, str(e), attempt
+                self._count('retries')
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    def fetch_stage(self):
+        while True:
+            job = self.jobs.get()
+            if job is _DONE:
+                self.fetched.put(_DONE)
+                return
+            hist, error, attempts = self.fetch(job)
+            if error:
+                self._count('failed')
+            elif hist is None or hist.empty:
+                self._count('empty')
+                hist = None
+            else:
+                self._count('fetched')
+            self.fetched.put((job, hist, error, attempts))
+
+    def transform_stage(self):
+        finished_fetchers = 0
+        while finished_fetchers < self.fetch_workers:
+            item = self.fetched.get()
+            if item is _DONE:
+                finished_fetchers += 1
+                continue
+            job, hist, error, attempts = item
+            rows = {}
+            if hist is not None:
+                try:
+                    rows = transform(job, hist)
+                except Exception as e:
+                    print(f"Error transforming {job['ticker']}: {e}")
+                    error = str(e)
+            self.transformed.put((job, rows, error, attempts))
+        self.transformed.put(_DONE)
+
+    def write_stage(self):
+        conn, done = None, False
+        try:
+            conn = psycopg2.connect(**self.db_config)
+            cursor = conn.cursor()
+            pending, tickers, outcomes = {}, [], []
+            while not done:
+                item = self.transformed.get()
+                while True:
+                    if item is _DONE:
+                        done = True
+                        break
+                    job, rows, error, attempts = item
+                    n = sum(len(r) for r in rows.values())
+                    outcomes.append((job, n, error, attempts))
+                    if n:
+                        tickers.append(job['ticker'])
+                    for table, table_rows in rows.items():
+                        pending.setdefault(table, []).extend(table_rows)
+                    if sum(len(r) for r in pending.values()) >= self.batch_rows:
+                        break
+                    try:
+                        item = self.transformed.get_nowait()
+                    except queue.Empty:
+                        break
+
+                n = sum(len(r) for r in pending.values())
+                if n:
+                    try:
+                        for table, table_rows in pending.items():
+                            execute_values(cursor, WRITES[table], table_rows, page_size=1000)
+                        if 'security_prices' in pending:
+                            refresh_security_returns(cursor, earliest_dates(pending['security_prices']))
+                        if self.checkpoint:
+                            record_outcomes(cursor, outcomes)
+                        bump_data_version(cursor, 'loader')
+                        conn.commit()
+                        self._count('rows', n)
+                        self._count('batches')
+                        print(f"Stored {n} rows for {len(tickers)} tickers ({', '.join(tickers)})")
+                    except Exception as e:
+                        # Keep draining so upstream stages never block on a full queue
+                        conn.rollback()
+                        print(f"Error writing batch for {', '.join(tickers)}: {e}")
+                        if self.checkpoint:
+                            record_outcomes(cursor, [(job, 0, f"write failed: {e}", attempts)
+                                                     for job, _, _, attempts in outcomes])
+                            conn.commit()
+                elif outcomes and self.checkpoint:
+                    record_outcomes(cursor, outcomes)
+                    conn.commit()
+                pending, tickers, outcomes = {}, [], []
+        except Exception as e:
+            # A dead writer would leave the fetch and transform stages blocked on full
+            # queues: record the error, drain what is left, and let run() re-raise it
+            self.error = e
+            print(f"Writer stopped: {e}")
+            while not done:
+                done = self.transformed.get() is _DONE
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def monitor_stage(self):
+        while not self._finished.wait(MONITOR_INTERVAL):
+            depths = self.queue_depths()
+            with self._lock:
+                self.stats['max_fetched_depth'] = max(self.stats['max_fetched_depth'], depths['fetched'])
+                self.stats['max_transformed_depth'] = max(self.stats['max_transformed_depth'],
+                                                          depths['transformed'])
+            print(f"   queues: jobs {depths['jobs']}, fetched {depths['fetched']}/{QUEUE_SIZE}, "
+                  f"transformed {depths['transformed']}/{QUEUE_SIZE}")
+
+    def queue_depths(self):
+        return {'jobs': self.jobs.qsize(), 'fetched': self.fetched.qsize(),
+                'transformed': self.transformed.qsize()}
+
+    def run(self, jobs):
+        """Run jobs ({kind, key, ticker, start_date[, end_date]}) through the pipeline"""
+        started = time.time()
+        for job in jobs:
+            self.jobs.put(job)
+        for _ in range(self.fetch_workers):
+            self.jobs.put(_DONE)
+
+        threads = [threading.Thread(target=self.fetch_stage, name=f'fetch-{i}')
+                   for i in range(self.fetch_workers)]
+        threads += [threading.Thread(target=self.transform_stage, name='transform'),
+                    threading.Thread(target=self.write_stage, name='write')]
+        monitor = threading.Thread(target=self.monitor_stage, name='monitor', daemon=True)
+        for thread in threads:
+            thread.start()
+        monitor.start()
+        for thread in threads:
+            thread.join()
+        self._finished.set()
+
+        self.stats['seconds'] = round(time.time() - started, 1)
+        print(f" Pipeline: {self.stats['fetched']} jobs fetched ({self.stats['empty']} empty, "
+              f"{self.stats['failed']} failed after {self.stats['retries']} retries), "
+              f"{self.stats['rows']} rows in {self.stats['batches']} batches, {self.stats['seconds']}s; "
+              f"max queue depth fetched {self.stats['max_fetched_depth']}, "
+              f"transformed {self.stats['max_transformed_depth']}")
+        if self.error is not None:
+            raise self.error
+        return self.stats
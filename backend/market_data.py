@@ -0,0 +1,358 @@
+import io
+import numpy as np
+import pandas as pd
+
+
+def _where(conditions):
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def copy_frame(cursor, table, frame):
+    """Bulk load a DataFrame into a table with COPY instead of one INSERT per row"""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_price_panel(cursor, security_ids=None, start_date=None, end_date=None):
+    """Load close prices as a dates x security_id panel (floats cast in SQL, not per row)"""
+    conditions, params = [], []
+    if security_ids is not None:
+        conditions.append("security_id = ANY(%s)")
+        params.append([int(s) for s in security_ids])
+    if start_date is not None:
+        conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= %s")
+        params.append(end_date)
+
+    cursor.execute(f"""
+        SELECT date, security_id, close_price::float8
+        FROM security_prices
+        {_where(conditions)}
+        ORDER BY date
+    """, params)
+    rows = cursor.fetchall()
+
+    if not rows:
+        return pd.DataFrame(dtype=float)
+
+    df = pd.DataFrame(rows, columns=['date', 'security_id', 'price'])
+    panel = df.pivot(index='date', columns='security_id', values='price')
+    panel.index = pd.to_datetime(panel.index)
+    return panel.sort_index()
+
+
+def simple_returns(prices):
+    """Simple returns of a price panel; gaps stay NaN instead of being filled"""
+    return (prices / prices.shift(1) - 1).iloc[1:]
+
+
+def load_return_panel(cursor, security_ids=None, start_date=None, end_date=None, kind='simple'):
+    """Stored daily returns (simple or log) as a dates x security_id panel.
+
+    Each return is measured from the security's previous close, including for the first
+    date of the window; dates a security did not trade stay NaN.
+    """
+    column = {'simple': 'simple_return', 'log': 'log_return'}[kind]
+    conditions, params = [], []
+    if security_ids is not None:
+        conditions.append("security_id = ANY(%s)")
+        params.append([int(s) for s in security_ids])
+    if start_date is not None:
+        conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= %s")
+        params.append(end_date)
+
+    cursor.execute(f"""
+        SELECT date, security_id, {column}
+        FROM security_returns
+        {_where(conditions)}
+    """, params)
+    rows = cursor.fetchall()
+
+    if not rows:
+        return pd.DataFrame(dtype=float)
+
+    df = pd.DataFrame(rows, columns=['date', 'security_id', 'value'])
+    panel = df.pivot(index='date', columns='security_id', values='value')
+    panel.index = pd.to_datetime(panel.index)
+    return panel.sort_index()
+
+
+def load_portfolio_return_panel(cursor, portfolio_ids=None, start_date=None, end_date=None):
+    """Stored daily portfolio returns as a dates x portfolio_id panel"""
+    conditions, params = [], []
+    if portfolio_ids is not None:
+        conditions.append("portfolio_id = ANY(%s)")
+        params.append([int(p) for p in portfolio_ids])
+    if start_date is not None:
+        conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= %s")
+        params.append(end_date)
+
+    cursor.execute(f"""
+        SELECT date, portfolio_id, daily_return::float8
+        FROM portfolio_returns
+        {_where(conditions)}
+    """, params)
+    df = pd.DataFrame(cursor.fetchall(), columns=['date', 'portfolio_id', 'daily_return'])
+    panel = df.pivot(index='date', columns='portfolio_id', values='daily_return')
+    panel.index = pd.to_datetime(panel.index)
+    return panel.sort_index()
+
+def load_securities(cursor):
+    """Security attributes used by the analytics engines, indexed by security_id"""
+    cursor.execute("""
+        SELECT s.security_id, s.ticker, s.security_type, s.country_of_domicile,
+               s.is_fund, ac.name, c.code
+        FROM securities s
+        LEFT JOIN asset_classes ac ON s.asset_class_id = ac.asset_class_id
+        LEFT JOIN currencies c ON s.currency_id = c.currency_id
+        WHERE s.is_active = TRUE
+    """)
+    return pd.DataFrame(cursor.fetchall(), columns=[
+        'security_id', 'ticker', 'security_type', 'country', 'is_fund', 'asset_class', 'currency'
+    ]).set_index('security_id')
+
+
+def load_fx_panel(cursor, start_date=None, end_date=None):
+    """USD per unit of each currency as a dates x currency code panel (USD column is 1.0)"""
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("fx.date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("fx.date <= %s")
+        params.append(end_date)
+
+    cursor.execute(f"""
+        SELECT fx.date, c.code, fx.usd_rate
+        FROM fx_rates fx
+        JOIN currencies c ON fx.currency_id = c.currency_id
+        {_where(conditions)}
+    """, params)
+    df = pd.DataFrame(cursor.fetchall(), columns=['date', 'currency', 'usd_rate'])
+    panel = df.pivot(index='date', columns='currency', values='usd_rate')
+    panel.index = pd.to_datetime(panel.index)
+    panel = panel.sort_index()
+    panel['USD'] = 1.0
+    return panel
+
+
+def to_base_currency(prices, security_currency, fx, base):
+    """Convert a dates x security_id price panel from local currencies into base.
+
+    FX rates are forward-filled onto the price dates and expanded to one column per
+    security, so the conversion is a single broadcast multiply. Securities already
+    in the base currency (or with no currency set) are left unchanged.
+    """
+    codes = security_currency.reindex(prices.columns).fillna(base).values
+    rates = fx.reindex(fx.index.union(prices.index)).ffill().reindex(prices.index)
+    base_rate = rates[base].values if base in rates.columns else np.full(len(rates), np.nan)
+    factor = rates.reindex(columns=codes).values / base_rate[:, None]      # base per local unit
+    factor[:, codes == base] = 1.0
+    return prices * factor
+
+
+def load_base_currencies(cursor):
+    """Base currency code of every portfolio"""
+    cursor.execute("""
+        SELECT p.portfolio_id, c.code
+        FROM portfolios p
+        LEFT JOIN currencies c ON p.base_currency_id = c.currency_id
+    """)
+    return {portfolio_id: code or 'AUD' for portfolio_id, code in cursor.fetchall()}
+
+def load_lookthrough(cursor, portfolio_id=None):
+    """Every lookthrough node (direct and via funds) with its effective portfolio weight"""
+    conditions, params = [], []
+    if portfolio_id is not None:
+        conditions.append("portfolio_id = %s")
+        params.append(portfolio_id)
+
+    cursor.execute(f"""
+        SELECT portfolio_id, security_id, level, holding_path, portfolio_weight::float8,
+               market_value::float8
+        FROM v_portfolio_lookthrough
+        {_where(conditions)}
+    """, params)
+    return pd.DataFrame(cursor.fetchall(), columns=[
+        'portfolio_id', 'security_id', 'level', 'holding_path', 'portfolio_weight', 'market_value'
+    ])
+
+
+def node_residual_weights(lookthrough):
+    """Weight each node keeps for itself: its weight minus what its children explain.
+
+    Leaves keep their full weight; a fund whose published constituents only cover
+    part of it keeps the uncovered remainder, so residuals sum to the direct weights.
+    """
+    if lookthrough.empty:
+        return lookthrough.assign(residual_weight=[])
+
+    nodes = lookthrough.copy()
+    nodes['parent_path'] = nodes['holding_path'].str.rpartition(' -> ')[0]
+    child_weight = (nodes[nodes['level'] > 1]
+                    .groupby(['portfolio_id', 'parent_path'])['portfolio_weight'].sum())
+    covered = pd.MultiIndex.from_frame(nodes[['portfolio_id', 'holding_path']])
+    nodes['residual_weight'] = (nodes['portfolio_weight'].values
+                                - child_weight.reindex(covered).fillna(0.0).values)
+    return nodes.drop(columns='parent_path')
+
+
+def effective_weights(lookthrough):
+    """Portfolios x securities matrix of fully looked-through security weights"""
+    nodes = node_residual_weights(lookthrough)
+    if nodes.empty:
+        return pd.DataFrame(dtype=float)
+    return (nodes.pivot_table(index='portfolio_id', columns='security_id',
+                              values='residual_weight', aggfunc='sum')
+            .fillna(0.0))
+
+
+def ewma_weights(n, half_life):
+    """Exponential observation weights (oldest first) normalised to sum to one"""
+    decay = 0.5 ** (1.0 / half_life)
+    weights = decay ** np.arange(n - 1, -1, -1, dtype=float)
+    return weights / weights.sum()
+
+
+def load_primary_benchmarks(cursor):
+    """Current primary benchmark_id for every portfolio (ASX200 when none is set)"""
+    cursor.execute("""
+        SELECT p.portfolio_id, COALESCE(pb.benchmark_id, 1)
+        FROM portfolios p
+        LEFT JOIN LATERAL (
+            SELECT benchmark_id FROM portfolio_benchmarks
+            WHERE portfolio_id = p.portfolio_id AND is_primary = TRUE
+            AND effective_date <= CURRENT_DATE
+            ORDER BY effective_date DESC
+            LIMIT 1
+        ) pb ON TRUE
+    """)
+    return dict(cursor.fetchall())
+
+
+def load_identifier_index(cursor):
+    """In-memory identifier -> security_id maps for resolving external files without per-row SQL"""
+    cursor.execute("SELECT security_id, ticker, isin, sedol, cusip FROM securities")
+    index = {'ticker': {}, 'isin': {}, 'sedol': {}, 'cusip': {}}
+    for security_id, *identifiers in cursor.fetchall():
+        for kind, value in zip(('ticker', 'isin', 'sedol', 'cusip'), identifiers):
+            if value:
+                index[kind][value.strip().upper()] = security_id
+    return index
+
+
+def resolve_identifiers(frame, index, kinds=('isin', 'sedol', 'cusip', 'ticker')):
+    """security_id for each row, trying identifier columns in order of reliability"""
+    resolved = pd.Series(np.nan, index=frame.index)
+    for kind in kinds:
+        if kind not in frame.columns:
+            continue
+        keys = frame[kind].astype('string').str.strip().str.upper()
+        resolved = resolved.fillna(keys.map(index[kind]).astype(float))
+    return resolved.astype('Int64')
+
+
+def load_holdings_history(cursor, portfolio_ids=None, start_date=None, end_date=None):
+    """Direct holdings snapshots (weight and market value) as long rows, including the last
+    snapshot before start_date so every portfolio has weights in force from the first day
+    of the window"""
+    cursor.execute("""
+        SELECT h.portfolio_id, h.date, h.security_id, h.weight::float8, h.market_value::float8
+        FROM portfolio_holdings h
+        WHERE h.holding_level = 1
+        AND (%s::int[] IS NULL OR h.portfolio_id = ANY(%s::int[]))
+        AND (%s::date IS NULL OR h.date <= %s::date)
+        AND (%s::date IS NULL OR h.date >= (
+            SELECT COALESCE(MAX(earlier.date), %s::date)
+            FROM portfolio_holdings earlier
+            WHERE earlier.portfolio_id = h.portfolio_id AND earlier.holding_level = 1
+            AND earlier.date <= %s::date
+        ))
+    """, [portfolio_ids and list(portfolio_ids), portfolio_ids and list(portfolio_ids),
+          end_date, end_date, start_date, start_date, start_date])
+    return pd.DataFrame(cursor.fetchall(),
+                        columns=['portfolio_id', 'date', 'security_id', 'weight', 'market_value'])
+
+
+def drifted_weights(holdings, returns):
+    """Start-of-day weights per (portfolio, date) from holdings snapshots and a returns panel.
+
+    A snapshot takes effect on the first return date after it and is forward-filled
+    until the next one; in between, weights drift with each security's cumulative
+    growth since the snapshot. Daily snapshots therefore mean daily rebalancing.
+    A portfolio whose snapshots all post-date the returns (e.g. only today's) applies
+    its earliest snapshot to the whole window; dates before a portfolio's first
+    snapshot otherwise have NaN weights, not zero.
+    Returns a (portfolio_id, date) x security_id frame aligned to returns.columns.
+    """
+    dates = returns.index
+    T, N = returns.shape
+    if holdings.empty or T == 0:
+        return pd.DataFrame(columns=returns.columns, dtype=float)
+
+    log_level = np.vstack([np.zeros((1, N)), np.cumsum(np.log1p(returns.fillna(0.0).values), axis=0)])
+
+    snapshots = holdings.assign(row=dates.searchsorted(pd.to_datetime(holdings['date']), side='right'))
+    by_portfolio = snapshots.groupby('portfolio_id')
+    backdate = ((by_portfolio['row'].transform('min') >= T)
+                & (snapshots['date'] == by_portfolio['date'].transform('min')))
+    snapshots.loc[backdate, 'row'] = 0
+    snapshots = snapshots[snapshots['row'] < T]
+    # Several snapshots between two trading days: the latest one wins
+    latest = snapshots.groupby(['portfolio_id', 'row'])['date'].transform('max')
+    snapshots = snapshots[snapshots['date'] == latest]
+    anchors = (snapshots.pivot_table(index=['portfolio_id', 'row'], columns='security_id',
+                                     values='weight', aggfunc='sum', fill_value=0.0)
+               .reindex(columns=returns.columns, fill_value=0.0))
+
+    portfolio_ids = anchors.index.get_level_values(0).unique()
+    full = pd.MultiIndex.from_product([portfolio_ids, range(T)], names=['portfolio_id', 'row'])
+    anchor_row = (pd.Series(anchors.index.get_level_values(1), index=anchors.index, dtype=float)
+                  .reindex(full).groupby(level=0).ffill())
+    A = anchors.reindex(full).groupby(level=0).ffill().fillna(0.0).values
+    held = anchor_row.notna().values
+    anchor = anchor_row.fillna(0).astype(int).values
+    row = np.tile(np.arange(T), len(portfolio_ids))
+
+    W = np.where(held[:, None], A * np.exp(log_level[row] - log_level[anchor]), 0.0)
+    # Weight a snapshot leaves unallocated earns nothing and stays at its value
+    value = W.sum(axis=1, keepdims=True) + (1.0 - A.sum(axis=1, keepdims=True))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        W = np.where(value > 0, W / np.where(value > 0, value, 1), 0.0)
+    W[~held] = np.nan
+
+    index = pd.MultiIndex.from_arrays([full.get_level_values(0), dates[row]], names=['portfolio_id', 'date'])
+    return pd.DataFrame(W, index=index, columns=returns.columns)
+
+
+def portfolio_return_panel(holdings, returns, unknown=None):
+    """Dates x portfolios daily returns from point-in-time holdings (see drifted_weights).
+
+    A NaN security return counts as no move (the security didn't trade). unknown is an
+    optional dates x security_id mask of returns that are missing rather than flat (e.g.
+    no FX conversion); a portfolio's return is NaN on any date it holds one of those, as
+    it is on dates before the portfolio holds anything.
+    """
+    weights = drifted_weights(holdings, returns)
+    if weights.empty:
+        return pd.DataFrame(dtype=float)
+    portfolio_ids = weights.index.get_level_values(0).unique()
+    T, N = returns.shape
+    W = weights.values.reshape(len(portfolio_ids), T, N)
+    daily = np.einsum('ptn,tn->tp', W, returns.fillna(0.0).values)
+    if unknown is not None:
+        mask = unknown.reindex(index=returns.index, columns=returns.columns, fill_value=False)
+        exposed = np.einsum('ptn,tn->tp', (np.nan_to_num(W) != 0).astype(float),
+                            mask.values.astype(float)) > 0
+        daily[exposed] = np.nan
+    return pd.DataFrame(daily, index=returns.index, columns=portfolio_ids)
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_return_panel, copy_frame
+from benchmark_blends import BenchmarkBlender
+
+# Trading-day lengths of the standard windows
+WINDOWS = {'6M': 126, '1Y': 252, '3Y': 756}
+# Pairs with fewer overlapping observations in a window get no estimate
+MIN_OBSERVATIONS = 40
+
+
+def pairwise_moments(X, Y):
+    """Covariance, variances and overlap counts of every X column against every Y column.
+
+    X (T x N) and Y (T x M) hold NaN where missing; each pair uses only the dates
+    where both are present. Every sum is a masked matrix product, so the full N x M
+    grid costs a handful of BLAS calls instead of a loop over pairs.
+    """
+    mx, my = ~np.isnan(X), ~np.isnan(Y)
+    # Centre on column means first; covariance is shift-invariant and the sums stay well scaled
+    Xz = np.where(mx, X - np.nanmean(X, axis=0), 0.0)
+    Yz = np.where(my, Y - np.nanmean(Y, axis=0), 0.0)
+    fx, fy = mx.astype(float), my.astype(float)
+
+    n = fx.T @ fy
+    sx, sy = Xz.T @ fy, fx.T @ Yz
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (Xz.T @ Yz - sx * sy / n) / (n - 1)
+        var_x = ((Xz ** 2).T @ fy - sx ** 2 / n) / (n - 1)
+        var_y = (fx.T @ Yz ** 2 - sy ** 2 / n) / (n - 1)
+    return cov, var_x, var_y, n
+
+
+def beta_correlation(X, Y, min_observations=MIN_OBSERVATIONS):
+    """Beta of each X column on each Y column and their correlation, NaN where overlap is short"""
+    cov, var_x, var_y, n = pairwise_moments(X, Y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta = cov / var_y
+        correlation = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+    short = n < min_observations
+    beta[short | ~np.isfinite(beta)] = np.nan
+    correlation[short | ~np.isfinite(correlation)] = np.nan
+    return beta, correlation, n.astype(int)
+
+
+def load_correlation_matrix(cursor, security_ids, window_code='1Y', as_of_date=None):
+    """Stored security x security correlation slice for the given securities (latest run by default)"""
+    ids = [int(s) for s in security_ids]
+    cursor.execute("""
+        SELECT security_id_a, security_id_b, correlation
+        FROM security_correlations
+        WHERE window_code = %s
+        AND as_of_date = COALESCE(%s, (SELECT MAX(as_of_date) FROM security_correlations WHERE window_code = %s))
+        AND security_id_a = ANY(%s) AND security_id_b = ANY(%s)
+    """, [window_code, as_of_date, window_code, ids, ids])
+    pairs = pd.DataFrame(cursor.fetchall(), columns=['a', 'b', 'correlation'])
+    position = {s: i for i, s in enumerate(ids)}
+    rows, cols = pairs['a'].map(position).values, pairs['b'].map(position).values
+    # Filled as a plain array: DataFrame.values is a read-only view under copy-on-write
+    values = np.full((len(ids), len(ids)), np.nan)
+    values[rows, cols] = pairs['correlation'].values
+    values[cols, rows] = pairs['correlation'].values
+    np.fill_diagonal(values, 1.0)
+    return pd.DataFrame(values, index=ids, columns=ids)
+
+
+class PairwiseRisk:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_benchmark_ids(self, cursor):
+        cursor.execute("SELECT benchmark_id FROM benchmarks WHERE is_active = TRUE ORDER BY benchmark_id")
+        return [row[0] for row in cursor.fetchall()]
+
+    def calculate(self, as_of_date=None):
+        """Security x benchmark betas and security x security correlations for every standard window"""
+        as_of_date = as_of_date or datetime.now().date()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        start_date = as_of_date - timedelta(days=int(max(WINDOWS.values()) * 7 / 5) + 14)
+        returns = load_return_panel(cursor, start_date=start_date, end_date=as_of_date)
+        benchmark_ids = self.load_benchmark_ids(cursor)
+        if returns.empty or not benchmark_ids:
+            print(" No security returns or benchmarks available")
+            conn.close()
+            return None
+        benchmarks = (BenchmarkBlender().load_component_returns(cursor, benchmark_ids, start_date, as_of_date)
+                      .reindex(returns.index))
+        as_of_date = returns.index[-1].date()
+        security_ids = returns.columns.values
+        print(f" Pairwise betas and correlations for {len(security_ids)} securities, "
+              f"{len(benchmark_ids)} benchmarks as of {as_of_date}...")
+
+        upper = np.triu_indices(len(security_ids), k=1)
+        beta_frames, correlation_frames = [], []
+        for window_code, days in WINDOWS.items():
+            R, B = returns.values[-days:], benchmarks.values[-days:]
+
+            beta, correlation, n = beta_correlation(R, B)
+            keep = ~np.isnan(beta)
+            rows, cols = np.nonzero(keep)
+            beta_frames.append(pd.DataFrame({
+                'as_of_date': as_of_date, 'window_code': window_code,
+                'security_id': security_ids[rows], 'benchmark_id': np.asarray(benchmark_ids)[cols],
+                'beta': beta[keep], 'correlation': correlation[keep], 'n_obs': n[keep],
+            }))
+
+            # Security x security is symmetric: persist the upper triangle only
+            _, correlation, n = beta_correlation(R, R)
+            values, counts = correlation[upper], n[upper]
+            keep = ~np.isnan(values)
+            correlation_frames.append(pd.DataFrame({
+                'as_of_date': as_of_date, 'window_code': window_code,
+                'security_id_a': security_ids[upper[0][keep]], 'security_id_b': security_ids[upper[1][keep]],
+                'correlation': values[keep], 'n_obs': counts[keep],
+            }))
+
+        betas = pd.concat(beta_frames, ignore_index=True)
+        correlations = pd.concat(correlation_frames, ignore_index=True)
+
+        cursor.execute("DELETE FROM security_betas WHERE as_of_date = %s", [as_of_date])
+        cursor.execute("DELETE FROM security_correlations WHERE as_of_date = %s", [as_of_date])
+        copy_frame(cursor, 'security_betas', betas)
+        copy_frame(cursor, 'security_correlations', correlations)
+
+        bump_data_version(cursor, 'pairwise_risk')
+        conn.commit()
+        conn.close()
+
+        print(f" Stored {len(betas)} betas and {len(correlations)} correlation pairs")
+        return betas, correlations
+
+
+if __name__ == "__main__":
+    PairwiseRisk().calculate()
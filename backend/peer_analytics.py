@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_portfolio_return_panel, copy_frame
+from benchmark_blends import BenchmarkBlender
+
+# Trading-day lengths of the standard peer windows
+WINDOWS = {'3M': 63, '6M': 126, '1Y': 252, '3Y': 756, '5Y': 1260}
+# A portfolio needs this share of a window's days to be ranked in it
+MIN_COVERAGE = 0.8
+RISK_FREE_RATE = 0.02
+# Rank direction: +1 higher is better, -1 lower is better (beta ranks low to high)
+METRICS = {'return': 1, 'volatility': -1, 'sharpe': 1, 'max_drawdown': -1, 'beta': -1}
+
+
+def window_metrics(R, B):
+    """Annualised return, volatility, Sharpe, max drawdown and beta for every column at once.
+
+    R and B are T x P arrays of portfolio and benchmark returns with NaN where missing;
+    each statistic is a column reduction, so thousands of portfolios cost one pass.
+    """
+    valid = ~np.isnan(R)
+    n = valid.sum(axis=0)
+    r = np.where(valid, R, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annual_return = np.exp(np.log1p(r).sum(axis=0) * 252 / n) - 1
+        mean = r.sum(axis=0) / n
+        volatility = np.sqrt(((r - mean) ** 2 * valid).sum(axis=0) / (n - 1) * 252)
+        sharpe = (annual_return - RISK_FREE_RATE) / volatility
+
+        wealth = np.cumprod(1 + r, axis=0)
+        max_drawdown = -(wealth / np.maximum.accumulate(wealth, axis=0) - 1).min(axis=0)
+
+        pair = valid & ~np.isnan(B)
+        m = pair.sum(axis=0)
+        rp, rb = np.where(pair, R, 0.0), np.where(pair, B, 0.0)
+        dp = np.where(pair, rp - rp.sum(axis=0) / m, 0.0)
+        db = np.where(pair, rb - rb.sum(axis=0) / m, 0.0)
+        beta = (dp * db).sum(axis=0) / (db ** 2).sum(axis=0)
+
+    return {'return': annual_return, 'volatility': volatility, 'sharpe': sharpe,
+            'max_drawdown': max_drawdown, 'beta': np.where(np.isfinite(beta), beta, np.nan)}
+
+
+def rank_peers(results):
+    """Rank, percentile (1 = best) and quartile of each value within its universe/window/metric"""
+    results = results.dropna(subset=['value']).copy()
+    group = ['universe_id', 'window_code', 'metric']
+    score = results['value'] * results['metric'].map(METRICS)
+    results['peer_rank'] = score.groupby([results[g] for g in group]).rank(ascending=False, method='min')
+    results['peer_count'] = results.groupby(group)['value'].transform('count')
+    spread = np.maximum(results['peer_count'] - 1, 1)
+    results['percentile'] = np.rint(1 + 99 * (results['peer_rank'] - 1) / spread).astype(int)
+    results['quartile'] = (results['percentile'] - 1) // 25 + 1
+    results[['peer_rank', 'peer_count']] = results[['peer_rank', 'peer_count']].astype(int)
+    return results
+
+
+class PeerAnalytics:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_mappings(self, cursor):
+        cursor.execute("""
+            SELECT m.universe_id, m.portfolio_id
+            FROM portfolio_peer_mappings m
+            JOIN peer_universes u ON m.universe_id = u.universe_id
+            WHERE u.is_active = TRUE
+        """)
+        return pd.DataFrame(cursor.fetchall(), columns=['universe_id', 'portfolio_id'])
+
+    def calculate(self, as_of_date=None):
+        """Compute and rank peer metrics for every active universe as of a date"""
+        as_of_date = as_of_date or datetime.now().date()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        mappings = self.load_mappings(cursor)
+        if mappings.empty:
+            print(" No peer universes with members found!")
+            conn.close()
+            return None
+
+        portfolio_ids = sorted(int(p) for p in mappings['portfolio_id'].unique())
+        start_date = as_of_date - timedelta(days=int(max(WINDOWS.values()) * 7 / 5) + 14)
+        returns = load_portfolio_return_panel(cursor, portfolio_ids, start_date, as_of_date)
+        if returns.empty:
+            print(" No portfolio returns in the peer windows")
+            conn.close()
+            return None
+        returns = returns.reindex(columns=portfolio_ids)
+        # Each distinct benchmark or blend is loaded once however many portfolios share it
+        bench = (BenchmarkBlender().portfolio_benchmark_returns(cursor, portfolio_ids, start_date, as_of_date)
+                 .reindex(index=returns.index, columns=portfolio_ids))
+        as_of_date = returns.index[-1].date()
+        print(f" Peer analytics for {len(portfolio_ids)} portfolios in "
+              f"{mappings['universe_id'].nunique()} universes as of {as_of_date}...")
+
+        frames = []
+        for window_code, days in WINDOWS.items():
+            R, B = returns.values[-days:], bench.values[-days:]
+            metrics = window_metrics(R, B)
+            covered = (~np.isnan(R)).sum(axis=0) >= MIN_COVERAGE * days
+            for metric, values in metrics.items():
+                frames.append(pd.DataFrame({'portfolio_id': portfolio_ids, 'window_code': window_code,
+                                            'metric': metric, 'value': np.where(covered, values, np.nan)}))
+        per_portfolio = pd.concat(frames, ignore_index=True)
+
+        results = rank_peers(mappings.merge(per_portfolio, on='portfolio_id'))
+        results['as_of_date'] = as_of_date
+
+        cursor.execute("""
+            DELETE FROM peer_analytics WHERE as_of_date = %s AND universe_id = ANY(%s)
+        """, [as_of_date, [int(u) for u in mappings['universe_id'].unique()]])
+        copy_frame(cursor, 'peer_analytics', results[[
+            'universe_id', 'portfolio_id', 'as_of_date', 'window_code', 'metric', 'value',
+            'peer_rank', 'peer_count', 'percentile', 'quartile'
+        ]])
+
+        bump_data_version(cursor, 'peer_analytics')
+        conn.commit()
+        conn.close()
+
+        print(f" Stored {len(results)} ranked peer metrics")
+        return results
+
+
+if __name__ == "__main__":
+    PeerAnalytics().calculate()
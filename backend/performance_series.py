@@ -0,0 +1,132 @@
+import pandas as pd
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import copy_frame
+
+# Resolution code -> pandas period frequency (None = one row per date)
+RESOLUTIONS = {'D': None, 'W': 'W-FRI', 'M': 'M'}
+COLUMNS = ['portfolio_id', 'resolution', 'period_end', 'period_start', 'open_value', 'high_value',
+           'low_value', 'close_value', 'period_return', 'growth_index', 'n_days']
+
+
+def aggregate_performance(daily, resolution):
+    """OHLC value, compounded return and closing growth index per portfolio and period.
+
+    daily has portfolio_id, date, total_value, daily_return and growth_index columns, sorted
+    by portfolio_id then date. Returns COLUMNS rows.
+    """
+    frequency = RESOLUTIONS[resolution]
+    dates = pd.to_datetime(daily['date'])
+    period = dates.dt.to_period(frequency) if frequency else dates.dt.to_period('D')
+    grouped = daily.assign(period=period, growth=1 + daily['daily_return'].fillna(0.0)).groupby(
+        ['portfolio_id', 'period'], sort=False)
+    periods = grouped.agg(
+        period_end=('date', 'last'), period_start=('date', 'first'),
+        open_value=('total_value', 'first'), high_value=('total_value', 'max'),
+        low_value=('total_value', 'min'), close_value=('total_value', 'last'),
+        period_return=('growth', 'prod'), growth_index=('growth_index', 'last'),
+        n_days=('date', 'count'),
+    ).reset_index()
+    periods['period_return'] -= 1
+    periods['resolution'] = resolution
+    return periods
+
+
+class PerformanceSeries:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def load_restart_points(self, cursor):
+        """First observed date of each portfolio's last stored week and month, the periods
+        that may have been stored part-way through; daily rows restart at the earlier one"""
+        cursor.execute("""
+            SELECT portfolio_id, MAX(period_start) FILTER (WHERE resolution = 'W'),
+                   MAX(period_start) FILTER (WHERE resolution = 'M')
+            FROM performance_aggregates
+            GROUP BY portfolio_id
+        """)
+        restart = (pd.DataFrame(cursor.fetchall(), columns=['portfolio_id', 'W', 'M'])
+                   .set_index('portfolio_id').astype('datetime64[ns]'))
+        restart.insert(0, 'D', restart[['W', 'M']].min(axis=1))
+        return restart
+
+    def load_changes(self, cursor, since):
+        """Performance rows from each portfolio's restart date onwards (all rows without one).
+
+        Also returns the growth index each portfolio had just before its restart date, so
+        the recomputed tail continues the stored series.
+        """
+        since = since.dropna()
+        params = [[int(p) for p in since.index], [d.date() for d in since]]
+        cursor.execute("""
+            SELECT pp.portfolio_id, pp.date, pp.total_value::float8, pp.daily_return::float8
+            FROM portfolio_performance pp
+            LEFT JOIN unnest(%s::int[], %s::date[]) AS r(portfolio_id, since) ON pp.portfolio_id = r.portfolio_id
+            WHERE r.since IS NULL OR pp.date >= r.since
+            ORDER BY pp.portfolio_id, pp.date
+        """, params)
+        daily = pd.DataFrame(cursor.fetchall(), columns=['portfolio_id', 'date', 'total_value', 'daily_return'])
+
+        cursor.execute("""
+            SELECT DISTINCT ON (a.portfolio_id) a.portfolio_id, a.growth_index
+            FROM performance_aggregates a
+            JOIN unnest(%s::int[], %s::date[]) AS r(portfolio_id, since) ON a.portfolio_id = r.portfolio_id
+            WHERE a.resolution = 'D' AND a.period_end < r.since
+            ORDER BY a.portfolio_id, a.period_end DESC
+        """, params)
+        return daily, dict(cursor.fetchall())
+
+    def refresh(self, full=False):
+        """Recompute the daily, weekly and monthly aggregates touched by new performance rows"""
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        restart = (pd.DataFrame(columns=list(RESOLUTIONS), dtype='datetime64[ns]') if full
+                   else self.load_restart_points(cursor))
+        daily, base = self.load_changes(cursor, restart['D'])
+        if daily.empty:
+            print(" No portfolio performance rows to aggregate")
+            conn.close()
+            return 0
+
+        # Growth of 1 continues from the stored index before the recomputed tail
+        growth = 1 + daily['daily_return'].fillna(0.0)
+        daily['growth_index'] = (growth.groupby(daily['portfolio_id']).cumprod()
+                                 * daily['portfolio_id'].map(base).fillna(1.0))
+
+        frames = []
+        for resolution in RESOLUTIONS:
+            periods = aggregate_performance(daily, resolution)
+            # Periods starting before this resolution's restart point were only partly
+            # reloaded (the other resolution restarted earlier): their stored rows stand
+            start = restart[resolution].reindex(periods['portfolio_id']).values
+            frames.append(periods[pd.isna(start) | (pd.to_datetime(periods['period_start']).values >= start)])
+        rows = pd.concat(frames, ignore_index=True)
+
+        # Replace each portfolio/resolution from its restart point (everything without one)
+        portfolio_ids = [int(p) for p in daily['portfolio_id'].unique()]
+        starts = restart.reindex(portfolio_ids)
+        cursor.execute("""
+            DELETE FROM performance_aggregates a
+            USING unnest(%s::int[], %s::char[], %s::date[]) AS f(portfolio_id, resolution, period_start)
+            WHERE a.portfolio_id = f.portfolio_id AND a.resolution = f.resolution
+            AND (f.period_start IS NULL OR a.period_start >= f.period_start)
+        """, [portfolio_ids * len(RESOLUTIONS),
+              [r for r in RESOLUTIONS for _ in portfolio_ids],
+              [None if pd.isna(d) else d.date() for r in RESOLUTIONS for d in starts[r]]])
+        copy_frame(cursor, 'performance_aggregates', rows[COLUMNS])
+
+        bump_data_version(cursor, 'performance_series')
+        conn.commit()
+        conn.close()
+
+        counts = rows['resolution'].value_counts()
+        print(f" Performance aggregates for {rows['portfolio_id'].nunique()} portfolios: "
+              f"{counts.get('D', 0)} daily, {counts.get('W', 0)} weekly, {counts.get('M', 0)} monthly rows")
+        return len(rows)
+
+
+if __name__ == "__main__":
+    PerformanceSeries().refresh()
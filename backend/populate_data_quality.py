@@ -1,12 +1,9 @@
 import psycopg2
 
-db_config = {
-    'host': 'localhost',
-    'port': 5432,
-    'database': 'madashboard',
-    'user': 'ma_user',
-    'password': 'dev_password123'
-}
+from config import DB_CONFIG
+from data_version import bump_data_version
+
+db_config = DB_CONFIG
 
 def populate_data_quality_table():
     conn = psycopg2.connect(**db_config)
@@ -107,6 +104,7 @@ def populate_data_quality_table():
         for entity_type, total, real_entities, avg_score in cursor.fetchall():
             print(f"  {entity_type.capitalize()}s: {real_entities}/{total} with real data (avg quality: {avg_score:.1%})")
         
+        bump_data_version(cursor, 'data_quality')
         conn.commit()
         print("\n✅ Data quality status table populated successfully!")
         
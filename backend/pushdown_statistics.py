@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from benchmark_blends import BenchmarkBlender
+
+# Trading-day windows aggregated in the database; None means the full overlapping history
+WINDOWS = {'3M': 63, '1Y': 252, '3Y': 756, 'ALL': None}
+# Same overlap floor as the in-memory beta
+MIN_OBSERVATIONS = 30
+STATISTICS = ['n_obs', 'beta', 'correlation', 'volatility', 'tracking_error']
+
+# Each portfolio's returns joined to its own benchmark (an index or a cached blend) between
+# optional start and as-of dates, newest first
+PAIRED_RETURNS = """
+    WITH pairs AS (
+        SELECT * FROM unnest(%s::int[], %s::int[], %s::int[]) AS p(portfolio_id, benchmark_id, blend_id)
+    ),
+    benchmark AS (
+        SELECT p.portfolio_id, br.date, br.daily_return::float8 AS rb
+        FROM pairs p JOIN benchmark_returns br ON br.benchmark_id = p.benchmark_id
+        UNION ALL
+        SELECT p.portfolio_id, bb.date, bb.daily_return
+        FROM pairs p JOIN benchmark_blend_returns bb ON bb.blend_id = p.blend_id
+    ),
+    paired AS (
+        SELECT pr.portfolio_id, pr.date, pr.daily_return::float8 AS rp, b.rb,
+               ROW_NUMBER() OVER (PARTITION BY pr.portfolio_id ORDER BY pr.date DESC) AS rn
+        FROM portfolio_returns pr
+        JOIN benchmark b ON b.portfolio_id = pr.portfolio_id AND b.date = pr.date
+        WHERE (%s::date IS NULL OR pr.date >= %s::date)
+          AND (%s::date IS NULL OR pr.date <= %s::date)
+    )
+"""
+
+
+def benchmark_sources(cursor, portfolio_ids=None):
+    """Parallel portfolio / benchmark_id / blend_id arrays: one benchmark source per portfolio.
+
+    Single-index benchmarks read benchmark_returns directly; blends are brought up to
+    date in the composite cache first so the database can join against them.
+    """
+    blender = BenchmarkBlender()
+    blend_ids = {}
+    sources = ([], [], [])
+    for portfolio_id, definition in blender.get_portfolio_blends(cursor, portfolio_ids).items():
+        benchmark_id = blend_id = None
+        if len(definition['components']) == 1:
+            benchmark_id = definition['components'][0][0]
+        else:
+            key = (definition['components'], definition['rebalance'])
+            if key not in blend_ids:
+                blend_ids[key] = blender.ensure_blend(cursor, definition)
+                blender.refresh(cursor, blend_ids[key], definition)
+            blend_id = blend_ids[key]
+        for column, value in zip(sources, (portfolio_id, benchmark_id, blend_id)):
+            column.append(value)
+    return sources
+
+
+def _window_aggregates(days):
+    window = f"FILTER (WHERE rn <= {days})" if days else ""
+    return f"""
+        COUNT(*) {window},
+        regr_slope(rp, rb) {window},
+        corr(rp, rb) {window},
+        stddev_samp(rp) {window} * SQRT(252),
+        stddev_samp(rp - rb) {window} * SQRT(252)"""
+
+
+def portfolio_benchmark_statistics(cursor, portfolio_ids=None, as_of_date=None, windows=WINDOWS,
+                                   start_date=None):
+    """Beta, correlation, volatility and tracking error of every portfolio against its benchmark.
+
+    One statement aggregates every portfolio/benchmark pair and every window inside
+    Postgres (regr_slope, corr, stddev_samp with per-window FILTERs); only one row per
+    portfolio comes back. Returns a long frame: portfolio_id, window_code, STATISTICS.
+    Volatility and tracking error are annualised; windows short of MIN_OBSERVATIONS are NaN.
+    A start_date bounds the history, so a None window covers start_date to as_of_date.
+    """
+    sources = benchmark_sources(cursor, portfolio_ids)
+    if not sources[0]:
+        return pd.DataFrame(columns=['portfolio_id', 'window_code'] + STATISTICS)
+
+    aggregates = ','.join(_window_aggregates(days) for days in windows.values())
+    cursor.execute(f"""
+        {PAIRED_RETURNS}
+        SELECT portfolio_id, {aggregates}
+        FROM paired
+        GROUP BY portfolio_id
+    """, [*sources, start_date, start_date, as_of_date, as_of_date])
+    rows = cursor.fetchall()
+
+    width = len(STATISTICS)
+    frames = []
+    for i, code in enumerate(windows):
+        block = pd.DataFrame([row[1 + i * width:1 + (i + 1) * width] for row in rows],
+                             columns=STATISTICS, dtype=float)
+        block.insert(0, 'window_code', code)
+        block.insert(0, 'portfolio_id', [row[0] for row in rows])
+        frames.append(block)
+    results = pd.concat(frames, ignore_index=True)
+    short = results['n_obs'] < MIN_OBSERVATIONS
+    results.loc[short, STATISTICS[1:]] = np.nan
+    results['n_obs'] = results['n_obs'].astype(int)
+    return results
+
+
+def rolling_statistics(cursor, portfolio_ids=None, days=63, start_date=None, as_of_date=None):
+    """Rolling beta, correlation, volatility and tracking error per portfolio and date.
+
+    Windowed aggregates (OVER a ROWS frame of `days` paired returns) run in the database;
+    dates before a full window carry NaN. Returns portfolio_id, date and STATISTICS columns.
+    """
+    sources = benchmark_sources(cursor, portfolio_ids)
+    if not sources[0]:
+        return pd.DataFrame(columns=['portfolio_id', 'date'] + STATISTICS)
+
+    # Earlier returns still fill the first windows, so start_date only trims the output
+    cursor.execute(f"""
+        {PAIRED_RETURNS}
+        SELECT * FROM (
+            SELECT portfolio_id, date,
+                   COUNT(*) OVER w,
+                   regr_slope(rp, rb) OVER w,
+                   corr(rp, rb) OVER w,
+                   stddev_samp(rp) OVER w * SQRT(252),
+                   stddev_samp(rp - rb) OVER w * SQRT(252)
+            FROM paired
+            WINDOW w AS (PARTITION BY portfolio_id ORDER BY date ROWS BETWEEN {int(days) - 1} PRECEDING AND CURRENT ROW)
+        ) rolling
+        WHERE %s::date IS NULL OR date >= %s::date
+        ORDER BY portfolio_id, date
+    """, [*sources, None, None, as_of_date, as_of_date, start_date, start_date])
+    results = pd.DataFrame(cursor.fetchall(), columns=['portfolio_id', 'date'] + STATISTICS)
+    results[STATISTICS] = results[STATISTICS].astype(float)
+    results.loc[results['n_obs'] < days, STATISTICS[1:]] = np.nan
+    results['n_obs'] = results['n_obs'].astype(int)
+    return results
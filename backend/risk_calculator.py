@@ -2,57 +2,74 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import psycopg2
+from psycopg2.extras import execute_values
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from security_returns import refresh_security_returns
+from fx import BaseCurrencyPanels
+from benchmark_blends import BenchmarkBlender, DEFAULT_BLEND
+from series_store import SeriesStore
+from ewma_risk import EwmaRiskEngine, load_ewma_volatility
+from pushdown_statistics import WINDOWS, portfolio_benchmark_statistics, rolling_statistics
+from run_context import RunContext, describe_benchmark
+
+# Rolling window (trading days) reported alongside the pushdown statistics
+ROLLING_BETA_DAYS = WINDOWS['3M']
+
 
 class RealBetaRiskCalculator:
-    def __init__(self):
-        self.db_config = {
-            'host': 'localhost',
-            'port': 5432,
-            'database': 'madashboard',
-            'user': 'ma_user',
-            'password': 'dev_password123'
-        }
+    def __init__(self, pushdown=False):
+        self.db_config = dict(DB_CONFIG)
+        # Compute beta, correlation and tracking error inside Postgres instead of in pandas
+        self.pushdown = pushdown
+        # Base-currency price panels, shared by every portfolio in this process
+        self.currency_panels = None
+    
+    def get_currency_panels(self, cursor, start_date, end_date):
+        """Prices converted to base currencies for the window, loaded once and reused"""
+        if self.currency_panels is None or self.currency_panels[0] != (start_date, end_date):
+            self.currency_panels = ((start_date, end_date), BaseCurrencyPanels(cursor, start_date, end_date))
+        return self.currency_panels[1]
     
     def get_portfolio_benchmark(self, portfolio_id=1):
-        """Get the current benchmark for a portfolio"""
+        """Get the current benchmark for a portfolio - a single index or a weighted blend"""
         conn = psycopg2.connect(**self.db_config)
         cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT b.benchmark_id, b.code, b.name
-            FROM portfolio_benchmarks pb
-            JOIN benchmarks b ON pb.benchmark_id = b.benchmark_id
-            WHERE pb.portfolio_id = %s AND pb.is_primary = TRUE
-            AND pb.effective_date <= CURRENT_DATE
-            ORDER BY pb.effective_date DESC
-            LIMIT 1
-        """, [portfolio_id])
-        
-        result = cursor.fetchone()
+        definition = BenchmarkBlender().get_portfolio_blends(cursor, [portfolio_id]).get(portfolio_id, DEFAULT_BLEND)
+        benchmark_info = describe_benchmark(cursor, definition)
         conn.close()
-        
-        if result:
-            return {
-                'benchmark_id': result[0],
-                'code': result[1], 
-                'name': result[2]
-            }
-        else:
-            # Default to ASX200 if no benchmark set
-            return {'benchmark_id': 1, 'code': 'ASX200', 'name': 'S&P/ASX 200 Index'}
+        return benchmark_info
+    
+    def open_cursor(self, cursor=None):
+        """(connection, cursor) on a new connection, or (None, cursor) to write through the caller's"""
+        if cursor is not None:
+            return None, cursor
+        conn = psycopg2.connect(**self.db_config)
+        return conn, conn.cursor()
+    
+    def finish(self, conn):
+        """Commit and close a connection from open_cursor; a borrowed cursor's owner commits"""
+        if conn is not None:
+            conn.commit()
+            conn.close()
     
-    def generate_benchmark_data(self, benchmark_code, days=252):
+    def new_context(self, portfolio_id):
+        """Run context whose base-currency panels are shared with this calculator's other runs"""
+        return RunContext(portfolio_id, currency_panels=self.get_currency_panels)
+    
+    def generate_benchmark_data(self, benchmark_code, days=252, cursor=None):
         """Generate realistic data for any benchmark"""
         print(f" Generating {benchmark_code} benchmark data...")
         
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        conn, cursor = self.open_cursor(cursor)
         
         # Get benchmark_id
         cursor.execute("SELECT benchmark_id FROM benchmarks WHERE code = %s", [benchmark_code])
         result = cursor.fetchone()
         if not result:
             print(f" {benchmark_code} benchmark not found in database")
+            self.finish(conn)
             return
         
         benchmark_id = result[0]
@@ -121,18 +138,17 @@ class RealBetaRiskCalculator:
                 daily_return = EXCLUDED.daily_return
             """, [benchmark_id, date.date(), float(returns[i])])
         
-        conn.commit()
-        conn.close()
+        bump_data_version(cursor, 'risk_calculator')
+        self.finish(conn)
         print(f" Generated {days} days of {benchmark_code} data")
     
     def generate_asx200_data(self, days=252):
         """Generate realistic ASX 200 index data"""
         self.generate_benchmark_data('ASX200', days)
     
-    def create_initial_prices(self):
+    def create_initial_prices(self, cursor=None):
         """Create initial current prices if none exist"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        conn, cursor = self.open_cursor(cursor)
         
         cursor.execute("SELECT security_id, ticker FROM securities")
         securities = cursor.fetchall()
@@ -152,17 +168,20 @@ class RealBetaRiskCalculator:
                 close_price = EXCLUDED.close_price
             """, [security_id, datetime.now().date(), price])
         
-        conn.commit()
-        conn.close()
+        changes = {security_id: datetime.now().date() for security_id, _ in securities}
+        refresh_security_returns(cursor, changes)
+        bump_data_version(cursor, 'risk_calculator')
+        SeriesStore().refresh(list(changes), cursor=cursor)
+        self.finish(conn)
+        self.currency_panels = None  # Prices changed
         print(" Created initial realistic prices for all securities")
     
-    def generate_realistic_price_history(self, days=252):
+    def generate_realistic_price_history(self, days=252, benchmark_info=None, cursor=None):
         """Generate realistic price history correlated with selected benchmark"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+        conn, cursor = self.open_cursor(cursor)
         
         # Get the current benchmark for correlation
-        benchmark_info = self.get_portfolio_benchmark(1)  # Assuming portfolio 1
+        benchmark_info = benchmark_info or self.get_portfolio_benchmark(1)  # Assuming portfolio 1
         benchmark_code = benchmark_info['code']
         
         # Get benchmark returns
@@ -175,8 +194,10 @@ class RealBetaRiskCalculator:
         
         if not benchmark_data:
             print(f"No {benchmark_code} data found, generating it first...")
-            self.generate_benchmark_data(benchmark_code)
-            return self.generate_realistic_price_history(days)
+            self.generate_benchmark_data(benchmark_code, cursor=cursor)
+            result = self.generate_realistic_price_history(days, benchmark_info, cursor)
+            self.finish(conn)
+            return result
         
         benchmark_returns = {date: float(ret) for date, ret in benchmark_data}
         
@@ -190,7 +211,7 @@ class RealBetaRiskCalculator:
         
         missing_prices = [s for s in securities if s[3] is None]
         if missing_prices:
-            self.create_initial_prices()
+            self.create_initial_prices(cursor)
             cursor.execute("""
                 SELECT s.security_id, s.ticker, s.name, sp.close_price
                 FROM securities s
@@ -255,140 +276,81 @@ class RealBetaRiskCalculator:
                     close_price = EXCLUDED.close_price
                 """, [security_id, date.date(), float(prices[i])])
         
-        conn.commit()
-        conn.close()
+        # Only the securities rewritten above changed, from the first generated date
+        changes = {security[0]: dates[0].date() for security in securities}
+        refresh_security_returns(cursor, changes)
+        bump_data_version(cursor, 'risk_calculator')
+        SeriesStore().refresh(list(changes), cursor=cursor)
+        self.finish(conn)
+        self.currency_panels = None  # Prices changed
         print(f" Generated {days} days of correlated price history vs {benchmark_code}")
     
-    def calculate_portfolio_returns(self, portfolio_id=1):
-        """Calculate actual portfolio returns from holdings and prices"""
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
+    def calculate_portfolio_returns(self, portfolio_id=1, context=None):
+        """Calculate actual portfolio returns from point-in-time holdings and prices"""
+        context = context or self.new_context(portfolio_id)
+        cursor = context.cursor
         
-        cursor.execute("""
-            SELECT s.security_id, s.ticker, h.weight
-            FROM portfolio_holdings h
-            JOIN securities s ON h.security_id = s.security_id
-            WHERE h.portfolio_id = %s AND h.date = CURRENT_DATE
-        """, [portfolio_id])
-        
-        holdings = cursor.fetchall()
-        if not holdings:
+        holdings = context.holdings
+        if holdings.empty:
             print(" No portfolio holdings found!")
             return None
-            
-        print(f" Calculating returns for portfolio with {len(holdings)} holdings:")
-        for _, ticker, weight in holdings:
-            print(f"   {ticker}: {weight*100:.1f}%")
-        
-        security_ids = [h[0] for h in holdings]
-        placeholders = ','.join(['%s'] * len(security_ids))
-        
-        cursor.execute(f"""
-            SELECT sp.security_id, sp.date, sp.close_price
-            FROM security_prices sp
-            WHERE sp.security_id IN ({placeholders})
-            AND sp.date >= CURRENT_DATE - INTERVAL '1 year'
-            ORDER BY sp.date
-        """, security_ids)
-        
-        price_data = cursor.fetchall()
-        conn.close()
-        
-        df = pd.DataFrame(price_data, columns=['security_id', 'date', 'price'])
-        df['price'] = df['price'].astype(float)
-        df = df.pivot(index='date', columns='security_id', values='price')
         
-        returns_df = df.pct_change().dropna()
+        latest = holdings[holdings['date'] == holdings['date'].max()]
+        cursor.execute("SELECT security_id, ticker FROM securities WHERE security_id = ANY(%s)",
+                       [[int(s) for s in latest['security_id']]])
+        tickers = dict(cursor.fetchall())
+        print(f" Calculating returns from {holdings['date'].nunique()} holdings snapshots; "
+              f"latest ({latest['date'].iloc[0]}) has {len(latest)} holdings:")
+        for security_id, weight in zip(latest['security_id'], latest['weight']):
+            print(f"   {tickers.get(security_id, security_id)}: {weight*100:.1f}%")
+        
+        if context.security_returns.empty:
+            print(" No prices found for portfolio holdings!")
+            return None
         
-        portfolio_returns = []
-        portfolio_values = []
-        dates_list = []
+        daily = context.portfolio_returns
+        if daily is None:
+            print(" No holdings in force over the price history!")
+            return None
         
+        portfolio_returns = daily.values
         initial_value = 50000
-        current_value = initial_value
-        
-        weights_dict = {h[0]: float(h[2]) for h in holdings}
-        
-        for date, row in returns_df.iterrows():
-            portfolio_return = 0
-            for security_id, weight in weights_dict.items():
-                if security_id in row.index and not pd.isna(row[security_id]):
-                    portfolio_return += weight * row[security_id]
-            
-            current_value *= (1 + portfolio_return)
-            portfolio_returns.append(float(portfolio_return))
-            portfolio_values.append(float(current_value))
-            dates_list.append(date)
-        
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
-        
-        for i, date in enumerate(dates_list):
-            benchmark_return = float(portfolio_returns[i] * 0.85)
-            active_return = float(portfolio_returns[i] - benchmark_return)
-            
-            cursor.execute("""
-                INSERT INTO portfolio_returns (
-                    portfolio_id, date, daily_return, portfolio_value,
-                    benchmark_return, active_return
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (portfolio_id, date) DO UPDATE SET
-                    daily_return = EXCLUDED.daily_return,
-                    portfolio_value = EXCLUDED.portfolio_value
-            """, [portfolio_id, date, portfolio_returns[i], portfolio_values[i],
-                  benchmark_return, active_return])
-        
-        conn.commit()
-        conn.close()
+        portfolio_values = initial_value * np.cumprod(1 + portfolio_returns)
+        benchmark_returns = portfolio_returns * 0.85
+        
+        execute_values(cursor, """
+            INSERT INTO portfolio_returns (
+                portfolio_id, date, daily_return, portfolio_value,
+                benchmark_return, active_return
+            ) VALUES %s
+            ON CONFLICT (portfolio_id, date) DO UPDATE SET
+                daily_return = EXCLUDED.daily_return,
+                portfolio_value = EXCLUDED.portfolio_value
+        """, [(portfolio_id, date.date(), float(r), float(v), float(b), float(r - b))
+              for date, r, v, b in zip(daily.index, portfolio_returns, portfolio_values,
+                                       benchmark_returns)])
+        
+        bump_data_version(cursor, 'risk_calculator')
+        context.commit()
         
         print(f" Calculated {len(portfolio_returns)} days of real portfolio returns")
         return np.array(portfolio_returns)
     
-    def calculate_real_beta(self, portfolio_id=1):
+    def calculate_real_beta(self, portfolio_id=1, context=None):
         """Calculate real beta against the portfolio's selected benchmark"""
-        # Get the portfolio's current benchmark
-        benchmark_info = self.get_portfolio_benchmark(portfolio_id)
-        benchmark_code = benchmark_info['code']
+        context = context or self.new_context(portfolio_id)
+        benchmark_info = context.benchmark
+        benchmark_code = benchmark_info['label']
         benchmark_name = benchmark_info['name']
         
         print(f" Calculating beta against: {benchmark_code} ({benchmark_name})")
         
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
-        
-        # Get portfolio returns
-        cursor.execute("""
-            SELECT date, daily_return FROM portfolio_returns 
-            WHERE portfolio_id = %s 
-            ORDER BY date
-        """, [portfolio_id])
-        portfolio_data = cursor.fetchall()
-        
-        # Get benchmark returns using the selected benchmark
-        cursor.execute("""
-            SELECT br.date, br.daily_return 
-            FROM benchmark_returns br
-            JOIN benchmarks b ON br.benchmark_id = b.benchmark_id
-            WHERE b.code = %s
-            ORDER BY br.date
-        """, [benchmark_code])
-        benchmark_data = cursor.fetchall()
-        
-        conn.close()
-        
-        if not portfolio_data or not benchmark_data:
+        # Portfolio returns from this run against the benchmark (blends from the shared composite cache)
+        merged = context.aligned_returns
+        if merged.empty:
             print(f" Insufficient data for beta calculation against {benchmark_code}")
             return None
         
-        portfolio_df = pd.DataFrame(portfolio_data, columns=['date', 'portfolio_return'])
-        benchmark_df = pd.DataFrame(benchmark_data, columns=['date', 'benchmark_return'])
-        
-        # Convert decimals to float
-        portfolio_df['portfolio_return'] = portfolio_df['portfolio_return'].astype(float)
-        benchmark_df['benchmark_return'] = benchmark_df['benchmark_return'].astype(float)
-        
-        merged = pd.merge(portfolio_df, benchmark_df, on='date', how='inner')
-        
         if len(merged) < 30:
             print(f" Insufficient overlapping data for beta calculation against {benchmark_code}")
             return None
@@ -411,23 +373,57 @@ class RealBetaRiskCalculator:
         
         return float(beta), float(correlation)
     
+    def calculate_pushdown_statistics(self, portfolio_id=1, context=None):
+        """Beta, correlation and tracking error aggregated in the database over the run's window"""
+        context = context or self.new_context(portfolio_id)
+        # Same dates as the in-memory path's aligned returns
+        statistics = portfolio_benchmark_statistics(context.cursor, [portfolio_id],
+                                                    as_of_date=context.end_date, windows={'RUN': None},
+                                                    start_date=context.start_date)
+        rolling = rolling_statistics(context.cursor, [portfolio_id], days=ROLLING_BETA_DAYS,
+                                     start_date=context.start_date, as_of_date=context.end_date)
+        context.commit()
+        
+        if statistics.empty or np.isnan(statistics['beta'].iloc[0]):
+            print(" Insufficient overlapping data for in-database beta calculation")
+            return None
+        
+        row = statistics.iloc[0]
+        print(f"   In-database statistics over {row['n_obs']} paired days:")
+        print(f"   Calculated Beta: {row['beta']:.3f}, correlation: {row['correlation']:.3f}")
+        rolling_beta = rolling['beta'].dropna()
+        if not rolling_beta.empty:
+            print(f"   Rolling {ROLLING_BETA_DAYS}-day beta: {rolling_beta.min():.3f} to {rolling_beta.max():.3f}"
+                  f" (latest {rolling_beta.iloc[-1]:.3f})")
+        return float(row['beta']), float(row['correlation']), float(row['tracking_error'])
+    
     def calculate_real_risk_metrics(self, portfolio_id=1):
         """Calculate risk metrics with real beta against selected benchmark"""
         
+        # Every input below is loaded once into the run context and shared by all metrics
+        with self.new_context(portfolio_id) as context:
+            self.calculate_run_metrics(portfolio_id, context)
+            print(f" {context.round_trips} database round trips for the metrics run")
+    
+    def calculate_run_metrics(self, portfolio_id, context):
+        """Risk metrics for one portfolio, read from and written through its run context"""
         # Get the portfolio's benchmark
-        benchmark_info = self.get_portfolio_benchmark(portfolio_id)
-        benchmark_code = benchmark_info['code']
+        benchmark_info = context.benchmark
+        benchmark_code = benchmark_info['label']
+        context.commit()
         
         print(f"Setting up benchmark data for {benchmark_code}...")
         
-        # Generate data for the selected benchmark
-        self.generate_benchmark_data(benchmark_code)
+        # Generate data for the selected benchmark (every index in a blend) through the
+        # context's cursor, so the run's round trips include the generated data
+        for component in benchmark_info['components']:
+            self.generate_benchmark_data(component['code'], cursor=context.cursor)
         
         print(" Generating correlated price history...")
-        self.generate_realistic_price_history()
+        self.generate_realistic_price_history(benchmark_info=benchmark_info, cursor=context.cursor)
         
         print(" Calculating portfolio returns...")
-        portfolio_returns = self.calculate_portfolio_returns(portfolio_id)
+        portfolio_returns = self.calculate_portfolio_returns(portfolio_id, context)
         
         if portfolio_returns is None:
             print(" Could not calculate portfolio returns")
@@ -448,37 +444,18 @@ class RealBetaRiskCalculator:
         max_drawdown = float(abs(np.min(drawdown)))
         
         # Calculate REAL beta against selected benchmark
-        beta_result = self.calculate_real_beta(portfolio_id)
-        if beta_result:
+        beta_result = None if self.pushdown else self.calculate_real_beta(portfolio_id, context)
+        if self.pushdown:
+            beta, correlation, tracking_error = (self.calculate_pushdown_statistics(portfolio_id, context)
+                                                 or (1.0, 0.85, 0.05))
+        elif beta_result:
             beta, correlation = beta_result
-            
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT pr.daily_return, br.daily_return
-                FROM portfolio_returns pr
-                JOIN benchmark_returns br ON pr.date = br.date
-                JOIN benchmarks b ON br.benchmark_id = b.benchmark_id
-                WHERE pr.portfolio_id = %s AND b.code = %s
-                ORDER BY pr.date
-            """, [portfolio_id, benchmark_code])
-            
-            aligned_returns = cursor.fetchall()
-            conn.close()
-            
-            if aligned_returns:
-                port_rets = np.array([float(r[0]) for r in aligned_returns])
-                bench_rets = np.array([float(r[1]) for r in aligned_returns])
-                tracking_error = float(np.std(port_rets - bench_rets) * np.sqrt(252))
-            else:
-                tracking_error = 0.05
+            tracking_error = float(np.std(context.active_returns.values) * np.sqrt(252))
         else:
             beta, correlation, tracking_error = 1.0, 0.85, 0.05
         
         # Save to database
-        conn = psycopg2.connect(**self.db_config)
-        cursor = conn.cursor()
-        
+        cursor = context.cursor
         cursor.execute("""
             INSERT INTO portfolio_risk_calculations (
                 portfolio_id, calculation_date, var_1d_95, var_1d_99,
@@ -502,12 +479,18 @@ class RealBetaRiskCalculator:
             tracking_error, beta, correlation
         ])
         
-        conn.commit()
-        conn.close()
+        # Fold the new returns into the portfolio's EWMA state instead of rescanning history
+        EwmaRiskEngine().update_series(cursor, 'portfolio', [portfolio_id])
+        ewma_vol = load_ewma_volatility(cursor, 'portfolio', [portfolio_id]).get(portfolio_id)
+        
+        bump_data_version(cursor, 'risk_calculator')
+        context.commit()
         
         print(f"   REAL Risk metrics with proper beta against {benchmark_code}:")
         print(f"   VaR (95%): {var_95:.4f} ({var_95*100:.2f}%)")
         print(f"   Annual Volatility: {annual_vol:.4f} ({annual_vol*100:.1f}%)")
+        if ewma_vol is not None:
+            print(f"   EWMA Volatility: {ewma_vol:.4f} ({ewma_vol*100:.1f}%)")
         print(f"   Sharpe Ratio: {sharpe:.4f}")
         print(f"   Max Drawdown: {max_drawdown:.4f} ({max_drawdown*100:.2f}%)")
         print(f"   REAL Beta vs {benchmark_code}: {beta:.3f}")
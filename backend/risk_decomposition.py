@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from statistics import NormalDist
+import psycopg2
+from psycopg2.extras import execute_values
+from scipy import sparse
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_return_panel, load_lookthrough, node_residual_weights
+from factor_model import FactorRiskModel
+
+
+# Node rows expanded to dense N-wide blocks at a time when forming quadratic forms
+QUADRATIC_CHUNK = 2048
+
+
+def subtree_matrix(nodes, security_ids):
+    """Sparse nodes x securities matrix: the residual weight each node's subtree holds in each security.
+
+    Row n is the exposure removed if node n (and everything beneath it) were sold,
+    so a direct holding's row is the full lookthrough of that holding. Columns follow
+    security_ids.
+    """
+    parts = nodes['holding_path'].str.split(' -> ')
+    ancestors = parts.apply(lambda p: [' -> '.join(p[:i]) for i in range(1, len(p) + 1)])
+    exploded = nodes.assign(ancestor_path=ancestors).explode('ancestor_path')
+    node_index = pd.MultiIndex.from_frame(nodes[['portfolio_id', 'holding_path']])
+    rows = node_index.get_indexer(pd.MultiIndex.from_arrays(
+        [exploded['portfolio_id'].values, exploded['ancestor_path'].values]))
+    cols = pd.Index(security_ids).get_indexer(exploded['security_id'].values)
+    # Duplicate (node, security) entries are summed on conversion
+    return sparse.csr_matrix((exploded['residual_weight'].values.astype(float), (rows, cols)),
+                             shape=(len(nodes), len(security_ids)))
+
+
+def owner_row_products(M, X, owner):
+    """Row n of sparse M dotted with row owner[n] of dense X, without expanding X to M's shape"""
+    C = M.tocoo()
+    return np.bincount(C.row, weights=C.data * X[owner[C.row], C.col], minlength=M.shape[0])
+
+
+def covariance_quadratic_forms(M, covariance, chunk=QUADRATIC_CHUNK):
+    """diag(M Sigma M') for sparse M, with at most chunk x N of M @ Sigma dense at once"""
+    return np.concatenate([
+        np.asarray(M[i:i + chunk].multiply(M[i:i + chunk] @ covariance).sum(axis=1)).ravel()
+        for i in range(0, M.shape[0], chunk)]) if M.shape[0] else np.zeros(0)
+
+
+def factor_quadratic_forms(M, B, F, s):
+    """diag(M (B F B' + diag(s)) M') for sparse M in factor space"""
+    exposures = M @ B
+    return np.einsum('nk,kl,nl->n', exposures, F, exposures) + M.power(2) @ s
+
+
+class RiskDecomposition:
+    METHODS = ('parametric', 'factor', 'historical')
+
+    def __init__(self, method='parametric', confidence=0.95, window=252):
+        self.db_config = dict(DB_CONFIG)
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown decomposition method: {method}")
+        self.method = method
+        self.confidence = confidence
+        self.window = window
+
+    def parametric(self, W, M, owner, covariance_product, quadratic_forms):
+        """Marginal / component / incremental VaR from a covariance operator.
+
+        W: portfolios x N weights, M: sparse nodes x N subtree weights, owner: node ->
+        portfolio row. covariance_product(X) returns X @ Sigma for dense X and
+        quadratic_forms(M) returns each row's m' Sigma m, neither needing Sigma dense.
+        Incremental VaR is analytic: removing node m leaves variance
+        w'Sigma w - 2 m'Sigma w + m'Sigma m, so only Sigma w and each node's own form are needed.
+        """
+        z = NormalDist().inv_cdf(self.confidence)
+
+        sigma_w = covariance_product(W)                               # P x N
+        portfolio_var = (sigma_w * W).sum(axis=1)
+        portfolio_vol = np.sqrt(np.maximum(portfolio_var, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            marginal = np.where(portfolio_vol[:, None] > 0, z * sigma_w / portfolio_vol[:, None], 0.0)
+
+        node_marginal_exposure = owner_row_products(M, marginal, owner)   # d VaR / d(scale of node)
+        remaining_var = (portfolio_var[owner] - 2 * owner_row_products(M, sigma_w, owner)
+                         + quadratic_forms(M))
+        remaining_vol = np.sqrt(np.maximum(remaining_var, 0.0))
+
+        return z * portfolio_vol, node_marginal_exposure, z * portfolio_vol[owner] - z * remaining_vol
+
+    def historical(self, W, M, owner, scenarios):
+        """VaR decomposition from a scenarios x N return matrix.
+
+        Components are tail (expected-shortfall) contributions rescaled to sum to VaR;
+        incremental VaR revalues every node-removed portfolio in one matrix product.
+        """
+        tail_quantile = 1 - self.confidence
+        pnl = scenarios @ W.T                                         # T x P
+        var = -np.quantile(pnl, tail_quantile, axis=0)
+
+        in_tail = pnl <= -var[None, :]
+        tail_counts = np.maximum(in_tail.sum(axis=0), 1)
+        tail_mean_returns = (in_tail.T.astype(float) @ scenarios) / tail_counts[:, None]   # P x N
+        expected_shortfall = -(tail_mean_returns * W).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.where(expected_shortfall != 0, var / expected_shortfall, 0.0)
+        marginal = -tail_mean_returns * scale[:, None]
+
+        node_marginal_exposure = owner_row_products(M, marginal, owner)
+        remaining_pnl = pnl[:, owner] - (M @ scenarios.T).T           # T x nodes
+        remaining_var = -np.quantile(remaining_pnl, tail_quantile, axis=0)
+
+        return var, node_marginal_exposure, var[owner] - remaining_var
+
+    def decompose(self, calculation_date=None):
+        """Decompose VaR for every portfolio and lookthrough node and persist the results"""
+        calculation_date = calculation_date or datetime.now().date()
+        print(f" Decomposing {self.method} VaR ({self.confidence:.0%}) as of {calculation_date}...")
+
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+
+        nodes = node_residual_weights(load_lookthrough(cursor))
+        if nodes.empty:
+            print(" No lookthrough holdings found!")
+            conn.close()
+            return None
+
+        security_ids = sorted(int(s) for s in nodes['security_id'].unique())
+        M = subtree_matrix(nodes, security_ids)
+        W_frame = (nodes.pivot_table(index='portfolio_id', columns='security_id',
+                                     values='residual_weight', aggfunc='sum', fill_value=0.0)
+                   .reindex(columns=security_ids, fill_value=0.0))
+        portfolio_ids = list(W_frame.index)
+        owner = nodes['portfolio_id'].map({p: i for i, p in enumerate(portfolio_ids)}).values
+        W = W_frame.values
+
+        if self.method == 'factor':
+            model = FactorRiskModel().load_model(cursor)
+            if model is None:
+                print(" No factor model estimated yet")
+                conn.close()
+                return None
+            B = model['exposures'].reindex(security_ids, fill_value=0.0).values
+            F = model['covariance']
+            s = model['specific_variance'].reindex(security_ids).fillna(0.0).values
+            result = self.parametric(W, M, owner, lambda X: (X @ B) @ F @ B.T + X * s,
+                                     lambda X: factor_quadratic_forms(X, B, F, s))
+        else:
+            returns = load_return_panel(
+                cursor, security_ids,
+                start_date=calculation_date - timedelta(days=int(self.window * 7 / 5) + 14),
+                end_date=calculation_date,
+            ).reindex(columns=security_ids).iloc[-self.window:]
+            if self.method == 'parametric':
+                covariance = returns.cov().fillna(0.0).values
+                result = self.parametric(W, M, owner, lambda X: X @ covariance,
+                                         lambda X: covariance_quadratic_forms(X, covariance))
+            else:
+                result = self.historical(W, M, owner, returns.fillna(0.0).values)
+
+        portfolio_var, node_marginal_exposure, incremental = result
+        node_weight = nodes['portfolio_weight'].values
+        component = node_marginal_exposure
+        with np.errstate(invalid='ignore', divide='ignore'):
+            marginal = np.where(node_weight != 0, node_marginal_exposure / node_weight, 0.0)
+            pct = np.where(portfolio_var[owner] != 0, component / portfolio_var[owner], 0.0)
+
+        cursor.execute("""
+            DELETE FROM risk_decomposition
+            WHERE calculation_date = %s AND method = %s AND confidence = %s
+        """, [calculation_date, self.method, self.confidence])
+        execute_values(cursor, """
+            INSERT INTO risk_decomposition (
+                portfolio_id, calculation_date, method, confidence, holding_path, level,
+                security_id, portfolio_weight, portfolio_var, marginal_var, component_var,
+                incremental_var, pct_of_var
+            ) VALUES %s
+        """, [(int(row.portfolio_id), calculation_date, self.method, self.confidence,
+               row.holding_path, int(row.level), int(row.security_id), float(node_weight[i]),
+               float(portfolio_var[owner[i]]), float(marginal[i]), float(component[i]),
+               float(incremental[i]), float(pct[i]))
+              for i, row in enumerate(nodes.itertuples(index=False))], page_size=5000)
+
+        bump_data_version(cursor, 'risk_decomposition')
+        conn.commit()
+        conn.close()
+
+        for p_index, portfolio_id in enumerate(portfolio_ids):
+            mine = (owner == p_index) & (nodes['level'].values == 1)
+            print(f"   Portfolio {portfolio_id}: VaR {portfolio_var[p_index]*100:.2f}%")
+            for i in np.flatnonzero(mine):
+                print(f"     {nodes['holding_path'].iloc[i]:<30} component {component[i]*100:6.3f}% "
+                      f"({pct[i]*100:5.1f}%), incremental {incremental[i]*100:6.3f}%")
+        return calculation_date
+
+
+if __name__ == "__main__":
+    RiskDecomposition().decompose()
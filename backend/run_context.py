@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from functools import cached_property
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+
+from config import DB_CONFIG
+from market_data import load_holdings_history, load_base_currencies, portfolio_return_panel
+from fx import BaseCurrencyPanels
+from benchmark_blends import BenchmarkBlender, DEFAULT_BLEND
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts the statements it sends to the server"""
+    round_trips = 0
+
+    def execute(self, query, vars=None):
+        self.round_trips += 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self.round_trips += 1
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        self.round_trips += 1
+        return super().copy_expert(sql, file, size)
+
+
+def describe_benchmark(cursor, definition):
+    """Display details of a benchmark definition - a single index or a weighted blend.
+
+    'code' is the largest component (used when generating data); 'label' names the blend.
+    """
+    cursor.execute("""
+        SELECT benchmark_id, code, name FROM benchmarks WHERE benchmark_id = ANY(%s)
+    """, [[b for b, _ in definition['components']]])
+    names = {b: (code, name) for b, code, name in cursor.fetchall()}
+
+    # Default to ASX200 if the benchmark is missing
+    components = [{
+        'benchmark_id': b,
+        'code': names.get(b, ('ASX200', None))[0],
+        'name': names.get(b, (None, 'S&P/ASX 200 Index'))[1],
+        'weight': w
+    } for b, w in definition['components']]
+    primary = max(components, key=lambda c: c['weight'])
+    description = ' / '.join(f"{c['weight']:.0%} {c['code']}" for c in components)
+
+    return {
+        'benchmark_id': primary['benchmark_id'],
+        'code': primary['code'],
+        'name': primary['name'] if len(components) == 1 else description,
+        'label': primary['code'] if len(components) == 1 else description,
+        'components': components,
+        'definition': definition
+    }
+
+
+class RunContext:
+    """Inputs for one portfolio's risk run, each loaded once over a single connection.
+
+    Holdings, the benchmark assignment, base-currency security returns and the benchmark
+    series are read on first use and memoised together with the series derived from them,
+    so every metric in the run sees the same data. round_trips counts the statements sent.
+    """
+
+    def __init__(self, portfolio_id, start_date=None, end_date=None, currency_panels=None):
+        self.portfolio_id = portfolio_id
+        self.end_date = end_date or datetime.now().date()
+        self.start_date = start_date or self.end_date - timedelta(days=365)
+        # Callable (cursor, start_date, end_date) -> BaseCurrencyPanels, so callers can share panels
+        self.currency_panels = currency_panels or BaseCurrencyPanels
+        self.conn = psycopg2.connect(**DB_CONFIG)
+        self.cursor = self.conn.cursor(cursor_factory=CountingCursor)
+
+    @property
+    def round_trips(self):
+        return self.cursor.round_trips
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @cached_property
+    def benchmark(self):
+        definition = (BenchmarkBlender().get_portfolio_blends(self.cursor, [self.portfolio_id])
+                      .get(self.portfolio_id, DEFAULT_BLEND))
+        return describe_benchmark(self.cursor, definition)
+
+    @cached_property
+    def holdings(self):
+        """Holdings snapshots in force over the window, not just today's weights"""
+        return load_holdings_history(self.cursor, [self.portfolio_id], self.start_date, self.end_date)
+
+    @cached_property
+    def base_currency(self):
+        return load_base_currencies(self.cursor).get(self.portfolio_id, 'AUD')
+
+    @cached_property
+    def panels(self):
+        return self.currency_panels(self.cursor, self.start_date, self.end_date)
+
+    @cached_property
+    def security_returns(self):
+        """Local price moves plus FX in the portfolio's base currency, for every security held"""
+        if self.holdings.empty:
+            return pd.DataFrame(dtype=float)
+        security_ids = sorted(int(s) for s in self.holdings['security_id'].unique())
+        return self.panels.returns(self.base_currency, security_ids).dropna(how='all')
+
+    @cached_property
+    def portfolio_returns(self):
+        """Daily portfolio returns from point-in-time holdings (None when nothing is held)"""
+        if self.security_returns.empty:
+            return None
+        unknown = self.panels.unconverted(self.base_currency, self.security_returns.columns)
+        daily = portfolio_return_panel(self.holdings, self.security_returns, unknown)
+        if self.portfolio_id not in daily.columns:
+            return None
+        # No return before the first holdings snapshot took effect, or while a holding
+        # has no FX conversion into the base currency
+        daily = daily[self.portfolio_id]
+        if unknown.any().any() and daily.isna().any():
+            print(f"Warning: {int(daily.isna().sum())} days without a portfolio return "
+                  f"(holdings without FX into {self.base_currency})")
+        daily = daily.dropna()
+        return daily if not daily.empty else None
+
+    @cached_property
+    def benchmark_returns(self):
+        """Benchmark (or blend composite) returns over the window"""
+        return BenchmarkBlender().definition_returns(self.cursor, self.benchmark['definition'],
+                                                     self.start_date, self.end_date)
+
+    @cached_property
+    def aligned_returns(self):
+        """Portfolio and benchmark returns on their common dates"""
+        if self.portfolio_returns is None:
+            return pd.DataFrame(columns=['portfolio_return', 'benchmark_return'], dtype=float)
+        return pd.concat({'portfolio_return': self.portfolio_returns,
+                          'benchmark_return': self.benchmark_returns}, axis=1, join='inner')
+
+    @cached_property
+    def active_returns(self):
+        return self.aligned_returns['portfolio_return'] - self.aligned_returns['benchmark_return']
@@ -0,0 +1,302 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from multiprocessing import Pool
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import copy_frame
+from security_returns import refresh_security_returns
+from series_store import SeriesStore
+
+# Every generated row is tagged so a fixture can be found and dropped again
+FIXTURE_EXCHANGE = 'SCALE'
+FIXTURE_PREFIX = 'SCALE'
+
+# Country -> (ISIN prefix, currency); a per-country factor drives price correlation
+COUNTRIES = {'AUS': ('AU', 'AUD'), 'USA': ('US', 'USD'), 'GBR': ('GB', 'GBP'), 'DEU': ('DE', 'EUR')}
+COUNTRY_SHARES = [0.35, 0.45, 0.1, 0.1]
+BOND_SHARE = 0.15
+# Share of each fund's weight published as constituents (the rest stays fund residual)
+PUBLISHED_WEIGHT = 0.97
+ANNUAL_MARKET_VOL = 0.16
+ANNUAL_COUNTRY_VOL = 0.08
+ANNUAL_SPECIFIC_VOL = 0.25
+
+
+def _check_digit(digits):
+    """Luhn check digit over a digit string (the ISIN scheme)"""
+    total = 0
+    for i, d in enumerate(int(c) for c in reversed(digits)):
+        if i % 2 == 0:
+            d *= 2
+        total += d // 10 + d % 10
+    return str((10 - total % 10) % 10)
+
+
+def _alnum_value(c):
+    return int(c) if c.isdigit() else ord(c) - 55
+
+
+def isin(prefix, nsin):
+    return prefix + nsin + _check_digit(''.join(str(_alnum_value(c)) for c in prefix + nsin))
+
+
+def cusip(base):
+    total = 0
+    for i, c in enumerate(base):
+        v = _alnum_value(c) * (2 if i % 2 else 1)
+        total += v // 10 + v % 10
+    return base + str((10 - total % 10) % 10)
+
+
+def sedol(base):
+    total = sum(_alnum_value(c) * w for c, w in zip(base, (1, 3, 1, 7, 3, 9)))
+    return base + str((10 - total % 10) % 10)
+
+
+def generate_securities(rng, n_securities, n_funds):
+    """Securities master with valid ISIN/SEDOL (and CUSIP for US) check digits"""
+    countries = rng.choice(list(COUNTRIES), size=n_securities, p=COUNTRY_SHARES)
+    is_fund = np.zeros(n_securities, dtype=bool)
+    is_fund[:n_funds] = True
+    is_bond = ~is_fund & (rng.random(n_securities) < BOND_SHARE)
+
+    rows = []
+    for i in range(n_securities):
+        prefix, currency = COUNTRIES[countries[i]]
+        number = f'{i:08d}'
+        us_cusip = cusip('9' + number[1:]) if countries[i] == 'USA' else None
+        kind = 'ETF' if is_fund[i] else ('Bond' if is_bond[i] else 'Stock')
+        rows.append({
+            'ticker': f"{FIXTURE_PREFIX}{'F' if is_fund[i] else 'S'}{i:06d}",
+            'name': f"Scale {kind} {i}",
+            'isin': isin(prefix, us_cusip if us_cusip else '9' + number),
+            'cusip': us_cusip,
+            'sedol': sedol(f'B{i % 100000:05d}'),
+            'security_type': kind,
+            'asset_class': 'Fixed Income' if is_bond[i] else 'Equity',
+            'currency': currency,
+            'is_fund': bool(is_fund[i]),
+            'has_underlying_holdings': bool(is_fund[i]),
+            'fund_type': 'ETF' if is_fund[i] else None,
+            'exchange': FIXTURE_EXCHANGE,
+            'country_of_domicile': countries[i],
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_fund_trees(rng, fund_ids, stock_ids, depth, fund_size, overlap):
+    """Fund-of-funds layers: each layer holds funds from the next one plus stocks.
+
+    Constituents are drawn with Zipf-like popularity (exponent = overlap), so larger
+    overlap concentrates funds on the same names, as index funds do.
+    """
+    layers = np.array_split(rng.permutation(fund_ids), depth)
+    popularity = 1.0 / np.arange(1, len(stock_ids) + 1) ** overlap
+    popularity /= popularity.sum()
+
+    frames = []
+    for k, layer in enumerate(layers):
+        below = layers[k + 1] if k + 1 < depth else np.array([], dtype=int)
+        for fund_id in layer:
+            n_funds = min(len(below), int(rng.integers(2, 6))) if len(below) else 0
+            held_funds = rng.choice(below, size=n_funds, replace=False) if n_funds else []
+            n_stocks = max(fund_size - n_funds, 1)
+            held_stocks = rng.choice(stock_ids, size=min(n_stocks, len(stock_ids)), replace=False, p=popularity)
+            held = np.concatenate([np.asarray(held_funds, dtype=int), held_stocks])
+            weights = rng.lognormal(0.0, 1.0, len(held))
+            weights *= PUBLISHED_WEIGHT / weights.sum()
+            frames.append(pd.DataFrame({'fund_security_id': fund_id, 'underlying_security_id': held,
+                                        'weight': weights.round(6)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_prices(rng, security_ids, countries, asset_classes, dates):
+    """Correlated price paths: market factor x beta + country factor + specific noise"""
+    T, N = len(dates), len(security_ids)
+    country_codes = list(COUNTRIES)
+    daily = np.sqrt(252)
+    market = rng.normal(0.0003, ANNUAL_MARKET_VOL / daily, T)
+    country = rng.normal(0.0, ANNUAL_COUNTRY_VOL / daily, (T, len(country_codes)))
+
+    bond = (asset_classes == 'Fixed Income').values
+    beta = np.where(bond, rng.normal(0.1, 0.05, N), rng.normal(1.0, 0.3, N))
+    specific_vol = np.where(bond, 0.04, rng.uniform(0.5, 1.5, N) * ANNUAL_SPECIFIC_VOL) / daily
+    position = pd.Index(country_codes).get_indexer(countries)
+
+    returns = (market[:, None] * beta + country[:, position] * np.where(bond, 0.2, 1.0)
+               + rng.standard_normal((T, N)) * specific_vol)
+    returns[0] = 0.0
+    start = rng.uniform(5, 200, N)
+    return start * np.exp(np.cumsum(np.log1p(returns), axis=0))
+
+
+def _load_price_chunk(args):
+    """Worker process: COPY one chunk of price history and derive its stored returns"""
+    db_config, security_ids, dates, prices = args
+    T, N = prices.shape
+    frame = pd.DataFrame({
+        'security_id': np.tile(security_ids, T),
+        'date': np.repeat(dates, N),
+        'close_price': prices.ravel().round(6),
+        'data_source': 'scale_fixture',
+    })
+    conn = psycopg2.connect(**db_config)
+    cursor = conn.cursor()
+    copy_frame(cursor, 'security_prices', frame)
+    refresh_security_returns(cursor, {int(s): None for s in security_ids})
+    conn.commit()
+    conn.close()
+    return len(frame)
+
+
+class ScaleFixtures:
+    """Generate and bulk-load a large synthetic universe for performance testing"""
+
+    def __init__(self, securities=5000, funds=200, depth=3, fund_size=60, overlap=1.0,
+                 portfolios=500, holdings=25, history_days=1260, snapshot_frequency='M',
+                 workers=4, seed=42):
+        self.db_config = dict(DB_CONFIG)
+        self.n_securities = securities
+        self.n_funds = min(funds, securities // 2)
+        self.depth = depth
+        self.fund_size = fund_size
+        self.overlap = overlap
+        self.n_portfolios = portfolios
+        self.n_holdings = holdings
+        self.history_days = history_days
+        self.snapshot_frequency = snapshot_frequency
+        self.workers = workers
+        self.rng = np.random.default_rng(seed)
+
+    def drop(self, cursor):
+        """Delete a previous fixture, clearing every table that references its portfolios or securities"""
+        cursor.execute("SELECT security_id FROM securities WHERE exchange = %s", [FIXTURE_EXCHANGE])
+        security_ids = [r[0] for r in cursor.fetchall()]
+        cursor.execute("SELECT portfolio_id FROM portfolios WHERE code LIKE %s", [FIXTURE_PREFIX + '%'])
+        portfolio_ids = [r[0] for r in cursor.fetchall()]
+        if not security_ids and not portfolio_ids:
+            return
+
+        cursor.execute("""
+            SELECT c.conrelid::regclass::text, a.attname, c.confrelid::regclass::text
+            FROM pg_constraint c
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+            WHERE c.contype = 'f' AND c.confrelid IN ('portfolios'::regclass, 'securities'::regclass)
+        """)
+        for table, column, parent in cursor.fetchall():
+            ids = portfolio_ids if parent == 'portfolios' else security_ids
+            if ids:
+                cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s)", [ids])
+        cursor.execute("DELETE FROM portfolios WHERE portfolio_id = ANY(%s)", [portfolio_ids])
+        cursor.execute("DELETE FROM securities WHERE security_id = ANY(%s)", [security_ids])
+        print(f" Dropped previous fixture ({len(security_ids)} securities, {len(portfolio_ids)} portfolios)")
+
+    def load_reference_ids(self, cursor):
+        cursor.execute("SELECT code, currency_id FROM currencies")
+        currencies = {code.strip(): currency_id for code, currency_id in cursor.fetchall()}
+        missing = {c for _, c in COUNTRIES.values()} - set(currencies)
+        if missing:
+            raise ValueError(f"Currencies missing from the database: {sorted(missing)}")
+        cursor.execute("SELECT name, asset_class_id FROM asset_classes")
+        return currencies, dict(cursor.fetchall())
+
+    def insert_securities(self, cursor, securities, currencies, asset_classes):
+        frame = securities.assign(
+            currency_id=securities['currency'].map(currencies),
+            asset_class_id=securities['asset_class'].map(asset_classes),
+        ).drop(columns=['currency', 'asset_class'])
+        copy_frame(cursor, 'securities', frame)
+        cursor.execute("SELECT ticker, security_id FROM securities WHERE exchange = %s", [FIXTURE_EXCHANGE])
+        ids = dict(cursor.fetchall())
+        return securities['ticker'].map(ids).values
+
+    def holdings_history(self, fund_ids, stock_ids, dates, prices, id_position):
+        """Level-1 holdings per portfolio at each snapshot date, weights drifting between snapshots"""
+        snapshots = pd.Series(dates, index=dates).groupby(
+            pd.DatetimeIndex(dates).to_period(self.snapshot_frequency)).last().values
+        snapshots = np.unique(np.append(snapshots, dates[-1]))
+        date_position = pd.Index(dates).get_indexer(snapshots)
+        candidates = np.concatenate([fund_ids, stock_ids])
+
+        frames = []
+        for p in range(self.n_portfolios):
+            held = self.rng.choice(candidates, size=min(self.n_holdings, len(candidates)), replace=False)
+            weights = self.rng.dirichlet(np.ones(len(held)))
+            value = float(self.rng.uniform(1e6, 1e8))
+            for snapshot, t in zip(snapshots, date_position):
+                # Random rebalance drift, renormalised
+                weights = weights * self.rng.lognormal(0.0, 0.05, len(held))
+                weights /= weights.sum()
+                market_value = (value * weights).round(2)
+                price = prices[t, id_position[held]]
+                frames.append(pd.DataFrame({
+                    'portfolio_index': p, 'security_id': held, 'date': snapshot,
+                    'quantity': (market_value / price).round(6), 'market_value': market_value,
+                    'weight': weights.round(6), 'holding_level': 1,
+                }))
+        return pd.concat(frames, ignore_index=True)
+
+    def generate(self, drop_existing=True):
+        started = datetime.now()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+        if drop_existing:
+            self.drop(cursor)
+
+        currencies, asset_classes = self.load_reference_ids(cursor)
+        securities = generate_securities(self.rng, self.n_securities, self.n_funds)
+        security_ids = self.insert_securities(cursor, securities, currencies, asset_classes)
+        fund_ids, stock_ids = security_ids[securities['is_fund'].values], security_ids[~securities['is_fund'].values]
+        print(f" Created {len(stock_ids)} securities and {len(fund_ids)} funds")
+
+        trees = generate_fund_trees(self.rng, fund_ids, stock_ids, self.depth, self.fund_size, self.overlap)
+        today = datetime.now().date()
+        trees['date'] = today
+        trees['market_value'] = (trees['weight'] * 1e8).round(2)
+        trees['data_source'] = 'scale_fixture'
+        copy_frame(cursor, 'fund_holdings', trees[['fund_security_id', 'underlying_security_id', 'date',
+                                                   'market_value', 'weight', 'data_source']])
+        print(f" Created {len(trees)} fund holdings across {self.depth} fund layers")
+
+        dates = pd.bdate_range(end=today, periods=self.history_days).date
+        prices = generate_prices(self.rng, security_ids, securities['country_of_domicile'],
+                                 securities['asset_class'], dates)
+        id_position = pd.Series(np.arange(len(security_ids)), index=security_ids)
+
+        portfolio_codes = [f'{FIXTURE_PREFIX}{p:05d}' for p in range(self.n_portfolios)]
+        bases = self.rng.choice(['AUD', 'USD'], size=self.n_portfolios, p=[0.7, 0.3])
+        copy_frame(cursor, 'portfolios', pd.DataFrame({
+            'name': [f'Scale Portfolio {p}' for p in range(self.n_portfolios)],
+            'code': portfolio_codes,
+            'base_currency_id': [currencies[b] for b in bases],
+            'inception_date': dates[0],
+        }))
+        cursor.execute("SELECT code, portfolio_id FROM portfolios WHERE code = ANY(%s)", [portfolio_codes])
+        portfolio_ids = dict(cursor.fetchall())
+
+        holdings = self.holdings_history(fund_ids, stock_ids, dates, prices, id_position)
+        holdings['portfolio_id'] = [portfolio_ids[portfolio_codes[p]] for p in holdings['portfolio_index']]
+        copy_frame(cursor, 'portfolio_holdings', holdings.drop(columns=['portfolio_index']))
+        conn.commit()
+        print(f" Created {self.n_portfolios} portfolios with {len(holdings)} holding rows")
+
+        # Prices dominate the volume: each worker formats and COPYs its own chunk of securities
+        chunks = np.array_split(np.arange(len(security_ids)), max(self.workers * 4, 1))
+        jobs = [(self.db_config, security_ids[c], dates, prices[:, c]) for c in chunks if len(c)]
+        with Pool(self.workers) as pool:
+            rows = sum(pool.imap_unordered(_load_price_chunk, jobs))
+        print(f" Loaded {rows} price rows with {self.workers} workers")
+        # Readers trust the binary series store, so build the fixture's blocks now
+        SeriesStore().refresh(security_ids)
+
+        bump_data_version(cursor, 'scale_fixtures')
+        conn.commit()
+        conn.close()
+        print(f" Scale fixture ready in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    ScaleFixtures().generate()
@@ -0,0 +1,14 @@
+def refresh_security_returns(cursor, changes=None):
+    """Recompute stored returns after a price write - call on the writing cursor before commit.
+
+    changes maps security_id to the earliest date whose price was inserted or corrected
+    (None recomputes that security's whole history); omit it to rebuild every security.
+    The same call marks the securities' series store blocks for rebuild (security_series_dirty).
+    """
+    if changes is None:
+        cursor.execute("SELECT refresh_security_returns(NULL, NULL)")
+    else:
+        security_ids = [int(s) for s in changes]
+        cursor.execute("SELECT refresh_security_returns(%s::int[], %s::date[])",
+                       [security_ids, [changes[s] for s in changes]])
+    return cursor.fetchone()[0]
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import load_price_panel, load_return_panel
+
+# Block layout: day-of-year offsets, close prices, and returns since the previous close
+DAY_DTYPE = np.dtype('<u2')
+PRICE_DTYPE = np.dtype('<f8')
+RETURN_DTYPE = np.dtype('<f4')
+# Securities rebuilt per price query while refreshing the store
+REFRESH_BATCH = 500
+
+
+def encode_blocks(prices, first_year):
+    """Per-year binary blocks for one security's sorted close price series.
+
+    Returns are taken before splitting by year so each block's first return is
+    measured from the previous year's last close.
+    """
+    returns = prices / prices.shift(1) - 1
+    years = prices.index.year
+    for year in np.unique(years[years >= first_year]):
+        mask = years == year
+        days = (prices.index[mask] - pd.Timestamp(year=int(year), month=1, day=1)).days
+        block_prices = prices.values[mask].astype(PRICE_DTYPE)
+        yield (int(year), np.asarray(days, dtype=DAY_DTYPE).tobytes(), block_prices.tobytes(),
+               returns.values[mask].astype(RETURN_DTYPE).tobytes(), int(mask.sum()),
+               prices.index[mask][-1].date(), float(block_prices.sum()))
+
+
+def assemble_panel(blocks, start_date=None, end_date=None):
+    """Dates x security_id panel from (security_id, year, days, values, dtype) blocks in one pass"""
+    if not blocks:
+        return pd.DataFrame(dtype=float)
+
+    # Concatenate every block's buffers and decode once rather than per block
+    security_ids, columns = np.unique([b[0] for b in blocks], return_inverse=True)
+    dtype = blocks[0][4]
+    offsets = np.frombuffer(b''.join(b[2] for b in blocks), dtype=DAY_DTYPE)
+    values = np.frombuffer(b''.join(b[3] for b in blocks), dtype=dtype)
+    lengths = np.array([len(b[2]) // DAY_DTYPE.itemsize for b in blocks])
+    year_starts = np.array([f'{b[1]}-01-01' for b in blocks], dtype='datetime64[D]').astype(np.int32)
+
+    # Calendar days are a small dense range, so a presence mask replaces sorting every observation
+    first_day = year_starts.min()
+    day_numbers = np.repeat(year_starts - first_day, lengths) + offsets
+    present = np.zeros(day_numbers.max() + 1, dtype=bool)
+    present[day_numbers] = True
+    dates = np.flatnonzero(present).astype('timedelta64[D]') + np.datetime64(int(first_day), 'D')
+    rows = (np.cumsum(present) - 1)[day_numbers]
+
+    panel = np.full((len(dates), len(security_ids)), np.nan)
+    panel[rows, np.repeat(columns, lengths)] = values
+
+    frame = pd.DataFrame(panel, index=pd.DatetimeIndex(dates), columns=security_ids)
+    frame.columns.name = 'security_id'
+    return frame.loc[pd.Timestamp(start_date) if start_date else None:
+                     pd.Timestamp(end_date) if end_date else None]
+
+
+def _load_blocks(cursor, field, dtype, security_ids, start_date, end_date):
+    cursor.execute(f"""
+        SELECT security_id, year, day_offsets, {field}
+        FROM security_series_blocks
+        WHERE (%s::int[] IS NULL OR security_id = ANY(%s::int[]))
+        AND (%s::int IS NULL OR year >= %s::int)
+        AND (%s::int IS NULL OR year <= %s::int)
+    """, [security_ids, security_ids,
+          start_date and start_date.year, start_date and start_date.year,
+          end_date and end_date.year, end_date and end_date.year])
+    return [(s, y, bytes(d), bytes(v), dtype) for s, y, d, v in cursor.fetchall()]
+
+
+def dirty_securities(cursor, security_ids=None, end_date=None):
+    """Securities with prices written since their blocks were rebuilt, from a date on or
+    before end_date; price writers mark them (refresh_security_returns), so this reads
+    only the small security_series_dirty table"""
+    cursor.execute("""
+        SELECT security_id FROM security_series_dirty
+        WHERE (%s::int[] IS NULL OR security_id = ANY(%s::int[]))
+        AND (%s::date IS NULL OR since <= %s::date)
+    """, [security_ids, security_ids, end_date, end_date])
+    return {s for s, in cursor.fetchall()}
+
+
+def _load_panel(cursor, field, dtype, security_ids, start_date, end_date, fallback):
+    """Panel from the binary store, reading securities with unrebuilt price writes from their source table"""
+    ids = None if security_ids is None else [int(s) for s in security_ids]
+    stale = dirty_securities(cursor, ids, end_date)
+    blocks = [b for b in _load_blocks(cursor, field, dtype, ids, start_date, end_date) if b[0] not in stale]
+    panels = [assemble_panel(blocks, start_date, end_date).astype(float)] if blocks else []
+    if stale:
+        panels.append(fallback(cursor, sorted(stale), start_date, end_date))
+    if not panels:
+        return pd.DataFrame(dtype=float)
+    panel = pd.concat(panels, axis=1).sort_index()
+    panel.columns.name = 'security_id'
+    return panel
+
+
+def load_stored_prices(cursor, security_ids=None, start_date=None, end_date=None):
+    """Close price panel read from the binary store; securities with prices written since
+    the last refresh come from security_prices"""
+    return _load_panel(cursor, 'prices', PRICE_DTYPE, security_ids, start_date, end_date, load_price_panel)
+
+
+def load_stored_returns(cursor, security_ids=None, start_date=None, end_date=None):
+    """Return panel from the binary store: each security's return since its previous close.
+    Securities with prices written since the last refresh come from security_returns."""
+    return _load_panel(cursor, 'returns', RETURN_DTYPE, security_ids, start_date, end_date, load_return_panel)
+
+
+class SeriesStore:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+
+    def dirty_years(self, cursor, security_ids=None):
+        """Marked securities with the earliest year to rebuild (0 = whole history) and the mark
+        as read, so clearing it can tell whether a writer re-marked the security since"""
+        cursor.execute("""
+            SELECT security_id,
+                   CASE WHEN since = '-infinity' THEN 0 ELSE EXTRACT(YEAR FROM since)::int END,
+                   since::text, marked_at::text
+            FROM security_series_dirty
+            WHERE %s::int[] IS NULL OR security_id = ANY(%s::int[])
+        """, [security_ids, security_ids])
+        return pd.DataFrame(cursor.fetchall(), columns=['security_id', 'first_year', 'since', 'marked_at'])
+
+    def refresh(self, security_ids=None, cursor=None):
+        """Rebuild marked securities' blocks from their earliest changed year onwards.
+
+        With a cursor the rebuild joins the caller's transaction and the caller commits.
+        Marks are cleared unless a price writer re-marked the security meanwhile.
+        """
+        conn = None
+        if cursor is None:
+            conn = psycopg2.connect(**self.db_config)
+            cursor = conn.cursor()
+
+        ids = None if security_ids is None else [int(s) for s in security_ids]
+        dirty = self.dirty_years(cursor, ids)
+        if dirty.empty:
+            print(" Series store is up to date")
+            if conn is not None:
+                conn.close()
+            return 0
+
+        written = 0
+        for first_year, group in dirty.groupby('first_year'):
+            marked = [int(s) for s in group['security_id']]
+            for i in range(0, len(marked), REFRESH_BATCH):
+                batch = marked[i:i + REFRESH_BATCH]
+                # A year earlier so the first rebuilt block's opening return has a previous close
+                start = date(int(first_year) - 1, 1, 1) if first_year > 1 else None
+                prices = load_price_panel(cursor, batch, start_date=start)
+                rows = [(int(s), *block)
+                        for s in batch if s in prices.columns
+                        for block in encode_blocks(prices[s].dropna(), first_year)]
+
+                execute_values(cursor, """
+                    DELETE FROM security_series_blocks b
+                    USING (VALUES %s) AS v(security_id, year)
+                    WHERE b.security_id = v.security_id AND b.year >= v.year
+                """, [(int(s), int(first_year)) for s in batch])
+                execute_values(cursor, """
+                    INSERT INTO security_series_blocks (
+                        security_id, year, day_offsets, prices, returns, n_obs, last_date, price_sum
+                    ) VALUES %s
+                """, [(s, y, psycopg2.Binary(d), psycopg2.Binary(p), psycopg2.Binary(r), n, last, total)
+                      for s, y, d, p, r, n, last, total in rows], page_size=1000)
+                written += len(rows)
+
+        execute_values(cursor, """
+            DELETE FROM security_series_dirty d
+            USING (VALUES %s) AS v(security_id, since, marked_at)
+            WHERE d.security_id = v.security_id AND d.since::text = v.since
+            AND d.marked_at::text = v.marked_at
+        """, [(int(s), since, marked_at) for s, since, marked_at
+              in zip(dirty['security_id'], dirty['since'], dirty['marked_at'])],
+            template="(%s::int, %s::text, %s::text)")
+
+        bump_data_version(cursor, 'series_store')
+        if conn is not None:
+            conn.commit()
+            conn.close()
+
+        print(f" Rebuilt {written} series blocks for {len(dirty)} securities")
+        return written
+
+
+if __name__ == "__main__":
+    SeriesStore().refresh()
@@ -2,6 +2,7 @@
 const cors = require('cors');
 const { Pool } = require('pg');
 require('dotenv').config();
+const { lttb } = require('./downsample');
 
 const app = express();
 const port = process.env.PORT || 5000;
@@ -29,119 +30,443 @@ pool.connect((err, client, release) => {
   }
 });
 
-// API Routes
+// =====================================================
+// DATA VERSION CACHE
+// =====================================================
 
-// Get portfolio summary
-app.get('/api/portfolio/summary', async (req, res) => {
+// Read endpoints only change after a load or risk run. Python writers bump
+// data_version on commit; responses are cached in-process per version and
+// served with an ETag so polling clients get a 304 without touching the views.
+const DATA_VERSION_TTL_MS = parseInt(process.env.DATA_VERSION_TTL_MS || '5000', 10);
+// Least recently used responses are evicted past this many entries within one data version
+const RESPONSE_CACHE_MAX = parseInt(process.env.RESPONSE_CACHE_MAX || '1000', 10);
+
+let dataVersion = null;
+let dataVersionCheckedAt = 0;
+const responseCache = new Map();
+
+const setDataVersion = (version) => {
+  if (version !== dataVersion) {
+    responseCache.clear();
+    dataVersion = version;
+  }
+  dataVersionCheckedAt = Date.now();
+};
+
+// Listen for bumps so invalidation is immediate; the TTL check is the fallback
+const listenForDataVersion = async () => {
   try {
-    const result = await pool.query('SELECT * FROM v_portfolio_summary');
-    if (result.rows.length > 0) {
-      res.json(result.rows[0]);
-    } else {
-      res.status(404).json({ error: 'Portfolio not found' });
-    }
+    const client = await pool.connect();
+    client.on('notification', (msg) => setDataVersion(msg.payload));
+    client.on('error', (err) => {
+      console.error('Data version listener error:', err.message);
+      client.release(true);
+      setTimeout(listenForDataVersion, DATA_VERSION_TTL_MS);
+    });
+    await client.query('LISTEN data_version');
   } catch (err) {
-    console.error('Error fetching portfolio summary:', err);
-    res.status(500).json({ error: 'Internal server error' });
+    console.error('Could not listen for data version changes:', err.message);
   }
-});
+};
+listenForDataVersion();
 
-// Get current holdings (direct holdings)
-app.get('/api/portfolio/holdings', async (req, res) => {
+const getDataVersion = async () => {
+  if (dataVersion !== null && Date.now() - dataVersionCheckedAt < DATA_VERSION_TTL_MS) {
+    return dataVersion;
+  }
+  const result = await pool.query('SELECT version FROM data_version');
+  setDataVersion(String(result.rows[0].version));
+  return dataVersion;
+};
+
+// Path plus sorted query parameters, so parameter order and repeats don't fork entries
+const cacheKey = (req) => {
+  const params = Object.keys(req.query).sort().map((name) => [name, req.query[name]]);
+  return `${req.baseUrl}${req.path}?${JSON.stringify(params)}`;
+};
+
+const cacheGet = (key) => {
+  const entry = responseCache.get(key);
+  if (entry) {
+    // Re-insert so Map order tracks recency
+    responseCache.delete(key);
+    responseCache.set(key, entry);
+  }
+  return entry;
+};
+
+const cacheSet = (key, entry) => {
+  responseCache.delete(key);
+  responseCache.set(key, entry);
+  while (responseCache.size > RESPONSE_CACHE_MAX) {
+    responseCache.delete(responseCache.keys().next().value);
+  }
+};
+
+// Local calendar date (YYYY-MM-DD): lookthrough, exposure and performance reads are
+// anchored on CURRENT_DATE, so cached bodies go stale at midnight as well as on writes
+const serverDate = () => new Date().toLocaleDateString('en-CA');
+
+// Wrap a read-only loader: returns 304 on a matching If-None-Match and only
+// calls load(req) when the cached body is from an older data version or day
+const cachedJson = (label, load, { notFound } = {}) => async (req, res) => {
   try {
-    const result = await pool.query(`
-      SELECT 
-        ticker,
-        security_name,
-        security_type,
-        asset_class,
-        quantity,
-        market_value,
-        weight,
-        date
-      FROM v_current_holdings
-      ORDER BY weight DESC
-    `);
-    res.json(result.rows);
+    const version = `${await getDataVersion()}-${serverDate()}`;
+    const etag = `W/"dv-${version}"`;
+    res.set('ETag', etag);
+    res.set('Cache-Control', 'no-cache');
+
+    const ifNoneMatch = req.headers['if-none-match'] || '';
+    if (ifNoneMatch.split(/\s*,\s*/).includes(etag)) {
+      return res.status(304).end();
+    }
+
+    const key = cacheKey(req);
+    let entry = cacheGet(key);
+    if (!entry || entry.version !== version) {
+      entry = { version, body: await load(req) };
+      cacheSet(key, entry);
+    }
+
+    if (entry.body == null) {
+      return res.status(404).json({ error: notFound });
+    }
+    res.json(entry.body);
   } catch (err) {
-    console.error('Error fetching holdings:', err);
+    if (err.status) {
+      return res.status(err.status).json({ error: err.message });
+    }
+    console.error(`Error fetching ${label}:`, err);
     res.status(500).json({ error: 'Internal server error' });
   }
-});
+};
 
-// Get complete portfolio lookthrough
-app.get('/api/portfolio/lookthrough', async (req, res) => {
+// =====================================================
+// PAGINATED AND STREAMED LISTS
+// =====================================================
+
+// Large lists support three modes on the same route:
+//   (default)                    full JSON array, as before
+//   ?limit=N[&cursor=...]        keyset page: { data, next_cursor }
+//   ?format=ndjson               one JSON row per line, read from a server-side cursor
+// Each resource also accepts its own server-side filters.
+const MAX_PAGE_SIZE = 5000;
+const STREAM_BATCH_SIZE = 1000;
+
+const badRequest = (message) => Object.assign(new Error(message), { status: 400 });
+
+const parseNumber = (raw) => {
+  const value = Number(raw);
+  return raw !== '' && Number.isFinite(value) ? value : null;
+};
+const parseInteger = (raw) => {
+  const value = parseNumber(raw);
+  return Number.isInteger(value) ? value : null;
+};
+const parseText = (raw) => (typeof raw === 'string' && raw !== '' ? raw : null);
+
+const encodeCursor = (values) => Buffer.from(JSON.stringify(values)).toString('base64url');
+
+const decodeCursor = (cursor, keys) => {
   try {
-    const result = await pool.query(`
-      SELECT 
-        portfolio_name,
-        level,
-        holding_path,
-        ticker,
-        security_name,
-        security_type,
-        market_value,
-        portfolio_weight,
-        holding_type
-      FROM v_portfolio_lookthrough
-      ORDER BY level, portfolio_weight DESC
-    `);
-    res.json(result.rows);
+    const values = JSON.parse(Buffer.from(cursor, 'base64url').toString());
+    if (Array.isArray(values) && values.length === keys.length) {
+      return values;
+    }
   } catch (err) {
-    console.error('Error fetching lookthrough data:', err);
-    res.status(500).json({ error: 'Internal server error' });
+    // fall through
+  }
+  throw badRequest('Invalid cursor');
+};
+
+// Rows strictly after `values` in a (possibly mixed-direction) ORDER BY. Keys sort
+// NULLS LAST, so a NULL key value equals only NULL and nothing sorts after it.
+const keysetPredicate = (keys, values, bind) => {
+  const placeholders = values.map((value) => (value === null ? null : bind(value)));
+  const equals = (key, j) => (placeholders[j] === null
+    ? `${key.column} IS NULL`
+    : `${key.column} = ${placeholders[j]}`);
+  const branches = keys.map((key, i) => {
+    if (placeholders[i] === null) {
+      return null;
+    }
+    const terms = keys.slice(0, i).map(equals);
+    terms.push(`(${key.column} ${key.desc ? '<' : '>'} ${placeholders[i]} OR ${key.column} IS NULL)`);
+    return `(${terms.join(' AND ')})`;
+  }).filter((branch) => branch !== null);
+  return branches.length > 0 ? `(${branches.join(' OR ')})` : 'FALSE';
+};
+
+const buildListQuery = (spec, query, { limit, after } = {}) => {
+  const params = [];
+  const bind = (value) => {
+    params.push(value);
+    return `$${params.length}`;
+  };
+
+  const where = [...(spec.where || [])];
+  for (const filter of spec.filters || []) {
+    if (query[filter.param] === undefined) continue;
+    const value = filter.parse(query[filter.param]);
+    if (value === null) {
+      throw badRequest(`Invalid ${filter.param}`);
+    }
+    where.push(`${filter.column} ${filter.op} ${bind(value)}`);
+  }
+  if (after) {
+    where.push(keysetPredicate(spec.keys, after, bind));
+  }
+
+  const orderBy = spec.keys.map((k) => `${k.column}${k.desc ? ' DESC' : ''} NULLS LAST`).join(', ');
+  let sql = `SELECT ${spec.columns} FROM ${spec.from}`;
+  if (where.length > 0) {
+    sql += ` WHERE ${where.join(' AND ')}`;
+  }
+  sql += ` ORDER BY ${orderBy}`;
+  if (limit) {
+    // One extra row tells us whether another page exists
+    sql += ` LIMIT ${bind(limit + 1)}`;
   }
+  return { sql, params };
+};
+
+// Filters read the query string plus route params (e.g. /:id), route params winning
+const listFilters = (req) => ({ ...req.query, ...req.params });
+
+const loadList = async (spec, req) => {
+  const paged = req.query.limit !== undefined || req.query.cursor !== undefined;
+  if (!paged) {
+    const { sql, params } = buildListQuery(spec, listFilters(req));
+    return (await pool.query(sql, params)).rows;
+  }
+
+  const limit = req.query.limit === undefined ? MAX_PAGE_SIZE : parseInteger(req.query.limit);
+  if (limit === null || limit < 1) {
+    throw badRequest('Invalid limit');
+  }
+  const pageSize = Math.min(limit, MAX_PAGE_SIZE);
+  const after = req.query.cursor ? decodeCursor(req.query.cursor, spec.keys) : null;
+
+  const { sql, params } = buildListQuery(spec, listFilters(req), { limit: pageSize, after });
+  const rows = (await pool.query(sql, params)).rows;
+  const data = rows.slice(0, pageSize);
+  const last = data[data.length - 1];
+  return {
+    data,
+    next_cursor: rows.length > pageSize ? encodeCursor(spec.keys.map((k) => last[k.column])) : null
+  };
+};
+
+const waitForDrain = (res) => new Promise((resolve) => {
+  const done = () => {
+    res.off('drain', done);
+    res.off('close', done);
+    resolve();
+  };
+  res.once('drain', done);
+  res.once('close', done);
 });
 
-// Get fund breakdown
-app.get('/api/portfolio/fund-breakdown', async (req, res) => {
+// Stream rows as NDJSON from a server-side cursor, honouring socket backpressure
+const streamList = async (spec, req, res) => {
+  let query;
   try {
-    const result = await pool.query(`
-      SELECT 
-        fund_ticker,
-        fund_name,
-        underlying_ticker,
-        underlying_name,
-        underlying_type,
-        weight_in_fund,
-        market_value,
-        date
-      FROM v_fund_breakdown
-      ORDER BY fund_ticker, weight_in_fund DESC
-    `);
-    res.json(result.rows);
+    query = buildListQuery(spec, listFilters(req));
   } catch (err) {
-    console.error('Error fetching fund breakdown:', err);
-    res.status(500).json({ error: 'Internal server error' });
+    return res.status(err.status || 500).json({ error: err.message });
   }
-});
 
-// Get securities with identifiers
-app.get('/api/securities', async (req, res) => {
+  let client;
+  let closed = false;
+  res.on('close', () => { closed = true; });
+
   try {
-    const result = await pool.query(`
-      SELECT 
-        security_id,
-        ticker,
-        name,
-        security_type,
-        exchange,
-        isin,
-        sedol,
-        cusip,
-        country_of_domicile,
-        expense_ratio,
-        is_fund
-      FROM securities
-      WHERE is_active = true
-      ORDER BY ticker
-    `);
-    res.json(result.rows);
+    client = await pool.connect();
+    await client.query('BEGIN');
+    await client.query(`DECLARE api_stream NO SCROLL CURSOR FOR ${query.sql}`, query.params);
+
+    res.status(200).set('Content-Type', 'application/x-ndjson');
+    while (!closed) {
+      const batch = await client.query(`FETCH ${STREAM_BATCH_SIZE} FROM api_stream`);
+      if (batch.rows.length === 0) break;
+      const chunk = batch.rows.map((row) => JSON.stringify(row)).join('\n') + '\n';
+      if (!res.write(chunk)) {
+        await waitForDrain(res);
+      }
+    }
+    await client.query('COMMIT');
+    res.end();
   } catch (err) {
-    console.error('Error fetching securities:', err);
-    res.status(500).json({ error: 'Internal server error' });
+    console.error(`Error streaming ${spec.label}:`, err);
+    if (client) {
+      await client.query('ROLLBACK').catch(() => {});
+    }
+    if (res.headersSent) {
+      res.destroy(err);
+    } else {
+      res.status(500).json({ error: 'Internal server error' });
+    }
+  } finally {
+    if (client) {
+      client.release();
+    }
   }
-});
+};
+
+const wantsNdjson = (req) =>
+  req.query.format === 'ndjson' || (req.headers.accept || '').includes('application/x-ndjson');
+
+const listEndpoint = (spec) => {
+  const cached = cachedJson(spec.label, (req) => loadList(spec, req));
+  return (req, res) => (wantsNdjson(req) ? streamList(spec, req, res) : cached(req, res));
+};
+
+// API Routes
+
+// Get portfolio summary
+app.get('/api/portfolio/summary', cachedJson('portfolio summary', async () => {
+  const result = await pool.query('SELECT * FROM v_portfolio_summary');
+  return result.rows[0] || null;
+}, { notFound: 'Portfolio not found' }));
+
+// Get current holdings (direct holdings)
+app.get('/api/portfolio/holdings', cachedJson('holdings', async () => {
+  const result = await pool.query(`
+    SELECT 
+      ticker,
+      security_name,
+      security_type,
+      asset_class,
+      quantity,
+      market_value,
+      weight,
+      date
+    FROM v_current_holdings
+    ORDER BY weight DESC
+  `);
+  return result.rows;
+}));
+
+// Get complete portfolio lookthrough
+// Filters: ?portfolio=<id>&level=<n>&min_weight=<w>
+app.get('/api/portfolio/lookthrough', listEndpoint({
+  label: 'lookthrough data',
+  columns: `
+    portfolio_name,
+    level,
+    holding_path,
+    ticker,
+    security_name,
+    security_type,
+    market_value,
+    portfolio_weight,
+    holding_type,
+    portfolio_id,
+    security_id`,
+  from: 'v_portfolio_lookthrough',
+  filters: [
+    { param: 'portfolio', column: 'portfolio_id', op: '=', parse: parseInteger },
+    { param: 'level', column: 'level', op: '=', parse: parseInteger },
+    { param: 'min_weight', column: 'portfolio_weight', op: '>=', parse: parseNumber }
+  ],
+  keys: [
+    { column: 'level' },
+    { column: 'portfolio_weight', desc: true },
+    { column: 'portfolio_id' },
+    { column: 'holding_path' }
+  ]
+}));
+
+// Get fund breakdown
+app.get('/api/portfolio/fund-breakdown', cachedJson('fund breakdown', async () => {
+  const result = await pool.query(`
+    SELECT 
+      fund_ticker,
+      fund_name,
+      underlying_ticker,
+      underlying_name,
+      underlying_type,
+      weight_in_fund,
+      market_value,
+      date
+    FROM v_fund_breakdown
+    ORDER BY fund_ticker, weight_in_fund DESC
+  `);
+  return result.rows;
+}));
+
+// Exposure cube slices: ?by=<comma list of dimensions> (default asset_class), ?layer=<n>, ?date=<date>
+const EXPOSURE_DIMENSIONS = ['layer', 'asset_class', 'country', 'currency', 'security_type'];
+const MAX_EXPOSURE_PORTFOLIOS = 500;
+
+const parseExposureSlice = (query) => {
+  const by = String(query.by || 'asset_class').split(',').filter((d) => d !== '');
+  if (by.length === 0 || by.some((d) => !EXPOSURE_DIMENSIONS.includes(d)) || new Set(by).size !== by.length) {
+    throw badRequest(`by must list dimensions from: ${EXPOSURE_DIMENSIONS.join(', ')}`);
+  }
+  const layer = query.layer === undefined ? null : parseInteger(query.layer);
+  if (query.layer !== undefined && layer === null) {
+    throw badRequest('Invalid layer');
+  }
+  return { by, layer, date: parseText(query.date) };
+};
+
+const exposureSlice = async (portfolioIds, { by, layer, date }) => {
+  // Dimension names come from the whitelist above, never from the request
+  const dimensions = by.join(', ');
+  const result = await pool.query(`
+    SELECT portfolio_id, date, ${dimensions},
+           SUM(weight) AS weight, SUM(market_value) AS market_value, SUM(n_securities)::int AS positions
+    FROM exposure_cube c
+    WHERE portfolio_id = ANY($1)
+      AND date = COALESCE($2::date, (SELECT MAX(date) FROM exposure_cube WHERE portfolio_id = c.portfolio_id))
+      AND ($3::int IS NULL OR layer = $3)
+    GROUP BY portfolio_id, date, ${dimensions}
+    ORDER BY portfolio_id, weight DESC
+  `, [portfolioIds, date, layer]);
+  return result.rows.length > 0 ? result.rows : null;
+};
+
+app.get('/api/portfolio/:id/exposures', cachedJson('exposures', async (req) => {
+  const id = parseInteger(req.params.id);
+  if (id === null) {
+    throw badRequest('Invalid portfolio id');
+  }
+  return exposureSlice([id], parseExposureSlice(req.query));
+}, { notFound: 'No exposures found' }));
+
+// Same slice across portfolios for pivots: ?portfolios=1,2,3 (up to MAX_EXPOSURE_PORTFOLIOS)
+app.get('/api/exposures', cachedJson('exposures', async (req) => {
+  const ids = String(req.query.portfolios || '').split(',').filter((v) => v !== '').map(parseInteger);
+  if (ids.length === 0 || ids.length > MAX_EXPOSURE_PORTFOLIOS || ids.some((id) => id === null)) {
+    throw badRequest(`portfolios must list 1-${MAX_EXPOSURE_PORTFOLIOS} portfolio ids`);
+  }
+  return exposureSlice(ids, parseExposureSlice(req.query));
+}, { notFound: 'No exposures found' }));
+
+// Get securities with identifiers
+// Filters: ?security_type=<type>
+app.get('/api/securities', listEndpoint({
+  label: 'securities',
+  columns: `
+    security_id,
+    ticker,
+    name,
+    security_type,
+    exchange,
+    isin,
+    sedol,
+    cusip,
+    country_of_domicile,
+    expense_ratio,
+    is_fund`,
+  from: 'securities',
+  where: ['is_active = true'],
+  filters: [
+    { param: 'security_type', column: 'security_type', op: '=', parse: parseText }
+  ],
+  keys: [{ column: 'ticker' }, { column: 'security_id' }]
+}));
 
 // Get portfolio performance
 app.get('/api/portfolio/performance', async (req, res) => {
@@ -163,6 +488,64 @@ app.get('/api/portfolio/performance', async (req, res) => {
   }
 });
 
+// Long-history performance for charts: ?start=<date>, ?end=<date>, ?points=<budget, default 500>,
+// ?resolution=D|W|M to force one. Reads the finest precomputed resolution within
+// SERIES_OVERSAMPLE x the budget, then LTTB-downsamples the growth index to the budget.
+const SERIES_RESOLUTIONS = ['D', 'W', 'M'];
+const DEFAULT_SERIES_POINTS = 500;
+const MAX_SERIES_POINTS = 5000;
+const SERIES_OVERSAMPLE = 4;
+
+app.get('/api/portfolio/:id/performance-series', cachedJson('performance series', async (req) => {
+  const id = parseInteger(req.params.id);
+  if (id === null) {
+    throw badRequest('Invalid portfolio id');
+  }
+  const points = req.query.points === undefined ? DEFAULT_SERIES_POINTS : parseInteger(req.query.points);
+  if (points === null || points < 3 || points > MAX_SERIES_POINTS) {
+    throw badRequest(`points must be an integer between 3 and ${MAX_SERIES_POINTS}`);
+  }
+  let resolution = parseText(req.query.resolution);
+  if (resolution !== null && !SERIES_RESOLUTIONS.includes(resolution)) {
+    throw badRequest(`resolution must be one of: ${SERIES_RESOLUTIONS.join(', ')}`);
+  }
+  const range = [id, parseText(req.query.start), parseText(req.query.end)];
+
+  if (resolution === null) {
+    const counts = await pool.query(`
+      SELECT resolution, COUNT(*)::int AS n
+      FROM performance_aggregates
+      WHERE portfolio_id = $1
+        AND ($2::date IS NULL OR period_end >= $2)
+        AND ($3::date IS NULL OR period_end <= $3)
+      GROUP BY resolution
+    `, range);
+    const available = Object.fromEntries(counts.rows.map((row) => [row.resolution, row.n]));
+    resolution = SERIES_RESOLUTIONS.find((r) => (available[r] || 0) <= points * SERIES_OVERSAMPLE) || 'M';
+  }
+
+  const result = await pool.query(`
+    SELECT period_end AS date, period_start, open_value, high_value, low_value, close_value,
+           period_return, growth_index, n_days
+    FROM performance_aggregates
+    WHERE portfolio_id = $1 AND resolution = $4
+      AND ($2::date IS NULL OR period_end >= $2)
+      AND ($3::date IS NULL OR period_end <= $3)
+    ORDER BY period_end
+  `, [...range, resolution]);
+  if (result.rows.length === 0) {
+    return null;
+  }
+  const series = lttb(result.rows, points, (row) => new Date(row.date).getTime(), (row) => row.growth_index);
+  return {
+    portfolio_id: id,
+    resolution,
+    source_points: result.rows.length,
+    points: series.length,
+    series
+  };
+}, { notFound: 'No performance series found' }));
+
 // Health check endpoint
 app.get('/api/health', (req, res) => {
   res.json({ 
@@ -202,6 +585,266 @@ app.get('/api/portfolio/:id/risk-metrics', async (req, res) => {
   }
 });
 
+// Get factor model risk for portfolio (latest model date)
+app.get('/api/portfolio/:id/factor-risk', cachedJson('factor risk', async (req) => {
+  const risk = await pool.query(`
+    SELECT model_date, total_volatility, factor_volatility, specific_volatility
+    FROM portfolio_factor_risk
+    WHERE portfolio_id = $1
+    ORDER BY model_date DESC
+    LIMIT 1
+  `, [req.params.id]);
+  if (risk.rows.length === 0) {
+    return null;
+  }
+
+  const exposures = await pool.query(`
+    SELECT rf.code, rf.name, rf.factor_type, pfe.exposure, pfe.variance_contribution
+    FROM portfolio_factor_exposures pfe
+    JOIN risk_factors rf ON pfe.factor_id = rf.factor_id
+    WHERE pfe.portfolio_id = $1 AND pfe.model_date = $2
+    ORDER BY ABS(pfe.variance_contribution) DESC
+  `, [req.params.id, risk.rows[0].model_date]);
+
+  return { ...risk.rows[0], factors: exposures.rows };
+}, { notFound: 'No factor risk found' }));
+
+// Get VaR decomposition by holding and lookthrough node (latest calculation)
+// Filters: ?method=parametric|factor|historical&level=<n>
+app.get('/api/portfolio/:id/risk-decomposition', cachedJson('risk decomposition', async (req) => {
+  const method = req.query.method || 'parametric';
+  const level = req.query.level === undefined ? null : parseInteger(req.query.level);
+  if (req.query.level !== undefined && level === null) {
+    throw badRequest('Invalid level');
+  }
+
+  const result = await pool.query(`
+    SELECT rd.calculation_date, rd.confidence, rd.holding_path, rd.level, s.ticker,
+           rd.portfolio_weight, rd.portfolio_var, rd.marginal_var, rd.component_var,
+           rd.incremental_var, rd.pct_of_var
+    FROM risk_decomposition rd
+    JOIN securities s ON rd.security_id = s.security_id
+    WHERE rd.portfolio_id = $1 AND rd.method = $2
+      AND rd.calculation_date = (
+        SELECT MAX(calculation_date) FROM risk_decomposition
+        WHERE portfolio_id = $1 AND method = $2
+      )
+      AND ($3::int IS NULL OR rd.level = $3)
+    ORDER BY rd.level, rd.component_var DESC
+  `, [req.params.id, method, level]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No risk decomposition found' }));
+
+// Get Brinson attribution for portfolio (latest period computed for the scheme)
+// Filters: ?scheme=asset_class|level
+app.get('/api/portfolio/:id/attribution', cachedJson('attribution', async (req) => {
+  const scheme = req.query.scheme || 'asset_class';
+  const result = await pool.query(`
+    SELECT ar.start_date, ar.end_date, am.code AS method, ar.segment,
+           ar.portfolio_weight, ar.benchmark_weight, ar.portfolio_return, ar.benchmark_return,
+           ar.allocation_effect, ar.selection_effect, ar.interaction_effect, ar.total_effect
+    FROM attribution_results ar
+    JOIN attribution_methods am ON ar.method_id = am.method_id
+    WHERE ar.portfolio_id = $1 AND ar.scheme = $2
+      AND (ar.start_date, ar.end_date) = (
+        SELECT start_date, end_date FROM attribution_results
+        WHERE portfolio_id = $1 AND scheme = $2
+        ORDER BY end_date DESC, created_at DESC
+        LIMIT 1
+      )
+    ORDER BY ar.segment
+  `, [req.params.id, scheme]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No attribution found' }));
+
+// Get lookthrough active weights vs benchmark (latest date)
+// Filters: ?limit=<n> largest absolute active weights
+app.get('/api/portfolio/:id/active-weights', cachedJson('active weights', async (req) => {
+  const limit = req.query.limit === undefined ? null : parseInteger(req.query.limit);
+  if (req.query.limit !== undefined && (limit === null || limit < 1)) {
+    throw badRequest('Invalid limit');
+  }
+
+  const result = await pool.query(`
+    SELECT paw.date, b.code AS benchmark_code, s.ticker, s.name,
+           paw.portfolio_weight, paw.benchmark_weight, paw.active_weight
+    FROM portfolio_active_weights paw
+    JOIN benchmarks b ON paw.benchmark_id = b.benchmark_id
+    JOIN securities s ON paw.security_id = s.security_id
+    WHERE paw.portfolio_id = $1
+      AND paw.date = (SELECT MAX(date) FROM portfolio_active_weights WHERE portfolio_id = $1)
+    ORDER BY ABS(paw.active_weight) DESC
+    LIMIT $2
+  `, [req.params.id, limit]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No active weights found' }));
+
+// Get peer rankings for portfolio (latest as-of date, every universe it belongs to)
+// Filters: ?window=3M|6M|1Y|3Y|5Y
+app.get('/api/portfolio/:id/peers', cachedJson('peer analytics', async (req) => {
+  const result = await pool.query(`
+    SELECT pa.as_of_date, pu.code AS universe, pa.window_code, pa.metric, pa.value,
+           pa.peer_rank, pa.peer_count, pa.percentile, pa.quartile
+    FROM peer_analytics pa
+    JOIN peer_universes pu ON pa.universe_id = pu.universe_id
+    WHERE pa.portfolio_id = $1
+      AND pa.as_of_date = (SELECT MAX(as_of_date) FROM peer_analytics WHERE portfolio_id = $1)
+      AND ($2::text IS NULL OR pa.window_code = $2)
+    ORDER BY pu.code, pa.window_code, pa.metric
+  `, [req.params.id, parseText(req.query.window)]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No peer analytics found' }));
+
+// Get a peer universe's latest ranking table (large universes page or stream)
+// Filters: ?window=<code>&metric=<name>
+app.get('/api/peer-universes/:id/rankings', listEndpoint({
+  label: 'peer rankings',
+  columns: `
+    as_of_date,
+    portfolio_id,
+    window_code,
+    metric,
+    value,
+    peer_rank,
+    peer_count,
+    percentile,
+    quartile`,
+  from: 'peer_analytics pa',
+  where: ['as_of_date = (SELECT MAX(as_of_date) FROM peer_analytics WHERE universe_id = pa.universe_id)'],
+  filters: [
+    { param: 'id', column: 'universe_id', op: '=', parse: parseInteger },
+    { param: 'window', column: 'window_code', op: '=', parse: parseText },
+    { param: 'metric', column: 'metric', op: '=', parse: parseText }
+  ],
+  keys: [{ column: 'window_code' }, { column: 'metric' }, { column: 'peer_rank' }, { column: 'portfolio_id' }]
+}));
+
+// Get stress test results for portfolio (latest run)
+// Without ?scenario=<code> returns the portfolio total per scenario; with it, P&L by lookthrough node
+// Filters: ?level=<n> (node breakdown only)
+app.get('/api/portfolio/:id/stress', cachedJson('stress results', async (req) => {
+  const scenario = parseText(req.query.scenario);
+  const level = req.query.level === undefined ? null : parseInteger(req.query.level);
+  if (req.query.level !== undefined && level === null) {
+    throw badRequest('Invalid level');
+  }
+
+  const latest = `(SELECT MAX(run_date) FROM stress_results WHERE portfolio_id = $1)`;
+  const result = scenario === null
+    ? await pool.query(`
+      SELECT sr.run_date, ss.code, ss.name, ss.scenario_type, SUM(sr.pnl) AS portfolio_return
+      FROM stress_results sr
+      JOIN stress_scenarios ss ON sr.scenario_id = ss.scenario_id
+      WHERE sr.portfolio_id = $1 AND sr.level = 1 AND sr.run_date = ${latest}
+      GROUP BY sr.run_date, ss.code, ss.name, ss.scenario_type
+      ORDER BY portfolio_return
+    `, [req.params.id])
+    : await pool.query(`
+      SELECT sr.run_date, ss.code, sr.holding_path, sr.level, s.ticker,
+             sr.portfolio_weight, sr.security_return, sr.pnl
+      FROM stress_results sr
+      JOIN stress_scenarios ss ON sr.scenario_id = ss.scenario_id
+      JOIN securities s ON sr.security_id = s.security_id
+      WHERE sr.portfolio_id = $1 AND ss.code = $2 AND sr.run_date = ${latest}
+        AND ($3::int IS NULL OR sr.level = $3)
+      ORDER BY sr.level, sr.pnl
+    `, [req.params.id, scenario, level]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No stress results found' }));
+
+// Get a security's beta on every benchmark (latest run); filter: ?window=<code>
+app.get('/api/securities/:id/betas', cachedJson('security betas', async (req) => {
+  const result = await pool.query(`
+    SELECT sb.as_of_date, sb.window_code, b.code AS benchmark_code, sb.beta, sb.correlation, sb.n_obs
+    FROM security_betas sb
+    JOIN benchmarks b ON sb.benchmark_id = b.benchmark_id
+    WHERE sb.security_id = $1
+    AND sb.as_of_date = (SELECT MAX(as_of_date) FROM security_betas)
+    AND ($2::text IS NULL OR sb.window_code = $2)
+    ORDER BY sb.window_code, b.code
+  `, [req.params.id, parseText(req.query.window)]);
+  return result.rows.length > 0 ? result.rows : null;
+}, { notFound: 'No betas found for security' }));
+
+// Get a security's correlations with every other security (latest run), strongest first
+app.get('/api/securities/:id/correlations', listEndpoint({
+  label: 'security correlations',
+  columns: `
+    as_of_date,
+    window_code,
+    other_security_id,
+    correlation,
+    n_obs`,
+  from: 'v_security_correlations',
+  where: ['as_of_date = (SELECT MAX(as_of_date) FROM security_correlations)'],
+  filters: [
+    { param: 'id', column: 'security_id', op: '=', parse: parseInteger },
+    { param: 'window', column: 'window_code', op: '=', parse: parseText }
+  ],
+  keys: [{ column: 'window_code' }, { column: 'correlation', desc: true }, { column: 'other_security_id' }]
+}));
+
+// Get a correlation matrix slice: ?ids=1,2,3 (up to MAX_MATRIX_SECURITIES), ?window=<code> (default 1Y)
+const MAX_MATRIX_SECURITIES = 200;
+app.get('/api/correlations', cachedJson('correlation matrix', async (req) => {
+  const ids = String(req.query.ids || '').split(',').filter((v) => v !== '').map(parseInteger);
+  if (ids.length === 0 || ids.length > MAX_MATRIX_SECURITIES || ids.some((id) => id === null)) {
+    throw badRequest(`ids must list 1-${MAX_MATRIX_SECURITIES} security ids`);
+  }
+  const window = parseText(req.query.window) || '1Y';
+
+  const result = await pool.query(`
+    SELECT as_of_date, security_id_a, security_id_b, correlation
+    FROM security_correlations
+    WHERE window_code = $1
+    AND as_of_date = (SELECT MAX(as_of_date) FROM security_correlations WHERE window_code = $1)
+    AND security_id_a = ANY($2) AND security_id_b = ANY($2)
+  `, [window, ids]);
+  if (result.rows.length === 0) {
+    return null;
+  }
+
+  const position = new Map(ids.map((id, i) => [id, i]));
+  const matrix = ids.map((_, i) => ids.map((__, j) => (i === j ? 1 : null)));
+  for (const row of result.rows) {
+    const a = position.get(row.security_id_a);
+    const b = position.get(row.security_id_b);
+    matrix[a][b] = row.correlation;
+    matrix[b][a] = row.correlation;
+  }
+  return { as_of_date: result.rows[0].as_of_date, window_code: window, security_ids: ids, matrix };
+}, { notFound: 'No correlations found' }));
+
+// Get drawdown episodes (deepest first) and the underwater curve of a portfolio or benchmark;
+// filters: ?min_depth=<fraction, e.g. 0.05>, ?start_date=<date> for the curve
+const drawdowns = (seriesType) => cachedJson(`${seriesType} drawdowns`, async (req) => {
+  const minDepth = parseNumber(req.query.min_depth);
+  const [episodes, curve] = await Promise.all([
+    pool.query(`
+      SELECT peak_date, trough_date, recovery_date, depth,
+             decline_days, recovery_days, duration_days
+      FROM drawdown_episodes
+      WHERE series_type = $1 AND series_id = $2
+        AND ($3::float8 IS NULL OR depth <= -$3)
+      ORDER BY depth
+    `, [seriesType, req.params.id, minDepth]),
+    pool.query(`
+      SELECT date, drawdown
+      FROM drawdown_underwater
+      WHERE series_type = $1 AND series_id = $2
+        AND ($3::date IS NULL OR date >= $3)
+      ORDER BY date
+    `, [seriesType, req.params.id, parseText(req.query.start_date)])
+  ]);
+  if (curve.rows.length === 0) {
+    return null;
+  }
+  return { episodes: episodes.rows, underwater: curve.rows };
+}, { notFound: 'No drawdowns found' });
+
+app.get('/api/portfolio/:id/drawdowns', drawdowns('portfolio'));
+app.get('/api/benchmarks/:id/drawdowns', drawdowns('benchmark'));
+
 // Get available benchmarks
 app.get('/api/benchmarks', async (req, res) => {
   try {
@@ -231,6 +874,7 @@ app.get('/api/portfolio/:id/benchmark', async (req, res) => {
         b.description,
         pb.is_primary,
         pb.weight,
+        pb.rebalance_frequency,
         pb.effective_date
       FROM portfolio_benchmarks pb
       JOIN benchmarks b ON pb.benchmark_id = b.benchmark_id
@@ -250,56 +894,116 @@ app.get('/api/portfolio/:id/benchmark', async (req, res) => {
   }
 });
 
-// Update portfolio benchmark
+const REBALANCE_FREQUENCIES = ['daily', 'monthly', 'quarterly', 'annual'];
+
+// Normalise a benchmark update into weighted components: either a single
+// { benchmark_id } or a blend { components: [{ benchmark_id, weight }], rebalance_frequency }
+const parseBenchmarkComponents = (body) => {
+  const components = Array.isArray(body.components)
+    ? body.components.map((c) => ({ benchmark_id: parseInteger(c.benchmark_id), weight: parseNumber(c.weight) }))
+    : [{ benchmark_id: parseInteger(body.benchmark_id), weight: 1.0 }];
+
+  if (components.length === 0 || components.some((c) => c.benchmark_id === null || !(c.weight > 0))) {
+    throw badRequest('Each component needs a benchmark_id and a positive weight');
+  }
+  if (new Set(components.map((c) => c.benchmark_id)).size !== components.length) {
+    throw badRequest('Duplicate benchmark in blend');
+  }
+  const total = components.reduce((sum, c) => sum + c.weight, 0);
+  if (Math.abs(total - 1) > 1e-6) {
+    throw badRequest('Blend weights must sum to 1');
+  }
+
+  const rebalance = body.rebalance_frequency || 'monthly';
+  if (!REBALANCE_FREQUENCIES.includes(rebalance)) {
+    throw badRequest('Invalid rebalance_frequency');
+  }
+  return { components, rebalance };
+};
+
+// Update portfolio benchmark (single index or weighted blend)
 app.put('/api/portfolio/:id/benchmark', async (req, res) => {
+  const portfolioId = req.params.id;
+  const { effective_date = new Date().toISOString().split('T')[0] } = req.body;
+
+  let blend;
   try {
-    const portfolioId = req.params.id;
-    const { benchmark_id, effective_date = new Date().toISOString().split('T')[0] } = req.body;
-
-    // Insert new benchmark mapping
-    await pool.query(`
-      INSERT INTO portfolio_benchmarks (portfolio_id, benchmark_id, is_primary, effective_date)
-      VALUES ($1, $2, TRUE, $3)
-      ON CONFLICT (portfolio_id, benchmark_id, effective_date) 
-      DO UPDATE SET is_primary = TRUE, weight = 1.0
-    `, [portfolioId, benchmark_id, effective_date]);
-
-    // Set other benchmarks as non-primary for this portfolio
-    await pool.query(`
-      UPDATE portfolio_benchmarks 
-      SET is_primary = FALSE 
-      WHERE portfolio_id = $1 AND benchmark_id != $2 AND effective_date = $3
-    `, [portfolioId, benchmark_id, effective_date]);
-
-    res.json({ 
-      success: true, 
+    blend = parseBenchmarkComponents(req.body);
+  } catch (err) {
+    return res.status(err.status || 500).json({ error: err.message });
+  }
+  const { components, rebalance } = blend;
+  const primaryId = components.reduce((a, b) => (b.weight > a.weight ? b : a)).benchmark_id;
+
+  let client;
+  try {
+    client = await pool.connect();
+    await client.query('BEGIN');
+
+    // Insert or reweight each component; the largest weight is the primary benchmark
+    for (const component of components) {
+      await client.query(`
+        INSERT INTO portfolio_benchmarks
+          (portfolio_id, benchmark_id, is_primary, weight, rebalance_frequency, effective_date)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (portfolio_id, benchmark_id, effective_date)
+        DO UPDATE SET is_primary = EXCLUDED.is_primary, weight = EXCLUDED.weight,
+                      rebalance_frequency = EXCLUDED.rebalance_frequency
+      `, [portfolioId, component.benchmark_id, component.benchmark_id === primaryId,
+          component.weight, rebalance, effective_date]);
+    }
+
+    // Drop every other benchmark on this date out of the blend
+    await client.query(`
+      UPDATE portfolio_benchmarks
+      SET is_primary = FALSE, weight = 0
+      WHERE portfolio_id = $1 AND effective_date = $2 AND NOT (benchmark_id = ANY($3::int[]))
+    `, [portfolioId, effective_date, components.map((c) => c.benchmark_id)]);
+
+    await client.query(`SELECT bump_data_version('api')`);
+    await client.query('COMMIT');
+
+    res.json({
+      success: true,
       message: 'Portfolio benchmark updated successfully',
       portfolio_id: portfolioId,
-      benchmark_id: benchmark_id,
+      benchmark_id: primaryId,
+      components,
+      rebalance_frequency: rebalance,
       effective_date: effective_date
     });
   } catch (err) {
     console.error('Error updating portfolio benchmark:', err);
+    if (client) {
+      await client.query('ROLLBACK').catch(() => {});
+    }
     res.status(500).json({ error: 'Internal server error' });
+  } finally {
+    if (client) {
+      client.release();
+    }
   }
 });
 
 console.log(`   GET /api/benchmarks - Available benchmarks`);
 console.log(`   GET /api/portfolio/:id/benchmark - Portfolio's current benchmark`);
-console.log(`   PUT /api/portfolio/:id/benchmark - Update portfolio benchmark`);
+console.log(`   PUT /api/portfolio/:id/benchmark - Update portfolio benchmark or blend`);
 
 // Trigger risk calculation for portfolio
 app.post('/api/portfolio/:id/calculate-risk', async (req, res) => {
   try {
-    const portfolioId = req.params.id;
+    const portfolioId = parseInteger(req.params.id);
+    if (portfolioId === null) {
+      throw badRequest('Invalid portfolio id');
+    }
     
     console.log('Starting risk calculation for portfolio:', portfolioId);
     
     // Import and run the risk calculator
     const { spawn } = require('child_process');
     
-    // Run the Python risk calculator
-    const pythonProcess = spawn('python', ['risk_calculator.py'], {
+    // Run the risk metrics engine through the backend CLI
+    const pythonProcess = spawn('python', ['cli.py', 'risk', 'metrics', '--portfolio', String(portfolioId)], {
       cwd: __dirname,
       stdio: ['pipe', 'pipe', 'pipe']
     });
@@ -379,6 +1083,9 @@ app.post('/api/portfolio/:id/calculate-risk', async (req, res) => {
     });
 
   } catch (err) {
+    if (err.status) {
+      return res.status(err.status).json({ success: false, message: err.message, error: err.message });
+    }
     console.error('Error triggering risk calculation:', err);
     res.status(500).json({ 
       success: false,
@@ -389,32 +1096,29 @@ app.post('/api/portfolio/:id/calculate-risk', async (req, res) => {
 });
 
 // Get data quality overview
-app.get('/api/data-quality', async (req, res) => {
-  try {
-    const result = await pool.query(`
-      SELECT 
-        entity_type,
-        identifier,
-        name,
-        data_source,
-        first_real_date,
-        last_real_date,
-        total_records,
-        real_records,
-        synthetic_records,
-        data_quality_score,
-        quality_rating,
-        data_type
-      FROM v_data_quality_overview
-      ORDER BY entity_type, identifier
-    `);
-
-    res.json(result.rows);
-  } catch (err) {
-    console.error('Error fetching data quality:', err);
-    res.status(500).json({ error: 'Internal server error' });
-  }
-});
+// Filters: ?entity_type=security|benchmark
+app.get('/api/data-quality', listEndpoint({
+  label: 'data quality',
+  columns: `
+    entity_type,
+    entity_id,
+    identifier,
+    name,
+    data_source,
+    first_real_date,
+    last_real_date,
+    total_records,
+    real_records,
+    synthetic_records,
+    data_quality_score,
+    quality_rating,
+    data_type`,
+  from: 'v_data_quality_overview',
+  filters: [
+    { param: 'entity_type', column: 'entity_type', op: '=', parse: parseText }
+  ],
+  keys: [{ column: 'entity_type' }, { column: 'identifier' }, { column: 'entity_id' }]
+}));
 
 // Get portfolio data quality summary
 app.get('/api/portfolio/:id/data-quality', async (req, res) => {
@@ -458,6 +1162,7 @@ app.listen(port, () => {
   console.log(`   GET /api/portfolio/lookthrough - Complete lookthrough`);
   console.log(`   GET /api/portfolio/fund-breakdown - Fund composition`);
   console.log(`   GET /api/securities - All securities with identifiers`);
+  console.log(`       (large lists accept ?limit=&cursor= for keyset pages or ?format=ndjson to stream)`);
   console.log(`   GET /api/health - Health check`);
 });
 
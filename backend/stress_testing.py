@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+import psycopg2
+
+from config import DB_CONFIG
+from data_version import bump_data_version
+from market_data import (load_securities, load_lookthrough, node_residual_weights, load_base_currencies,
+                         copy_frame)
+from risk_decomposition import subtree_matrix
+from fx import BaseCurrencyPanels
+
+# Price shock dimensions from least to most specific; a more specific shock replaces a broader one
+PRICE_DIMENSIONS = (('asset_class', 'asset_class'), ('country', 'country'), ('security', 'ticker'))
+
+
+def hypothetical_returns(shocks, scenario_ids, securities, base):
+    """Scenarios x securities returns in base currency from shock definitions.
+
+    Price shocks are looked up per security attribute and layered by specificity;
+    currency shocks (versus USD) become the cross move of each security's currency
+    against the base and compound with the price shock.
+    """
+    S, N = len(scenario_ids), len(securities)
+    price = np.full((S, N), np.nan)
+    for dimension, attribute in PRICE_DIMENSIONS:
+        table = (shocks[shocks['dimension'] == dimension]
+                 .pivot_table(index='scenario_id', columns='target', values='shock', aggfunc='last')
+                 .reindex(index=scenario_ids))
+        specific = table.reindex(columns=securities[attribute].fillna('')).values
+        price = np.where(np.isnan(specific), price, specific)
+    price = np.nan_to_num(price)
+
+    usd_moves = (shocks[shocks['dimension'] == 'currency']
+                 .pivot_table(index='scenario_id', columns='target', values='shock', aggfunc='last')
+                 .reindex(index=scenario_ids))
+    local = usd_moves.reindex(columns=securities['currency'].fillna(base)).fillna(0.0).values
+    base_move = usd_moves.reindex(columns=[base]).fillna(0.0).values            # S x 1
+    fx = (1 + local) / (1 + base_move) - 1
+    return (1 + price) * (1 + fx) - 1
+
+
+def historical_returns(prices, start_date, end_date, securities):
+    """Cumulative base-currency return of each security over a window.
+
+    Securities without prices across the window take the average return of their
+    asset class in that window, so new listings still move. Securities whose asset
+    class has no history in the window either stay NaN: their move is unknown, not zero.
+    Also returns how many securities needed a proxy.
+    """
+    filled = prices.ffill()
+    start = filled.loc[:pd.Timestamp(start_date)]
+    end = filled.loc[:pd.Timestamp(end_date)]
+    if start.empty or end.empty:
+        cumulative = pd.Series(np.nan, index=securities.index)
+    else:
+        cumulative = (end.iloc[-1] / start.iloc[-1] - 1).reindex(securities.index)
+
+    proxy = cumulative.groupby(securities['asset_class']).transform('mean')
+    return cumulative.fillna(proxy), int(cumulative.isna().sum())
+
+
+class StressTester:
+    def __init__(self):
+        self.db_config = dict(DB_CONFIG)
+        # Historical window -> base-currency price panels, loaded once per run
+        self._panels = {}
+
+    def load_scenarios(self, cursor):
+        cursor.execute("""
+            SELECT scenario_id, code, scenario_type, start_date, end_date
+            FROM stress_scenarios
+            WHERE is_active = TRUE
+            ORDER BY scenario_id
+        """)
+        scenarios = pd.DataFrame(cursor.fetchall(), columns=[
+            'scenario_id', 'code', 'scenario_type', 'start_date', 'end_date'
+        ])
+        cursor.execute("SELECT scenario_id, dimension, target, shock::float8 FROM scenario_shocks")
+        shocks = pd.DataFrame(cursor.fetchall(), columns=['scenario_id', 'dimension', 'target', 'shock'])
+        return scenarios, shocks
+
+    def scenario_returns(self, cursor, scenarios, shocks, securities, base):
+        """Scenarios x securities return matrix in one base currency (NaN where unknown)"""
+        R = np.zeros((len(scenarios), len(securities)))
+        hypothetical = (scenarios['scenario_type'] == 'hypothetical').values
+        if hypothetical.any():
+            R[hypothetical] = hypothetical_returns(shocks, list(scenarios['scenario_id'][hypothetical]),
+                                                   securities, base)
+
+        for i in np.flatnonzero(~hypothetical):
+            scenario = scenarios.iloc[i]
+            panels = self.historical_panels(cursor, scenario['start_date'], scenario['end_date'])
+            R[i], missing = historical_returns(panels.prices(base), scenario['start_date'],
+                                               scenario['end_date'], securities)
+            uncovered = int(np.isnan(R[i]).sum())
+            if missing - uncovered:
+                print(f"   {scenario['code']}: {missing - uncovered} securities without history use asset-class proxies")
+            if uncovered:
+                print(f"   {scenario['code']}: {uncovered} securities have no history or asset-class proxy")
+        return R
+
+    def historical_panels(self, cursor, start_date, end_date):
+        """Base-currency price panels per historical window, shared across base currencies"""
+        key = (start_date, end_date)
+        if key not in self._panels:
+            self._panels[key] = BaseCurrencyPanels(cursor, start_date - timedelta(days=10), end_date,
+                                                     use_store=True)
+        return self._panels[key]
+
+    def run(self, run_date=None):
+        """Apply every active scenario to every portfolio's lookthrough and persist node P&L"""
+        run_date = run_date or datetime.now().date()
+        conn = psycopg2.connect(**self.db_config)
+        cursor = conn.cursor()
+        self._panels.clear()
+
+        nodes = node_residual_weights(load_lookthrough(cursor))
+        scenarios, shocks = self.load_scenarios(cursor)
+        if nodes.empty or scenarios.empty:
+            print(" No lookthrough holdings or active scenarios found!")
+            conn.close()
+            return None
+        print(f" Running {len(scenarios)} scenarios across {nodes['portfolio_id'].nunique()} portfolios...")
+
+        securities = load_securities(cursor)
+        security_ids = sorted(set(nodes['security_id']))
+        securities = securities.reindex(security_ids)
+        M = subtree_matrix(nodes).reindex(columns=security_ids, fill_value=0.0).values
+        bases = nodes['portfolio_id'].map(load_base_currencies(cursor)).fillna('AUD').values
+
+        # One nodes x securities @ securities x scenarios product per base currency
+        pnl = np.zeros((len(nodes), len(scenarios)))
+        own_return = np.zeros((len(nodes), len(scenarios)))
+        unknown = np.zeros((len(nodes), len(scenarios)), dtype=bool)
+        position = pd.Index(security_ids).get_indexer(nodes['security_id'])
+        for base in np.unique(bases):
+            R = self.scenario_returns(cursor, scenarios, shocks, securities, base)   # S x N
+            mine = bases == base
+            pnl[mine] = M[mine] @ np.nan_to_num(R).T
+            unknown[mine] = ((M[mine] != 0).astype(float) @ np.isnan(R).T.astype(float)) > 0
+            own_return[mine] = R[:, position[mine]].T
+
+        S = len(scenarios)
+        results = pd.DataFrame({
+            'scenario_id': np.tile(scenarios['scenario_id'].values, len(nodes)),
+            'run_date': run_date,
+            'portfolio_id': np.repeat(nodes['portfolio_id'].values, S),
+            'holding_path': np.repeat(nodes['holding_path'].values, S),
+            'level': np.repeat(nodes['level'].values, S),
+            'security_id': np.repeat(nodes['security_id'].values, S),
+            'portfolio_weight': np.repeat(nodes['portfolio_weight'].values, S),
+            'security_return': own_return.ravel(),
+            'pnl': pnl.ravel(),
+        })
+        # A portfolio holding anything with an unknown move gets no result for that
+        # scenario, rather than a partial total that reads as a 0% move
+        skipped = (pd.Series(unknown.ravel())
+                   .groupby([results['portfolio_id'], results['scenario_id']]).transform('any').values)
+        if skipped.any():
+            dropped = results[skipped].groupby('scenario_id')['portfolio_id'].nunique()
+            codes = dict(zip(scenarios['scenario_id'], scenarios['code']))
+            print("   Not stored (no price coverage): " +
+                  ", ".join(f"{codes[s]} for {n} portfolios" for s, n in dropped.items()))
+        results = results[~skipped]
+
+        cursor.execute("DELETE FROM stress_results WHERE run_date = %s", [run_date])
+        copy_frame(cursor, 'stress_results', results)
+
+        bump_data_version(cursor, 'stress_testing')
+        conn.commit()
+        conn.close()
+
+        totals = (results[results['level'] == 1]
+                  .groupby(['portfolio_id', 'scenario_id'])['pnl'].sum().unstack())
+        codes = dict(zip(scenarios['scenario_id'], scenarios['code']))
+        for portfolio_id, row in totals.iterrows():
+            print(f"   Portfolio {portfolio_id}: " +
+                  ", ".join(f"{codes[s]} {v*100:.2f}%" for s, v in row.items() if pd.notna(v)))
+        return totals
+
+
+if __name__ == "__main__":
+    StressTester().run()
@@ -0,0 +1,42 @@
+import numpy as np
+
+from attribution import brinson_effects, carino_factors, link_effects
+
+
+def segment_inputs(P, T, S, seed=0):
+    rng = np.random.default_rng(seed)
+    wp = rng.dirichlet(np.ones(S), (P, T))
+    wb = rng.dirichlet(np.ones(S), (P, T))
+    rp = rng.normal(0.0, 0.01, (P, T, S))
+    rb = rng.normal(0.0, 0.01, (P, T, S))
+    return wp, rp, wb, rb
+
+
+def test_daily_effects_sum_to_the_active_return():
+    wp, rp, wb, rb = segment_inputs(2, 5, 3)
+    total = sum(brinson_effects(wp, rp, wb, rb)).sum(axis=2)
+    np.testing.assert_allclose(total, (wp * rp).sum(axis=2) - (wb * rb).sum(axis=2))
+
+
+def test_linked_effects_sum_to_the_period_active_return():
+    wp, rp, wb, rb = segment_inputs(3, 60, 4, seed=1)
+    Rp, Rb = (wp * rp).sum(axis=2), (wb * rb).sum(axis=2)
+    linked = [link_effects(effect, Rp, Rb) for effect in brinson_effects(wp, rp, wb, rb)]
+
+    active = np.prod(1 + Rp, axis=1) - np.prod(1 + Rb, axis=1)
+    np.testing.assert_allclose(sum(linked).sum(axis=1), active)
+
+
+def test_factors_are_finite_when_portfolio_and_benchmark_returns_coincide():
+    Rp = np.array([[0.01, -0.02, 0.03]])
+    factors = carino_factors(Rp, Rp.copy())
+
+    assert np.isfinite(factors).all()
+    # Equal returns fall back to the 1 / (1 + r) limit on both levels
+    K = 1 / np.prod(1 + Rp)
+    np.testing.assert_allclose(factors, (1 / (1 + Rp)) / K)
+
+
+def test_single_day_needs_no_scaling():
+    Rp, Rb = np.array([[0.02]]), np.array([[0.005]])
+    np.testing.assert_allclose(carino_factors(Rp, Rb), [[1.0]])
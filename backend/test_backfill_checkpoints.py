@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+import backfill_checkpoints
+from backfill_checkpoints import chunk_jobs, chunk_fetch_job, plan_chunks, BENCHMARK_WARMUP_DAYS
+
+
+def job(kind='security', start='2025-01-01', end='2025-01-10'):
+    return {'kind': kind, 'key': 3, 'ticker': 'CBA.AX', 'start_date': start, 'end_date': end}
+
+
+def test_chunks_cover_the_range_with_exclusive_ends():
+    chunks = chunk_jobs([job()], chunk_days=4)
+
+    assert [(c['chunk_start'], c['chunk_end']) for c in chunks] == [
+        (date(2025, 1, 1), date(2025, 1, 5)),
+        (date(2025, 1, 5), date(2025, 1, 9)),
+        (date(2025, 1, 9), date(2025, 1, 11)),
+    ]
+
+
+def test_replanning_later_keeps_chunk_keys_and_extends_the_last_chunk():
+    today = chunk_jobs([job()], chunk_days=4)
+    tomorrow = chunk_jobs([job(end='2025-01-11')], chunk_days=4)
+
+    assert [c['chunk_start'] for c in tomorrow] == [c['chunk_start'] for c in today]
+    assert tomorrow[-1]['chunk_end'] == date(2025, 1, 12)
+
+
+def test_benchmark_chunks_fetch_a_warmup_but_write_from_the_chunk_start():
+    chunk = chunk_jobs([job(kind='benchmark')], chunk_days=30)[0]
+    fetch = chunk_fetch_job(chunk)
+
+    assert fetch['write_from'] == date(2025, 1, 1)
+    assert fetch['start_date'] == str(date(2025, 1, 1) - timedelta(days=BENCHMARK_WARMUP_DAYS))
+    assert fetch['end_date'] == '2025-01-11'
+    assert chunk_fetch_job(chunk_jobs([job()], chunk_days=30)[0])['start_date'] == '2025-01-01'
+
+
+def test_plan_only_reopens_chunks_that_now_end_later(monkeypatch):
+    calls = []
+    monkeypatch.setattr(backfill_checkpoints, 'execute_values',
+                        lambda cursor, sql, rows: calls.append((sql, rows)))
+    plan_chunks(None, chunk_jobs([job()], chunk_days=4))
+
+    sql, rows = calls[0]
+    assert rows[0] == ('security', 3, date(2025, 1, 1), date(2025, 1, 5), 'CBA.AX')
+    assert len(rows) == 3
+    assert 'ON CONFLICT (kind, key, chunk_start) DO UPDATE' in sql
+    assert 'WHERE backfill_chunks.chunk_end < EXCLUDED.chunk_end' in sql
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from benchmark_blends import blend_returns, definition_hash
+
+
+def component_returns(days, seed=0):
+    index = pd.bdate_range('2025-01-01', periods=days)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(0.0, 0.01, (days, 2)), index=index, columns=[1, 2])
+
+
+def drifting_blend(returns, weights, periods):
+    """Reference loop: hold component values, reset them to the weights at each new period"""
+    values, result, previous_period = np.asarray(weights, dtype=float), [], None
+    for period, r in zip(periods, returns.values):
+        if period != previous_period:
+            values = np.asarray(weights, dtype=float) / np.sum(weights)
+            previous_period = period
+        start = values.sum()
+        values = values * (1 + r)
+        result.append(values.sum() / start - 1)
+    return np.array(result)
+
+
+def test_daily_rebalance_is_the_weighted_average():
+    returns = component_returns(30)
+    blended = blend_returns(returns, [0.6, 0.4], 'daily')
+    np.testing.assert_allclose(blended.values, returns.values @ [0.6, 0.4])
+
+
+def test_components_drift_within_a_period():
+    returns = component_returns(90, seed=1)
+    blended = blend_returns(returns, [3, 1], 'monthly')
+
+    expected = drifting_blend(returns, [3, 1], returns.index.to_period('M'))
+    np.testing.assert_allclose(blended.values, expected)
+    assert blended.index.equals(returns.index)
+
+
+def test_missing_component_returns_count_as_flat():
+    returns = component_returns(10, seed=2)
+    returns.iloc[3, 0] = np.nan
+    blended = blend_returns(returns, [0.5, 0.5], 'daily')
+    np.testing.assert_allclose(blended.iloc[3], 0.5 * returns.iloc[3, 1])
+
+
+def test_definition_hash_ignores_component_order():
+    assert (definition_hash([(2, 0.4), (1, 0.6)], 'monthly')
+            == definition_hash([(1, 0.6), (2, 0.4)], 'monthly'))
+    assert definition_hash([(1, 0.6), (2, 0.4)], 'monthly') != definition_hash([(1, 0.6), (2, 0.4)], 'daily')
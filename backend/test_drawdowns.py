@@ -0,0 +1,51 @@
+import numpy as np
+
+from drawdowns import underwater_curves, drawdown_episodes
+
+
+def episodes(*columns):
+    underwater, _, last = underwater_curves(np.column_stack(columns))
+    return drawdown_episodes(underwater, last)
+
+
+def test_recovered_episode_has_peak_trough_and_recovery_rows():
+    found = episodes([0.1, -0.1, -0.1, 0.3, 0.0])
+
+    assert list(found['series']) == [0]
+    assert list(found['peak']) == [0]
+    assert list(found['trough']) == [2]
+    assert list(found['recovery']) == [3]
+    np.testing.assert_allclose(found['depth'], [1.1 * 0.9 * 0.9 / 1.1 - 1])
+
+
+def test_open_episode_from_a_first_day_loss_has_no_recovery():
+    found = episodes([-0.05, 0.02, 0.0, 0.0])
+
+    assert list(found['peak']) == [0]
+    assert list(found['trough']) == [0]
+    assert list(found['recovery']) == [-1]
+    np.testing.assert_allclose(found['depth'], [-0.05])
+
+
+def test_episodes_are_split_per_series_and_per_run():
+    found = episodes([0.0, -0.1, 0.2, -0.05, 0.1, 0.0],
+                     [0.0, 0.0, 0.0, 0.0, -0.2, 0.0])
+
+    assert list(found['series']) == [0, 0, 1]
+    assert list(found['peak']) == [0, 2, 3]
+    assert list(found['trough']) == [1, 3, 4]
+    assert list(found['recovery']) == [2, 4, -1]
+    np.testing.assert_allclose(found['depth'], [-0.1, -0.05, -0.2])
+
+
+def test_missing_returns_leave_wealth_flat_and_outside_range_is_nan():
+    underwater, first, last = underwater_curves(np.array([[np.nan], [-0.1], [np.nan], [0.05], [np.nan]]))
+
+    assert (first, last) == (1, 3)
+    assert np.isnan(underwater[[0, 4], 0]).all()
+    np.testing.assert_allclose(underwater[1:4, 0], [-0.1, -0.1, 0.9 * 1.05 - 1])
+
+
+def test_no_losses_means_no_episodes():
+    found = episodes([0.01, 0.0, 0.02])
+    assert all(len(values) == 0 for values in found.values())
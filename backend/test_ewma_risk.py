@@ -0,0 +1,55 @@
+import numpy as np
+
+from ewma_risk import ewma_variance_update, ewma_covariance_update, seed_covariance
+
+
+def test_variance_follows_the_recursion():
+    returns = np.array([[0.01, 0.02], [-0.02, 0.0], [0.03, -0.01]])
+    path = ewma_variance_update([1e-4, 4e-4], returns, decay=0.9)
+
+    expected = np.array([1e-4, 4e-4])
+    for t, r in enumerate(returns):
+        expected = 0.9 * expected + 0.1 * r ** 2
+        np.testing.assert_allclose(path[t], expected)
+
+
+def test_missing_returns_keep_variance_and_new_series_seed_from_first_square():
+    returns = np.array([[np.nan, 0.02], [0.01, np.nan]])
+    path = ewma_variance_update([2e-4, np.nan], returns, decay=0.9)
+
+    np.testing.assert_allclose(path[0], [2e-4, 4e-4])
+    np.testing.assert_allclose(path[1], [0.9 * 2e-4 + 0.1 * 1e-4, 4e-4])
+
+
+def test_updating_in_two_batches_matches_one_batch():
+    returns = np.random.default_rng(0).normal(0.0, 0.01, (50, 3))
+    once = ewma_variance_update(np.full(3, np.nan), returns)[-1]
+    first = ewma_variance_update(np.full(3, np.nan), returns[:20])[-1]
+    np.testing.assert_allclose(ewma_variance_update(first, returns[20:])[-1], once)
+
+    seed = seed_covariance(returns[:10])
+    np.testing.assert_allclose(
+        ewma_covariance_update(ewma_covariance_update(seed, returns[10:30]), returns[30:]),
+        ewma_covariance_update(seed, returns[10:]))
+
+
+def test_covariance_diagonal_matches_variance_update():
+    returns = np.random.default_rng(1).normal(0.0, 0.01, (30, 3))
+    seed = seed_covariance(returns[:10])
+    covariance = ewma_covariance_update(seed, returns[10:], decay=0.94)
+
+    np.testing.assert_allclose(np.diag(covariance),
+                               ewma_variance_update(np.diag(seed), returns[10:], decay=0.94)[-1])
+    np.testing.assert_allclose(covariance, covariance.T)
+
+
+def test_covariance_only_updates_pairs_observed_together():
+    covariance = np.array([[1e-4, np.nan], [np.nan, 4e-4]])
+    updated = ewma_covariance_update(covariance, np.array([[0.01, np.nan], [0.02, 0.01]]), decay=0.9)
+
+    first = 0.9 * 1e-4 + 0.1 * 1e-4
+    np.testing.assert_allclose(updated[0, 0], 0.9 * first + 0.1 * 4e-4)
+    np.testing.assert_allclose(updated[1, 1], 0.9 * 4e-4 + 0.1 * 1e-4)
+    # The pair had no estimate, so it starts from its first cross product
+    np.testing.assert_allclose(updated[0, 1], 0.02 * 0.01)
+    np.testing.assert_allclose(updated[1, 0], 0.02 * 0.01)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from factor_model import FactorRiskModel, cross_sectional_regression, MOMENTUM_LOOKBACK
+from market_data import simple_returns
+
+
+def test_regression_matches_per_date_least_squares():
+    rng = np.random.default_rng(0)
+    T, N, K = 6, 12, 3
+    X = rng.normal(size=(T, N, K))
+    returns = rng.normal(0.0, 0.01, (T, N))
+    returns[rng.random((T, N)) < 0.2] = np.nan
+    factor_returns, residuals, _ = cross_sectional_regression(returns, X)
+
+    for t in range(T):
+        observed = ~np.isnan(returns[t])
+        expected, *_ = np.linalg.lstsq(X[t, observed], returns[t, observed], rcond=None)
+        np.testing.assert_allclose(factor_returns[t], expected, atol=1e-6)
+        assert np.isnan(residuals[t, ~observed]).all()
+
+
+def test_dates_with_too_few_names_carry_no_estimate():
+    X = np.ones((2, 3, 3))
+    returns = np.array([[0.01, np.nan, np.nan], [0.01, 0.02, 0.03]])
+    factor_returns, _, r_squared = cross_sectional_regression(returns, X)
+
+    assert np.isnan(factor_returns[0]).all() and np.isnan(r_squared[0])
+
+
+def test_exposures_only_cover_the_estimation_window():
+    index = pd.bdate_range('2024-01-01', periods=MOMENTUM_LOOKBACK + 60)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, (len(index), 3)), 0)),
+                          index=index, columns=[1, 2, 3])
+    securities = pd.DataFrame({'country': ['AU', 'US', None]}, index=[1, 2, 3])
+    returns, X, codes = FactorRiskModel().build_exposures(
+        prices, simple_returns(prices), securities, window=40)
+
+    assert returns.shape == (40, 3) and X.shape == (40, 3, len(codes))
+    assert returns.index.equals(index[-40:])
+    assert codes == ['COUNTRY_AU', 'COUNTRY_OTHER', 'COUNTRY_US', 'MOMENTUM', 'VOLATILITY']
+    # Momentum looks back over the full history, so the window's first date is already exposed
+    assert (X[0, :, codes.index('MOMENTUM')] != 0).any()
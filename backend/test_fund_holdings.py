@@ -0,0 +1,43 @@
+import pandas as pd
+
+from fund_holdings import diff_snapshots, WEIGHT_TOLERANCE
+
+
+def snapshot(rows):
+    return pd.DataFrame(rows, columns=['fund_security_id', 'underlying_security_id',
+                                       'shares', 'market_value', 'weight'])
+
+
+def changes(delta):
+    return dict(zip(delta['underlying_security_id'], delta['change_type']))
+
+
+def test_rows_are_classified_added_removed_and_changed():
+    previous = snapshot([(1, 10, 100, 1000.0, 0.5), (1, 11, 50, 500.0, 0.3), (1, 12, 20, 200.0, 0.2)])
+    current = snapshot([(1, 10, 100, 1000.0, 0.5), (1, 11, 60, 600.0, 0.35), (1, 13, 10, 100.0, 0.15)])
+    delta = diff_snapshots(current, previous)
+
+    assert changes(delta) == {11: 'changed', 12: 'removed', 13: 'added'}
+    changed = delta.set_index('underlying_security_id').loc[11]
+    assert changed['weight'] == 0.35 and changed['previous_weight'] == 0.3
+    assert list(delta.columns) == ['fund_security_id', 'underlying_security_id', 'change_type',
+                                   'shares', 'market_value', 'weight', 'previous_weight']
+
+
+def test_differences_below_storage_precision_are_not_changes():
+    previous = snapshot([(1, 10, 100, 1000.0, 0.5)])
+    current = snapshot([(1, 10, 100, 1000.004, 0.5 + WEIGHT_TOLERANCE / 2)])
+    assert diff_snapshots(current, previous).empty
+
+
+def test_a_value_appearing_or_disappearing_is_a_change():
+    previous = snapshot([(1, 10, None, 1000.0, 0.5), (1, 11, 30, 300.0, 0.5)])
+    current = snapshot([(1, 10, 100, 1000.0, 0.5), (1, 11, None, 300.0, 0.5)])
+    assert changes(diff_snapshots(current, previous)) == {10: 'changed', 11: 'changed'}
+
+
+def test_funds_are_compared_separately():
+    previous = snapshot([(1, 10, 100, 1000.0, 1.0)])
+    current = snapshot([(1, 10, 100, 1000.0, 1.0), (2, 10, 100, 1000.0, 1.0)])
+    delta = diff_snapshots(current, previous)
+    assert list(zip(delta['fund_security_id'], delta['change_type'])) == [(2, 'added')]
@@ -0,0 +1,45 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from ingestion_pipeline import transform, earliest_dates
+
+
+def history(closes, start='2025-03-03'):
+    return pd.DataFrame({'Close': closes}, index=pd.bdate_range(start, periods=len(closes)))
+
+
+def test_security_rows_drop_invalid_closes():
+    rows = transform({'kind': 'security', 'key': 7}, history([10.0, np.nan, -1.0, 0.0, 11.0, np.inf]))
+    assert rows == {'security_prices': [(7, date(2025, 3, 3), 10.0, 'yfinance'),
+                                        (7, date(2025, 3, 7), 11.0, 'yfinance')]}
+
+
+def test_fx_rows_go_to_fx_rates():
+    rows = transform({'kind': 'fx', 'key': 2}, history([0.65, 0.66]))
+    assert [row[2] for row in rows['fx_rates']] == [0.65, 0.66]
+
+
+def test_benchmark_returns_skip_the_first_close():
+    rows = transform({'kind': 'benchmark', 'key': 1}, history([100.0, 110.0, 99.0]))
+
+    assert [row[2] for row in rows['benchmark_prices']] == [100.0, 110.0, 99.0]
+    returns = rows['benchmark_returns']
+    assert [row[1] for row in returns] == [date(2025, 3, 4), date(2025, 3, 5)]
+    np.testing.assert_allclose([row[2] for row in returns], [0.1, -0.1])
+
+
+def test_write_from_keeps_the_warmup_return_but_not_its_rows():
+    job = {'kind': 'benchmark', 'key': 1, 'write_from': date(2025, 3, 5)}
+    rows = transform(job, history([100.0, 110.0, 99.0, 108.9]))
+
+    assert [row[1] for row in rows['benchmark_prices']] == [date(2025, 3, 5), date(2025, 3, 6)]
+    returns = rows['benchmark_returns']
+    assert [row[1] for row in returns] == [date(2025, 3, 5), date(2025, 3, 6)]
+    np.testing.assert_allclose([row[2] for row in returns], [-0.1, 0.1])
+
+
+def test_earliest_dates_per_security():
+    rows = [(1, date(2025, 3, 5), 10.0), (2, date(2025, 3, 4), 5.0), (1, date(2025, 3, 3), 9.0)]
+    assert earliest_dates(rows) == {1: date(2025, 3, 3), 2: date(2025, 3, 4)}
@@ -0,0 +1,51 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from market_data import drifted_weights, portfolio_return_panel
+
+
+def returns_panel(start, days):
+    dates = pd.bdate_range(start, periods=days)
+    return pd.DataFrame({1: np.full(days, 0.01), 2: np.full(days, -0.01)}, index=dates)
+
+
+def holdings(snapshot_date, weights):
+    return pd.DataFrame({'portfolio_id': 7, 'date': snapshot_date,
+                         'security_id': list(weights), 'weight': list(weights.values())})
+
+
+def test_today_only_snapshot_applies_over_the_whole_window():
+    returns = returns_panel('2025-01-01', 20)
+    weights = drifted_weights(holdings(date(2025, 6, 30), {1: 0.5, 2: 0.5}), returns)
+
+    assert len(weights) == len(returns)
+    assert not weights.isna().any().any()
+    np.testing.assert_allclose(weights.iloc[0].values, [0.5, 0.5])
+
+    daily = portfolio_return_panel(holdings(date(2025, 6, 30), {1: 0.5, 2: 0.5}), returns)[7]
+    assert daily.notna().all()
+    assert daily.iloc[0] == 0.0
+
+
+def test_mid_window_snapshot_leaves_earlier_dates_nan():
+    returns = returns_panel('2025-01-01', 20)
+    snapshot = returns.index[9].date()
+    daily = portfolio_return_panel(holdings(snapshot, {1: 1.0}), returns)[7]
+
+    # Takes effect on the first return date after the snapshot
+    assert daily.iloc[:10].isna().all()
+    np.testing.assert_allclose(daily.iloc[10:].values, 0.01)
+
+
+def test_holding_without_fx_conversion_has_no_return():
+    returns = returns_panel('2025-01-01', 5)
+    snapshot = holdings(date(2024, 12, 31), {1: 0.5, 2: 0.5})
+    unknown = pd.DataFrame(False, index=returns.index, columns=returns.columns)
+    unknown.iloc[3:, 1] = True
+
+    daily = portfolio_return_panel(snapshot, returns, unknown)[7]
+
+    assert daily.iloc[:3].notna().all()
+    assert daily.iloc[3:].isna().all()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from pairwise_risk import pairwise_moments, beta_correlation
+
+
+def panel_with_gaps(rows, columns, seed):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0.0, 0.01, (rows, columns))
+    values[rng.random((rows, columns)) < 0.2] = np.nan
+    return values
+
+
+def test_moments_match_pairwise_complete_estimates():
+    X, Y = panel_with_gaps(120, 4, 1), panel_with_gaps(120, 3, 2)
+    cov, var_x, var_y, n = pairwise_moments(X, Y)
+
+    for i in range(X.shape[1]):
+        for j in range(Y.shape[1]):
+            both = ~np.isnan(X[:, i]) & ~np.isnan(Y[:, j])
+            x, y = X[both, i], Y[both, j]
+            assert n[i, j] == both.sum()
+            np.testing.assert_allclose(cov[i, j], np.cov(x, y)[0, 1])
+            np.testing.assert_allclose(var_x[i, j], np.var(x, ddof=1))
+            np.testing.assert_allclose(var_y[i, j], np.var(y, ddof=1))
+
+
+def test_beta_of_a_scaled_series_is_the_scale():
+    Y = panel_with_gaps(200, 1, 3)
+    X = np.column_stack([2.0 * Y[:, 0], -0.5 * Y[:, 0]])
+    beta, correlation, n = beta_correlation(X, Y, min_observations=10)
+
+    np.testing.assert_allclose(beta[:, 0], [2.0, -0.5])
+    np.testing.assert_allclose(correlation[:, 0], [1.0, -1.0])
+    assert (n == (~np.isnan(Y)).sum()).all()
+
+
+def test_short_overlap_has_no_estimate():
+    X, Y = panel_with_gaps(60, 2, 4), panel_with_gaps(60, 2, 5)
+    X[:50, 0] = np.nan
+    beta, correlation, n = beta_correlation(X, Y, min_observations=20)
+
+    assert (n[0] < 20).all()
+    assert np.isnan(beta[0]).all() and np.isnan(correlation[0]).all()
+    assert np.isfinite(beta[1]).all()
+
+
+def test_matches_pandas_pairwise_covariance():
+    X = panel_with_gaps(80, 3, 6)
+    cov, _, _, _ = pairwise_moments(X, X)
+    np.testing.assert_allclose(cov, pd.DataFrame(X).cov().values)
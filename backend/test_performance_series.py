@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from performance_series import aggregate_performance, COLUMNS
+
+
+def daily_rows(portfolio_id, start, values):
+    values = np.asarray(values, dtype=float)
+    returns = np.r_[np.nan, values[1:] / values[:-1] - 1]
+    return pd.DataFrame({
+        'portfolio_id': portfolio_id,
+        'date': pd.bdate_range(start, periods=len(values)).date,
+        'total_value': values,
+        'daily_return': returns,
+        'growth_index': values / values[0] * 100,
+    })
+
+
+def test_weekly_periods_carry_ohlc_and_compounded_returns():
+    # Mon 2025-03-03 .. Fri 2025-03-14: two full weeks
+    daily = daily_rows(1, '2025-03-03', [100, 104, 98, 101, 103, 102, 107, 106, 108, 110])
+    weeks = aggregate_performance(daily, 'W')
+
+    assert len(weeks) == 2
+    first = weeks.iloc[0]
+    assert (first['open_value'], first['high_value'], first['low_value'], first['close_value']) == (100, 104, 98, 103)
+    assert first['n_days'] == 5
+    assert str(first['period_start']) == '2025-03-03' and str(first['period_end']) == '2025-03-07'
+    np.testing.assert_allclose(weeks['period_return'], [103 / 100 - 1, 110 / 103 - 1])
+    np.testing.assert_allclose(weeks['growth_index'], [103.0, 110.0])
+    assert set(COLUMNS) <= set(weeks.columns)
+
+
+def test_daily_resolution_keeps_one_row_per_date():
+    daily = daily_rows(1, '2025-03-03', [100, 101, 99])
+    days = aggregate_performance(daily, 'D')
+
+    assert len(days) == 3
+    assert (days['n_days'] == 1).all()
+    np.testing.assert_allclose(days['period_return'], [0.0, 0.01, 99 / 101 - 1])
+
+
+def test_portfolios_are_aggregated_separately():
+    daily = pd.concat([daily_rows(1, '2025-01-30', [100, 102, 101]),
+                       daily_rows(2, '2025-01-30', [50, 49, 51])], ignore_index=True)
+    months = aggregate_performance(daily, 'M')
+
+    assert list(zip(months['portfolio_id'], months['n_days'])) == [(1, 2), (1, 1), (2, 2), (2, 1)]
+    np.testing.assert_allclose(months['close_value'], [102, 101, 49, 51])
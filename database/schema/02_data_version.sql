@@ -0,0 +1,35 @@
+-- Multi-Asset Risk Dashboard - Data Version Counter
+-- Lets the API cache read endpoints until a loader or risk run changes the data
+
+-- =====================================================
+-- DATA VERSION
+-- =====================================================
+
+-- Single-row counter, bumped by every writer inside its own transaction
+CREATE TABLE data_version (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    version BIGINT NOT NULL DEFAULT 0,
+    last_source VARCHAR(50), -- Which writer bumped it (loader, risk_calculator, api, ...)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_version (version) VALUES (0);
+
+-- Bump the version and notify listening API processes (delivered on COMMIT)
+CREATE OR REPLACE FUNCTION bump_data_version(p_source VARCHAR)
+RETURNS BIGINT AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE data_version
+    SET version = version + 1,
+        last_source = p_source,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('data_version', new_version::text);
+    RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON TABLE data_version IS 'Monotonic data version - API response cache and ETags are keyed by it';
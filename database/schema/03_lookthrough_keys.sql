@@ -0,0 +1,72 @@
+-- Multi-Asset Risk Dashboard - Keys for paginated / streamed API reads
+-- Exposes portfolio_id and security_id on the lookthrough view so the API
+-- can filter by portfolio and page on a stable key
+
+-- =====================================================
+-- LOOKTHROUGH VIEW (new columns appended at the end)
+-- =====================================================
+
+-- Anchor columns are cast to the recursive term's types (numeric, text[]); without
+-- the casts Postgres rejects the CTE (numeric(20,2) vs numeric, varchar(50)[] path)
+DROP VIEW IF EXISTS v_portfolio_lookthrough;
+CREATE VIEW v_portfolio_lookthrough AS
+WITH RECURSIVE portfolio_tree AS (
+    -- Level 1: Direct holdings
+    SELECT
+        ph.portfolio_id,
+        ph.security_id,
+        ph.market_value::numeric as market_value,
+        ph.weight::numeric as portfolio_weight,
+        1 as level,
+        ARRAY[s.ticker::text] as path,
+        s.ticker,
+        s.name as security_name,
+        s.security_type
+    FROM portfolio_holdings ph
+    JOIN securities s ON ph.security_id = s.security_id
+    WHERE ph.date = CURRENT_DATE AND ph.holding_level = 1
+
+    UNION ALL
+
+    -- Recursive: Holdings within funds
+    SELECT
+        pt.portfolio_id,
+        fh.underlying_security_id as security_id,
+        pt.market_value * fh.weight as market_value,
+        pt.portfolio_weight * fh.weight as portfolio_weight,
+        pt.level + 1,
+        pt.path || us.ticker::text,
+        us.ticker,
+        us.name as security_name,
+        us.security_type
+    FROM portfolio_tree pt
+    JOIN fund_holdings fh ON pt.security_id = fh.fund_security_id AND fh.date = CURRENT_DATE
+    JOIN securities us ON fh.underlying_security_id = us.security_id
+    WHERE pt.level < 5 -- Prevent infinite recursion
+)
+SELECT
+    p.name as portfolio_name,
+    pt.level,
+    array_to_string(pt.path, ' -> ') as holding_path,
+    pt.ticker,
+    pt.security_name,
+    pt.security_type,
+    pt.market_value,
+    pt.portfolio_weight,
+    CASE
+        WHEN pt.level = 1 THEN 'Direct'
+        WHEN pt.level = 2 THEN 'Fund Level 1'
+        WHEN pt.level = 3 THEN 'Fund Level 2'
+        ELSE 'Deep Level'
+    END as holding_type,
+    pt.portfolio_id,
+    pt.security_id
+FROM portfolio_tree pt
+JOIN portfolios p ON pt.portfolio_id = p.portfolio_id
+ORDER BY pt.portfolio_id, pt.level, pt.portfolio_weight DESC;
+
+-- =====================================================
+-- INDEXES FOR KEYSET PAGINATION
+-- =====================================================
+
+CREATE INDEX idx_securities_active_ticker ON securities(ticker, security_id) WHERE is_active = TRUE;
@@ -0,0 +1,102 @@
+-- Multi-Asset Risk Dashboard - Factor Risk Model (Phase 1C)
+-- Cross-sectional factor model: exposures, factor returns, factor covariance
+-- and specific risk, estimated by backend/factor_model.py
+
+-- =====================================================
+-- FACTOR DEFINITIONS
+-- =====================================================
+
+CREATE TABLE risk_factors (
+    factor_id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE, -- COUNTRY_AUS, MOMENTUM, ...
+    name VARCHAR(200) NOT NULL,
+    factor_type VARCHAR(20) NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+
+    CHECK (factor_type IN ('Country', 'Industry', 'Style'))
+);
+
+INSERT INTO risk_factors (code, name, factor_type) VALUES
+('MOMENTUM', '12-1 Month Momentum', 'Style'),
+('VOLATILITY', '3 Month Realised Volatility', 'Style');
+-- Country factors are added by the engine from securities.country_of_domicile
+
+-- =====================================================
+-- MODEL OUTPUTS
+-- =====================================================
+
+-- Standardised exposures per security and factor on each model date
+CREATE TABLE factor_exposures (
+    date DATE NOT NULL,
+    factor_id INTEGER REFERENCES risk_factors(factor_id),
+    security_id INTEGER REFERENCES securities(security_id),
+    exposure DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (date, factor_id, security_id)
+);
+
+-- Daily factor returns from the cross-sectional regressions
+CREATE TABLE factor_returns (
+    factor_id INTEGER REFERENCES risk_factors(factor_id),
+    date DATE NOT NULL,
+    factor_return DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (factor_id, date)
+);
+
+-- One row per estimation run
+CREATE TABLE factor_model_runs (
+    model_date DATE PRIMARY KEY,
+    half_life_days INTEGER NOT NULL,
+    window_days INTEGER NOT NULL,
+    num_securities INTEGER NOT NULL,
+    num_factors INTEGER NOT NULL,
+    avg_r_squared DOUBLE PRECISION,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- K x K factor covariance (daily units), both triangles stored
+CREATE TABLE factor_covariance (
+    model_date DATE REFERENCES factor_model_runs(model_date) ON DELETE CASCADE,
+    factor_id_1 INTEGER REFERENCES risk_factors(factor_id),
+    factor_id_2 INTEGER REFERENCES risk_factors(factor_id),
+    covariance DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (model_date, factor_id_1, factor_id_2)
+);
+
+-- Residual (idiosyncratic) variance per security (daily units)
+CREATE TABLE specific_risk (
+    model_date DATE REFERENCES factor_model_runs(model_date) ON DELETE CASCADE,
+    security_id INTEGER REFERENCES securities(security_id),
+    specific_variance DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (model_date, security_id)
+);
+
+-- Portfolio-level factor risk (K x K), from lookthrough weights
+CREATE TABLE portfolio_factor_risk (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    model_date DATE REFERENCES factor_model_runs(model_date) ON DELETE CASCADE,
+    total_volatility DOUBLE PRECISION NOT NULL, -- Annualised
+    factor_volatility DOUBLE PRECISION NOT NULL,
+    specific_volatility DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (portfolio_id, model_date)
+);
+
+CREATE TABLE portfolio_factor_exposures (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    model_date DATE REFERENCES factor_model_runs(model_date) ON DELETE CASCADE,
+    factor_id INTEGER REFERENCES risk_factors(factor_id),
+    exposure DOUBLE PRECISION NOT NULL,
+    variance_contribution DOUBLE PRECISION NOT NULL, -- Share of total variance
+
+    PRIMARY KEY (portfolio_id, model_date, factor_id)
+);
+
+CREATE INDEX idx_factor_returns_date ON factor_returns(date);
+
+COMMENT ON TABLE factor_exposures IS 'Cross-sectionally standardised factor loadings';
+COMMENT ON TABLE factor_covariance IS 'EWMA factor covariance - portfolio risk is K x K instead of N x N';
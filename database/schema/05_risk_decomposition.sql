@@ -0,0 +1,36 @@
+-- Multi-Asset Risk Dashboard - Risk Decomposition
+-- Marginal, component and incremental VaR for every direct holding and every
+-- lookthrough node, written by backend/risk_decomposition.py
+
+-- =====================================================
+-- RISK DECOMPOSITION
+-- =====================================================
+
+CREATE TABLE risk_decomposition (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    calculation_date DATE NOT NULL,
+    method VARCHAR(20) NOT NULL, -- parametric, factor, historical
+    confidence DECIMAL(4,3) NOT NULL, -- 0.950, 0.990
+
+    -- Lookthrough node (level 1 = direct holding)
+    holding_path TEXT NOT NULL, -- Same format as v_portfolio_lookthrough (DHHF -> VGS -> AAPL)
+    level INTEGER NOT NULL,
+    security_id INTEGER REFERENCES securities(security_id),
+    portfolio_weight DOUBLE PRECISION NOT NULL,
+
+    -- Contributions (1-day, fraction of portfolio value)
+    portfolio_var DOUBLE PRECISION NOT NULL,
+    marginal_var DOUBLE PRECISION NOT NULL, -- d VaR / d weight of the node
+    component_var DOUBLE PRECISION NOT NULL, -- Euler contribution of the node's subtree
+    incremental_var DOUBLE PRECISION NOT NULL, -- VaR change if the node were removed
+    pct_of_var DOUBLE PRECISION NOT NULL,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (portfolio_id, calculation_date, method, confidence, holding_path),
+    CHECK (method IN ('parametric', 'factor', 'historical'))
+);
+
+CREATE INDEX idx_risk_decomposition_level ON risk_decomposition(portfolio_id, calculation_date DESC, level);
+
+COMMENT ON TABLE risk_decomposition IS 'Where portfolio VaR comes from - components of level 1 nodes sum to portfolio VaR';
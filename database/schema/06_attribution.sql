@@ -0,0 +1,54 @@
+-- Multi-Asset Risk Dashboard - Performance Attribution (Phase 3)
+-- Brinson allocation / selection / interaction effects, linked over any
+-- date range, written by backend/attribution.py
+
+-- =====================================================
+-- ATTRIBUTION METHODS
+-- =====================================================
+
+CREATE TABLE attribution_methods (
+    method_id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(200) NOT NULL,
+    linking VARCHAR(50) NOT NULL, -- Multi-period linking algorithm
+    description TEXT,
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+INSERT INTO attribution_methods (code, name, linking, description) VALUES
+('BRINSON_FACHLER', 'Brinson-Fachler', 'CARINO',
+ 'Allocation measured against the total benchmark return; daily effects linked with Carino log factors');
+
+-- =====================================================
+-- ATTRIBUTION RESULTS
+-- =====================================================
+
+-- One row per portfolio, segment and period (effects already linked over the period)
+CREATE TABLE attribution_results (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    benchmark_id INTEGER NOT NULL,
+    method_id INTEGER REFERENCES attribution_methods(method_id),
+    scheme VARCHAR(20) NOT NULL, -- asset_class, level
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    segment VARCHAR(100) NOT NULL,
+
+    portfolio_weight DOUBLE PRECISION, -- Average over the period
+    benchmark_weight DOUBLE PRECISION,
+    portfolio_return DOUBLE PRECISION, -- Compounded segment return
+    benchmark_return DOUBLE PRECISION,
+
+    allocation_effect DOUBLE PRECISION NOT NULL,
+    selection_effect DOUBLE PRECISION NOT NULL,
+    interaction_effect DOUBLE PRECISION NOT NULL,
+    total_effect DOUBLE PRECISION NOT NULL,
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (portfolio_id, method_id, scheme, start_date, end_date, segment),
+    CHECK (scheme IN ('asset_class', 'level'))
+);
+
+CREATE INDEX idx_attribution_results_period ON attribution_results(portfolio_id, scheme, end_date DESC);
+
+COMMENT ON TABLE attribution_results IS 'Linked Brinson effects - segments sum to the period active return';
@@ -0,0 +1,40 @@
+-- Multi-Asset Risk Dashboard - Benchmark Constituents (Phase 1D)
+-- Index weights loaded in bulk by backend/benchmark_constituents.py, and the
+-- lookthrough active weights computed from them
+
+-- =====================================================
+-- BENCHMARK CONSTITUENTS
+-- =====================================================
+
+-- One snapshot per benchmark and date (ASX 300 ~300 rows, MSCI ACWI ~3,000)
+CREATE TABLE benchmark_constituents (
+    benchmark_id INTEGER REFERENCES benchmarks(benchmark_id),
+    date DATE NOT NULL,
+    security_id INTEGER REFERENCES securities(security_id),
+    weight DOUBLE PRECISION NOT NULL, -- Index weight (0-1)
+
+    PRIMARY KEY (benchmark_id, date, security_id)
+);
+
+-- =====================================================
+-- ACTIVE WEIGHTS
+-- =====================================================
+
+-- Portfolio lookthrough weight minus benchmark weight, union of both holdings
+CREATE TABLE portfolio_active_weights (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    benchmark_id INTEGER REFERENCES benchmarks(benchmark_id),
+    date DATE NOT NULL,
+    security_id INTEGER REFERENCES securities(security_id),
+    portfolio_weight DOUBLE PRECISION NOT NULL,
+    benchmark_weight DOUBLE PRECISION NOT NULL,
+    active_weight DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (portfolio_id, benchmark_id, date, security_id)
+);
+
+CREATE INDEX idx_benchmark_constituents_security ON benchmark_constituents(security_id, date);
+CREATE INDEX idx_portfolio_active_weights_date ON portfolio_active_weights(date, benchmark_id);
+
+COMMENT ON TABLE benchmark_constituents IS 'Index weights - enables active weights and benchmark-relative attribution';
+COMMENT ON TABLE portfolio_active_weights IS 'Lookthrough active weights, recomputed in bulk per date';
@@ -0,0 +1,53 @@
+-- Multi-Asset Risk Dashboard - Blended Benchmarks (Phase 1D)
+-- A portfolio's benchmark is every weighted portfolio_benchmarks row at its latest
+-- effective date; blends of several indices get a composite return series cached
+-- once per definition by backend/benchmark_blends.py
+
+-- =====================================================
+-- PORTFOLIO BENCHMARK WEIGHTS
+-- =====================================================
+
+ALTER TABLE portfolio_benchmarks
+    ADD COLUMN IF NOT EXISTS rebalance_frequency VARCHAR(20) NOT NULL DEFAULT 'monthly'
+    CHECK (rebalance_frequency IN ('daily', 'monthly', 'quarterly', 'annual'));
+
+-- Rows demoted to non-primary were never part of the benchmark; keep them out of blends
+UPDATE portfolio_benchmarks SET weight = 0 WHERE is_primary = FALSE;
+
+-- =====================================================
+-- BLEND DEFINITIONS AND COMPOSITE CACHE
+-- =====================================================
+
+-- One row per distinct (components, weights, rebalance rule), shared across portfolios
+CREATE TABLE benchmark_blends (
+    blend_id SERIAL PRIMARY KEY,
+    definition_hash VARCHAR(40) NOT NULL UNIQUE, -- sha1 of the canonical definition
+    rebalance_frequency VARCHAR(20) NOT NULL,
+    last_refreshed TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE benchmark_blend_components (
+    blend_id INTEGER REFERENCES benchmark_blends(blend_id) ON DELETE CASCADE,
+    benchmark_id INTEGER REFERENCES benchmarks(benchmark_id),
+    weight DOUBLE PRECISION NOT NULL, -- Target weight at each rebalance (sums to 1)
+
+    PRIMARY KEY (blend_id, benchmark_id)
+);
+
+-- Composite daily returns, extended incrementally from the last rebalance period
+CREATE TABLE benchmark_blend_returns (
+    blend_id INTEGER REFERENCES benchmark_blends(blend_id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    daily_return DOUBLE PRECISION NOT NULL,
+    index_level DOUBLE PRECISION NOT NULL, -- Base 100 at the first cached date
+
+    PRIMARY KEY (blend_id, date)
+);
+
+-- Attribution against a blend records the blend alongside its largest component
+ALTER TABLE attribution_results
+    ADD COLUMN IF NOT EXISTS blend_id INTEGER REFERENCES benchmark_blends(blend_id);
+
+COMMENT ON TABLE benchmark_blends IS 'Blended benchmark definitions - keyed by hash so identical blends share one cache';
+COMMENT ON TABLE benchmark_blend_returns IS 'Cached composite returns per blend, refreshed incrementally';
@@ -0,0 +1,38 @@
+-- Multi-Asset Risk Dashboard - FX Rates (Phase 1D)
+-- Daily FX history so prices and returns can be converted to each portfolio's
+-- base currency (backend/fx.py)
+
+-- =====================================================
+-- CURRENCY REFERENCE FIXES
+-- =====================================================
+
+INSERT INTO currencies (code, name) VALUES ('AUD', 'Australian Dollar')
+ON CONFLICT (code) DO NOTHING;
+
+-- ASX listings, the cash line and the DHHF portfolio are Australian dollar
+UPDATE securities
+SET currency_id = (SELECT currency_id FROM currencies WHERE code = 'AUD')
+WHERE exchange = 'ASX' OR ticker = 'CASH';
+
+UPDATE portfolios
+SET base_currency_id = (SELECT currency_id FROM currencies WHERE code = 'AUD')
+WHERE code = 'DHHF01';
+
+-- =====================================================
+-- FX RATES
+-- =====================================================
+
+-- One rate per currency and date, quoted as US dollars per unit of the currency
+-- (USD itself is implicitly 1.0); any cross rate is a ratio of two columns
+CREATE TABLE fx_rates (
+    currency_id INTEGER REFERENCES currencies(currency_id),
+    date DATE NOT NULL,
+    usd_rate DOUBLE PRECISION NOT NULL CHECK (usd_rate > 0),
+    data_source VARCHAR(50) DEFAULT 'yfinance',
+
+    PRIMARY KEY (currency_id, date)
+);
+
+CREATE INDEX idx_fx_rates_date ON fx_rates(date);
+
+COMMENT ON TABLE fx_rates IS 'Daily USD rates per currency - loaded as a dates x currency panel for base-currency conversion';
@@ -0,0 +1,57 @@
+-- Multi-Asset Risk Dashboard - Peer Analysis (Phase 2)
+-- Peer universes of portfolios, ranked on standard-window metrics by
+-- backend/peer_analytics.py
+
+-- =====================================================
+-- PEER UNIVERSES
+-- =====================================================
+
+CREATE TABLE peer_universes (
+    universe_id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(200) NOT NULL,
+    description TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Portfolios can sit in several universes (reuses the portfolios table)
+CREATE TABLE portfolio_peer_mappings (
+    universe_id INTEGER REFERENCES peer_universes(universe_id) ON DELETE CASCADE,
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+
+    PRIMARY KEY (universe_id, portfolio_id)
+);
+
+-- =====================================================
+-- PEER RESULTS
+-- =====================================================
+
+-- One row per universe, portfolio, window and metric; percentile 1 = best in peer group
+CREATE TABLE peer_analytics (
+    universe_id INTEGER REFERENCES peer_universes(universe_id) ON DELETE CASCADE,
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    as_of_date DATE NOT NULL,
+    window_code VARCHAR(5) NOT NULL, -- 3M, 6M, 1Y, 3Y, 5Y
+    metric VARCHAR(20) NOT NULL, -- return, volatility, sharpe, max_drawdown, beta
+    value DOUBLE PRECISION NOT NULL, -- Annualised where applicable
+    peer_rank INTEGER NOT NULL,
+    peer_count INTEGER NOT NULL,
+    percentile INTEGER NOT NULL CHECK (percentile BETWEEN 1 AND 100),
+    quartile INTEGER NOT NULL CHECK (quartile BETWEEN 1 AND 4),
+
+    PRIMARY KEY (universe_id, portfolio_id, as_of_date, window_code, metric)
+);
+
+CREATE INDEX idx_peer_analytics_portfolio ON peer_analytics(portfolio_id, as_of_date DESC);
+
+-- Every existing portfolio starts in one catch-all universe
+INSERT INTO peer_universes (code, name, description) VALUES
+('ALL', 'All Portfolios', 'Every portfolio on the platform');
+
+INSERT INTO portfolio_peer_mappings (universe_id, portfolio_id)
+SELECT u.universe_id, p.portfolio_id
+FROM peer_universes u CROSS JOIN portfolios p
+WHERE u.code = 'ALL';
+
+COMMENT ON TABLE peer_analytics IS 'Peer-relative metrics and rankings, recomputed in one batch per as-of date';
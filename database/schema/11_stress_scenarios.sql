@@ -0,0 +1,76 @@
+-- Multi-Asset Risk Dashboard - Stress Testing
+-- Historical-window and hypothetical-shock scenarios, applied to the lookthrough
+-- of every portfolio by backend/stress_testing.py
+
+-- =====================================================
+-- SCENARIO DEFINITIONS
+-- =====================================================
+
+CREATE TABLE stress_scenarios (
+    scenario_id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(200) NOT NULL,
+    scenario_type VARCHAR(20) NOT NULL, -- historical, hypothetical
+    start_date DATE, -- Historical window (replayed as cumulative returns)
+    end_date DATE,
+    description TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CHECK (scenario_type IN ('historical', 'hypothetical')),
+    CHECK (scenario_type = 'hypothetical' OR (start_date IS NOT NULL AND end_date > start_date))
+);
+
+-- Hypothetical shocks. Price shocks apply by asset class, country or security ticker,
+-- the most specific match winning; currency shocks are moves versus USD and compound
+-- on top for holders whose base currency differs
+CREATE TABLE scenario_shocks (
+    scenario_id INTEGER REFERENCES stress_scenarios(scenario_id) ON DELETE CASCADE,
+    dimension VARCHAR(20) NOT NULL, -- asset_class, country, security, currency
+    target VARCHAR(100) NOT NULL, -- 'Equity', 'USA', 'CBA.AX', 'AUD'
+    shock DOUBLE PRECISION NOT NULL, -- Return, e.g. -0.20
+
+    PRIMARY KEY (scenario_id, dimension, target),
+    CHECK (dimension IN ('asset_class', 'country', 'security', 'currency'))
+);
+
+-- =====================================================
+-- SCENARIO RESULTS
+-- =====================================================
+
+-- P&L of every lookthrough node (its whole subtree) as a fraction of portfolio value;
+-- level 1 rows sum to the portfolio's scenario return
+CREATE TABLE stress_results (
+    scenario_id INTEGER REFERENCES stress_scenarios(scenario_id) ON DELETE CASCADE,
+    run_date DATE NOT NULL,
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id),
+    holding_path TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    security_id INTEGER REFERENCES securities(security_id),
+    portfolio_weight DOUBLE PRECISION NOT NULL,
+    security_return DOUBLE PRECISION NOT NULL, -- Scenario return of the node's own security
+    pnl DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (scenario_id, run_date, portfolio_id, holding_path)
+);
+
+CREATE INDEX idx_stress_results_portfolio ON stress_results(portfolio_id, run_date DESC, level);
+
+INSERT INTO stress_scenarios (code, name, scenario_type, start_date, end_date, description) VALUES
+('GFC', 'Global Financial Crisis', 'historical', '2007-10-09', '2009-03-09', 'Peak-to-trough of global equities'),
+('COVID', 'COVID-19 Crash', 'historical', '2020-02-19', '2020-03-23', 'February-March 2020 sell-off'),
+('RATES_UP_200', 'Rates +200bp', 'hypothetical', NULL, NULL, 'Parallel +200bp shift: duration hit to bonds, equity de-rating'),
+('EQUITY_DOWN_20', 'Equities -20%', 'hypothetical', NULL, NULL, 'Broad equity drawdown'),
+('AUD_DOWN_10', 'AUD -10%', 'hypothetical', NULL, NULL, 'Australian dollar falls 10% against USD');
+
+INSERT INTO scenario_shocks (scenario_id, dimension, target, shock)
+SELECT s.scenario_id, v.dimension, v.target, v.shock
+FROM stress_scenarios s
+JOIN (VALUES
+    ('RATES_UP_200', 'asset_class', 'Fixed Income', -0.10),
+    ('RATES_UP_200', 'asset_class', 'Equity', -0.08),
+    ('EQUITY_DOWN_20', 'asset_class', 'Equity', -0.20),
+    ('AUD_DOWN_10', 'currency', 'AUD', -0.10)
+) AS v(code, dimension, target, shock) ON s.code = v.code;
+
+COMMENT ON TABLE stress_results IS 'Scenario P&L by lookthrough node - all scenarios x portfolios per run';
@@ -0,0 +1,51 @@
+-- Multi-Asset Risk Dashboard - Security Series Store
+-- Compact per-security, per-year binary price and return arrays derived from
+-- security_prices by backend/series_store.py, so long histories load in one read
+
+-- =====================================================
+-- SERIES BLOCKS
+-- =====================================================
+
+-- One block per security and calendar year. Arrays are little-endian and aligned:
+-- day_offsets uint16 days since 1 January, prices float64 closes, returns float32
+-- returns since the security's previous close (crossing into the prior year)
+CREATE TABLE security_series_blocks (
+    security_id INTEGER REFERENCES securities(security_id) ON DELETE CASCADE,
+    year SMALLINT NOT NULL,
+    day_offsets BYTEA NOT NULL,
+    prices BYTEA NOT NULL,
+    returns BYTEA NOT NULL,
+    n_obs INTEGER NOT NULL,
+    -- Summary of the block's source rows
+    last_date DATE NOT NULL,
+    price_sum DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (security_id, year),
+    CHECK (octet_length(day_offsets) = 2 * n_obs),
+    CHECK (octet_length(prices) = 8 * n_obs),
+    CHECK (octet_length(returns) = 4 * n_obs)
+);
+
+-- Arrays are already compact; skip TOAST compression attempts on read and write
+ALTER TABLE security_series_blocks ALTER COLUMN day_offsets SET STORAGE EXTERNAL;
+ALTER TABLE security_series_blocks ALTER COLUMN prices SET STORAGE EXTERNAL;
+ALTER TABLE security_series_blocks ALTER COLUMN returns SET STORAGE EXTERNAL;
+
+CREATE INDEX idx_security_series_blocks_year ON security_series_blocks(year, security_id);
+
+-- =====================================================
+-- PENDING REBUILDS
+-- =====================================================
+
+-- Securities with prices written since their blocks were rebuilt, marked by every price
+-- writer (refresh_security_returns); readers take these from the source tables so a
+-- read never has to aggregate security_prices to check the blocks
+CREATE TABLE security_series_dirty (
+    security_id INTEGER PRIMARY KEY REFERENCES securities(security_id) ON DELETE CASCADE,
+    since DATE NOT NULL, -- Earliest changed date; '-infinity' rebuilds the whole history
+    marked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE security_series_blocks IS 'Binary price/return arrays per security and year - rebuilt incrementally from security_prices';
+COMMENT ON TABLE security_series_dirty IS 'Securities whose series blocks are behind security_prices - cleared by the series store refresh';
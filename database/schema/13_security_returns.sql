@@ -0,0 +1,75 @@
+-- Multi-Asset Risk Dashboard - Security Returns
+-- Daily simple and log returns per security, the counterpart of benchmark_returns,
+-- recomputed incrementally by every price writer so analytics never re-derive them
+
+-- =====================================================
+-- SECURITY RETURNS
+-- =====================================================
+
+-- Return since the security's previous stored close (gaps span, not break, the series)
+CREATE TABLE security_returns (
+    security_id INTEGER REFERENCES securities(security_id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    simple_return DOUBLE PRECISION NOT NULL,
+    log_return DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (security_id, date)
+);
+
+CREATE INDEX idx_security_returns_date ON security_returns(date);
+
+-- Recompute returns from each security's earliest changed date onward in one set-based
+-- statement; the last close before that date anchors the first return. NULL ids means
+-- every security, a NULL date its whole history. Also marks the securities' series store
+-- blocks for rebuild. Call inside the price writer's transaction
+CREATE OR REPLACE FUNCTION refresh_security_returns(p_security_ids INTEGER[], p_since DATE[])
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    IF p_security_ids IS NULL THEN
+        SELECT array_agg(security_id), array_agg(NULL::DATE)
+        INTO p_security_ids, p_since
+        FROM securities;
+    END IF;
+
+    CREATE TEMP TABLE changed_securities AS
+    SELECT c.security_id,
+           COALESCE(c.since, DATE '-infinity') AS since,
+           COALESCE((SELECT MAX(p.date) FROM security_prices p
+                     WHERE p.security_id = c.security_id AND p.date < c.since),
+                    c.since, DATE '-infinity') AS anchor
+    FROM unnest(p_security_ids, p_since) AS c(security_id, since);
+
+    DELETE FROM security_returns r
+    USING changed_securities c
+    WHERE r.security_id = c.security_id AND r.date >= c.since;
+
+    INSERT INTO security_returns (security_id, date, simple_return, log_return)
+    SELECT security_id, date, ratio - 1, LN(ratio)
+    FROM (
+        SELECT sp.security_id, sp.date, c.since,
+               (sp.close_price / NULLIF(LAG(sp.close_price) OVER w, 0))::float8 AS ratio
+        FROM security_prices sp
+        JOIN changed_securities c ON sp.security_id = c.security_id AND sp.date >= c.anchor
+        WINDOW w AS (PARTITION BY sp.security_id ORDER BY sp.date)
+    ) x
+    WHERE date >= since AND ratio > 0;
+    GET DIAGNOSTICS affected = ROW_COUNT;
+
+    -- Series store blocks from the changed date onwards are now behind
+    INSERT INTO security_series_dirty (security_id, since)
+    SELECT security_id, MIN(since) FROM changed_securities GROUP BY security_id
+    ON CONFLICT (security_id) DO UPDATE SET
+        since = LEAST(security_series_dirty.since, EXCLUDED.since),
+        marked_at = CURRENT_TIMESTAMP;
+
+    DROP TABLE changed_securities;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Returns for the prices already loaded
+SELECT refresh_security_returns(NULL, NULL);
+
+COMMENT ON TABLE security_returns IS 'Daily simple/log security returns - maintained by refresh_security_returns() on every price write';
@@ -0,0 +1,49 @@
+-- Multi-Asset Risk Dashboard - Pairwise Betas and Correlations
+-- Security x benchmark betas and security x security correlations per standard
+-- window, computed in one pass over the return panel by backend/pairwise_risk.py
+
+-- =====================================================
+-- SECURITY BETAS
+-- =====================================================
+
+CREATE TABLE security_betas (
+    as_of_date DATE NOT NULL,
+    window_code VARCHAR(5) NOT NULL, -- 6M, 1Y, 3Y
+    security_id INTEGER REFERENCES securities(security_id),
+    benchmark_id INTEGER REFERENCES benchmarks(benchmark_id),
+    beta DOUBLE PRECISION NOT NULL,
+    correlation DOUBLE PRECISION,
+    n_obs INTEGER NOT NULL, -- Dates where both returns exist
+
+    PRIMARY KEY (as_of_date, window_code, security_id, benchmark_id)
+);
+
+-- =====================================================
+-- SECURITY CORRELATIONS
+-- =====================================================
+
+-- Symmetric matrix stored once per pair (security_id_a < security_id_b);
+-- read through v_security_correlations for one row per direction
+CREATE TABLE security_correlations (
+    as_of_date DATE NOT NULL,
+    window_code VARCHAR(5) NOT NULL,
+    security_id_a INTEGER REFERENCES securities(security_id),
+    security_id_b INTEGER REFERENCES securities(security_id),
+    correlation DOUBLE PRECISION NOT NULL,
+    n_obs INTEGER NOT NULL,
+
+    PRIMARY KEY (as_of_date, window_code, security_id_a, security_id_b),
+    CHECK (security_id_a < security_id_b)
+);
+
+CREATE INDEX idx_security_correlations_b ON security_correlations(as_of_date, window_code, security_id_b);
+
+CREATE VIEW v_security_correlations AS
+SELECT as_of_date, window_code, security_id_a AS security_id, security_id_b AS other_security_id, correlation, n_obs
+FROM security_correlations
+UNION ALL
+SELECT as_of_date, window_code, security_id_b, security_id_a, correlation, n_obs
+FROM security_correlations;
+
+COMMENT ON TABLE security_betas IS 'Beta of every security on every benchmark per standard window';
+COMMENT ON TABLE security_correlations IS 'Pairwise-complete security correlations, upper triangle per window';
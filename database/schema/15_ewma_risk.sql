@@ -0,0 +1,61 @@
+-- Multi-Asset Risk Dashboard - EWMA Volatility and Covariance
+-- RiskMetrics-style exponentially weighted estimators maintained by backend/ewma_risk.py:
+-- the latest estimator state is kept so each new day is one update, not a history rescan
+
+-- =====================================================
+-- VARIANCE STATE
+-- =====================================================
+
+-- Latest EWMA variance per series and decay; the next run folds in returns after as_of_date
+CREATE TABLE ewma_variance_state (
+    series_type VARCHAR(10) NOT NULL CHECK (series_type IN ('portfolio', 'security')),
+    series_id INTEGER NOT NULL, -- portfolio_id or security_id
+    decay DOUBLE PRECISION NOT NULL CHECK (decay > 0 AND decay < 1),
+    as_of_date DATE NOT NULL, -- Last return folded into the state
+    variance DOUBLE PRECISION NOT NULL, -- Daily variance
+    n_obs INTEGER NOT NULL, -- Returns folded in since the state was seeded
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (series_type, series_id, decay)
+);
+
+-- =====================================================
+-- VOLATILITY HISTORY
+-- =====================================================
+
+-- Annualised EWMA volatility after each observed return, for charts
+CREATE TABLE ewma_volatility (
+    series_type VARCHAR(10) NOT NULL CHECK (series_type IN ('portfolio', 'security')),
+    series_id INTEGER NOT NULL,
+    decay DOUBLE PRECISION NOT NULL,
+    date DATE NOT NULL,
+    volatility DOUBLE PRECISION NOT NULL,
+
+    PRIMARY KEY (series_type, series_id, decay, date)
+);
+
+-- =====================================================
+-- COVARIANCE STATE
+-- =====================================================
+
+-- Latest EWMA covariance matrix of a security universe. covariance is a little-endian
+-- float64 N x N row-major array ordered like security_ids; NaN marks pairs never observed together
+CREATE TABLE ewma_covariance_state (
+    universe_code VARCHAR(20) NOT NULL, -- HELD = every security in a portfolio lookthrough
+    decay DOUBLE PRECISION NOT NULL CHECK (decay > 0 AND decay < 1),
+    as_of_date DATE NOT NULL,
+    security_ids INTEGER[] NOT NULL,
+    covariance BYTEA NOT NULL,
+    n_obs INTEGER NOT NULL, -- Return dates folded in since the state was seeded
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (universe_code, decay),
+    CHECK (octet_length(covariance) = 8 * cardinality(security_ids) * cardinality(security_ids))
+);
+
+-- The matrix is dense floats; skip TOAST compression attempts
+ALTER TABLE ewma_covariance_state ALTER COLUMN covariance SET STORAGE EXTERNAL;
+
+COMMENT ON TABLE ewma_variance_state IS 'Latest EWMA variance per portfolio/security and decay - advanced one day at a time';
+COMMENT ON TABLE ewma_volatility IS 'Annualised EWMA volatility history per portfolio/security and decay';
+COMMENT ON TABLE ewma_covariance_state IS 'Latest EWMA security covariance matrix per universe and decay';
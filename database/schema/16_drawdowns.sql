@@ -0,0 +1,41 @@
+-- Multi-Asset Risk Dashboard - Drawdown Analytics
+-- Drawdown episodes and underwater curves for every portfolio and benchmark,
+-- rebuilt in one vectorised pass by backend/drawdowns.py
+
+-- =====================================================
+-- DRAWDOWN EPISODES
+-- =====================================================
+
+-- One row per run below a previous high. Day counts are trading days on the shared
+-- return calendar; recovery columns stay NULL while the series is still underwater
+CREATE TABLE drawdown_episodes (
+    series_type VARCHAR(10) NOT NULL CHECK (series_type IN ('portfolio', 'benchmark')),
+    series_id INTEGER NOT NULL, -- portfolio_id or benchmark_id
+    peak_date DATE NOT NULL, -- Last date at the previous high
+    trough_date DATE NOT NULL,
+    recovery_date DATE, -- First date back at the high
+    depth DOUBLE PRECISION NOT NULL CHECK (depth < 0), -- Trough value / peak value - 1
+    decline_days INTEGER NOT NULL, -- Peak to trough
+    recovery_days INTEGER, -- Trough to recovery
+    duration_days INTEGER NOT NULL, -- Peak to recovery, or to the last return if not recovered
+
+    PRIMARY KEY (series_type, series_id, peak_date)
+);
+
+CREATE INDEX idx_drawdown_episodes_depth ON drawdown_episodes(series_type, series_id, depth);
+
+-- =====================================================
+-- UNDERWATER CURVES
+-- =====================================================
+
+CREATE TABLE drawdown_underwater (
+    series_type VARCHAR(10) NOT NULL CHECK (series_type IN ('portfolio', 'benchmark')),
+    series_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    drawdown DOUBLE PRECISION NOT NULL, -- Value / running high - 1 (0 at a high)
+
+    PRIMARY KEY (series_type, series_id, date)
+);
+
+COMMENT ON TABLE drawdown_episodes IS 'Drawdown episodes per portfolio/benchmark - peak, trough, recovery, depth and durations';
+COMMENT ON TABLE drawdown_underwater IS 'Daily underwater curve per portfolio/benchmark';
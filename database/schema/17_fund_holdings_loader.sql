@@ -0,0 +1,39 @@
+-- Multi-Asset Risk Dashboard - Fund Holdings Loader
+-- Issuer constituent files are diffed against each fund's previous snapshot by
+-- backend/fund_holdings.py; only the delta is sent and recorded, unchanged rows are
+-- carried forward inside the database
+
+-- =====================================================
+-- FUND HOLDING CHANGES
+-- =====================================================
+
+-- Compact delta per fund and date against the fund's previous snapshot
+CREATE TABLE fund_holding_changes (
+    fund_security_id INTEGER REFERENCES securities(security_id),
+    underlying_security_id INTEGER REFERENCES securities(security_id),
+    date DATE NOT NULL,
+    change_type VARCHAR(10) NOT NULL CHECK (change_type IN ('added', 'removed', 'changed')),
+    previous_date DATE, -- Snapshot diffed against (NULL for a fund's first load)
+    shares DECIMAL(20,6),
+    market_value DECIMAL(20,2), -- NULL for removed rows
+    weight DECIMAL(8,6), -- NULL for removed rows
+    previous_weight DECIMAL(8,6), -- NULL for added rows
+
+    PRIMARY KEY (fund_security_id, date, underlying_security_id)
+);
+
+CREATE INDEX idx_fund_holding_changes_date ON fund_holding_changes(date);
+
+-- =====================================================
+-- LOOKTHROUGH REFRESH QUEUE
+-- =====================================================
+
+-- Portfolios whose lookthrough changed since their analytics were last refreshed
+CREATE TABLE lookthrough_dirty_portfolios (
+    portfolio_id INTEGER PRIMARY KEY REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    marked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    reason VARCHAR(100)
+);
+
+COMMENT ON TABLE fund_holding_changes IS 'Per-date delta of each fund''s constituents - what the loader actually wrote';
+COMMENT ON TABLE lookthrough_dirty_portfolios IS 'Portfolios awaiting lookthrough refresh after fund holdings changed';
@@ -0,0 +1,42 @@
+-- Multi-Asset Risk Dashboard - Exposure Cube
+-- Lookthrough weights rolled up to the finest (asset class, country, currency,
+-- security type, fund layer) grain per portfolio and date by backend/exposure_cube.py;
+-- any slice or pivot is a GROUP BY over a few hundred rows
+
+-- =====================================================
+-- EXPOSURE CUBE
+-- =====================================================
+
+-- Each lookthrough node contributes its residual weight (what its own constituents
+-- don't explain), so cells sum to the portfolio's direct weights without double counting
+CREATE TABLE exposure_cube (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    layer SMALLINT NOT NULL, -- Lookthrough level: 1 = direct holding, 2+ = inside funds
+    asset_class VARCHAR(100) NOT NULL, -- 'Unclassified' when unknown
+    country VARCHAR(50) NOT NULL,
+    currency CHAR(3) NOT NULL,
+    security_type VARCHAR(50) NOT NULL,
+    weight DOUBLE PRECISION NOT NULL,
+    market_value DOUBLE PRECISION NOT NULL,
+    n_securities INTEGER NOT NULL,
+
+    PRIMARY KEY (portfolio_id, date, layer, asset_class, country, currency, security_type)
+);
+
+-- =====================================================
+-- BUILD FINGERPRINTS
+-- =====================================================
+
+-- Hash of each portfolio's cube cells; an unchanged portfolio is carried forward in SQL
+CREATE TABLE exposure_cube_builds (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    fingerprint BIGINT NOT NULL,
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (portfolio_id, date)
+);
+
+COMMENT ON TABLE exposure_cube IS 'Lookthrough exposure by asset class, country, currency, security type and layer';
+COMMENT ON TABLE exposure_cube_builds IS 'Per-portfolio cube fingerprints - skips recomputing unchanged portfolios';
@@ -0,0 +1,26 @@
+-- Multi-Asset Risk Dashboard - Multi-Resolution Performance Series
+-- Daily, weekly and monthly aggregates of portfolio_performance maintained by
+-- backend/performance_series.py; the API picks the coarsest resolution that still
+-- covers a requested point budget and downsamples it (LTTB) for charts
+
+-- =====================================================
+-- PERFORMANCE AGGREGATES
+-- =====================================================
+
+CREATE TABLE performance_aggregates (
+    portfolio_id INTEGER REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+    resolution CHAR(1) NOT NULL CHECK (resolution IN ('D', 'W', 'M')), -- Weeks end Friday
+    period_end DATE NOT NULL, -- Last observed date in the period
+    period_start DATE NOT NULL, -- First observed date in the period
+    open_value DOUBLE PRECISION NOT NULL,
+    high_value DOUBLE PRECISION NOT NULL,
+    low_value DOUBLE PRECISION NOT NULL,
+    close_value DOUBLE PRECISION NOT NULL,
+    period_return DOUBLE PRECISION NOT NULL, -- Compounded daily returns within the period
+    growth_index DOUBLE PRECISION NOT NULL, -- Growth of 1 since the first day at period_end
+    n_days INTEGER NOT NULL,
+
+    PRIMARY KEY (portfolio_id, resolution, period_end)
+);
+
+COMMENT ON TABLE performance_aggregates IS 'Daily/weekly/monthly OHLC and growth per portfolio - bounded-cost long-history charts';
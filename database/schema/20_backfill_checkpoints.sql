@@ -0,0 +1,29 @@
+-- Multi-Asset Risk Dashboard - Backfill Checkpoints
+-- The historical backfill is split into (ticker, date chunk) work units by
+-- backend/backfill_checkpoints.py; a chunk is marked done in the same transaction
+-- that writes its rows, so a restarted backfill resumes with the chunks still open
+
+-- =====================================================
+-- BACKFILL CHUNKS
+-- =====================================================
+
+CREATE TABLE backfill_chunks (
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('security', 'benchmark', 'fx')),
+    key INTEGER NOT NULL, -- security_id, benchmark_id or currency_id
+    chunk_start DATE NOT NULL,
+    chunk_end DATE NOT NULL, -- Exclusive
+    ticker VARCHAR(20) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'done', 'empty', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0, -- Fetch attempts across all runs
+    rows_written INTEGER,
+    last_error TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (kind, key, chunk_start),
+    CHECK (chunk_end > chunk_start)
+);
+
+CREATE INDEX idx_backfill_chunks_open ON backfill_chunks(status) WHERE status IN ('pending', 'failed');
+
+COMMENT ON TABLE backfill_chunks IS 'Historical backfill work units and their outcome - lets an interrupted backfill resume';